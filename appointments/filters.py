@@ -1,5 +1,6 @@
 import django_filters
-from .models import AppointmentExam, ExamAttachment
+from common.utils.lab_results import analyte_key
+from .models import AppointmentExam, ExamAttachment, ExamResult
 
 
 class AppointmentExamFilter(django_filters.FilterSet):
@@ -24,3 +25,28 @@ class ExamAttachmentFilter(django_filters.FilterSet):
     class Meta:
         model = ExamAttachment
         fields = ["resident", "appointment_exam"]
+
+
+class ExamResultFilter(django_filters.FilterSet):
+    resident = django_filters.NumberFilter(field_name="resident__id")
+    attachment = django_filters.NumberFilter(field_name="attachment__id")
+    appointment_exam = django_filters.NumberFilter(field_name="appointment_exam__id")
+    # aceita o nome como no laudo ("Glicemia de jejum") ou a chave ("glicose")
+    analyte = django_filters.CharFilter(method="filter_analyte")
+    collected_at = django_filters.DateTimeFromToRangeFilter()
+    is_abnormal = django_filters.BooleanFilter()
+
+    class Meta:
+        model = ExamResult
+        fields = [
+            "resident",
+            "attachment",
+            "appointment_exam",
+            "analyte",
+            "collected_at",
+            "is_abnormal",
+        ]
+
+    def filter_analyte(self, queryset, name, value):
+        keys = [analyte_key(item) for item in value.split(",") if item.strip()]
+        return queryset.filter(analyte_key__in=keys)
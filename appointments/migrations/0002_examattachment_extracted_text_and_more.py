@@ -0,0 +1,53 @@
+# Generated by Django 4.2.11 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('residents', '0002_alter_resident_health_history_alter_resident_notes'),
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examattachment',
+            name='extracted_text',
+            field=models.TextField(blank=True, default='', help_text='Texto do arquivo (OCR/conversão), base dos resultados', verbose_name='Texto extraído'),
+        ),
+        migrations.AddField(
+            model_name='examattachment',
+            name='results_extracted_at',
+            field=models.DateTimeField(blank=True, help_text='Quando os resultados foram extraídos (vazio: pendente)', null=True, verbose_name='Resultados extraídos em'),
+        ),
+        migrations.CreateModel(
+            name='ExamResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, editable=False, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(db_index=True, editable=False, verbose_name='Atualizado em')),
+                ('analyte', models.CharField(help_text='Nome do analito como aparece no laudo', max_length=120, verbose_name='Analito')),
+                ('analyte_key', models.CharField(help_text='Nome normalizado, comum entre laudos (ex.: glicose)', max_length=120, verbose_name='Chave do analito')),
+                ('value', models.DecimalField(blank=True, decimal_places=4, help_text='Valor numérico (vazio para resultados qualitativos)', max_digits=16, null=True, verbose_name='Valor')),
+                ('value_text', models.CharField(help_text='Resultado como aparece no laudo', max_length=60, verbose_name='Resultado')),
+                ('unit', models.CharField(blank=True, help_text='Unidade do valor', max_length=30, verbose_name='Unidade')),
+                ('reference_min', models.DecimalField(blank=True, decimal_places=4, help_text='Limite inferior da faixa de referência', max_digits=16, null=True, verbose_name='Referência mínima')),
+                ('reference_max', models.DecimalField(blank=True, decimal_places=4, help_text='Limite superior da faixa de referência', max_digits=16, null=True, verbose_name='Referência máxima')),
+                ('reference_text', models.CharField(blank=True, help_text='Faixa de referência como aparece no laudo', max_length=200, verbose_name='Valor de referência')),
+                ('is_abnormal', models.BooleanField(blank=True, help_text='Fora da faixa de referência (vazio: sem referência numérica)', null=True, verbose_name='Alterado')),
+                ('collected_at', models.DateTimeField(help_text='Data da coleta (do laudo, do exame ou do envio do anexo)', verbose_name='Coletado em')),
+                ('source_line', models.CharField(blank=True, help_text='Linha do texto de onde o resultado foi lido', max_length=300, verbose_name='Linha do laudo')),
+                ('appointment_exam', models.ForeignKey(blank=True, help_text='Consulta ou exame do anexo, se houver', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='results', to='appointments.appointmentexam', verbose_name='Consulta/Exame')),
+                ('attachment', models.ForeignKey(help_text='Anexo de onde o resultado foi extraído', on_delete=django.db.models.deletion.CASCADE, related_name='results', to='appointments.examattachment', verbose_name='Anexo')),
+                ('resident', models.ForeignKey(help_text='Residente ao qual o resultado pertence', on_delete=django.db.models.deletion.CASCADE, related_name='exam_results', to='residents.resident', verbose_name='Residente')),
+            ],
+            options={
+                'verbose_name': 'Resultado de Exame',
+                'verbose_name_plural': 'Resultados de Exames',
+                'ordering': ['-collected_at', 'analyte_key'],
+                'indexes': [models.Index(fields=['resident', 'analyte_key', '-collected_at'], name='exam_result_trend_idx')],
+            },
+        ),
+    ]
@@ -94,6 +94,18 @@ class ExamAttachment(AbstractDatableModel):
         verbose_name="Descrição",
         help_text="Descrição do arquivo",
     )
+    extracted_text = models.TextField(
+        blank=True,
+        default="",
+        verbose_name="Texto extraído",
+        help_text="Texto do arquivo (OCR/conversão), base dos resultados",
+    )
+    results_extracted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Resultados extraídos em",
+        help_text="Quando os resultados foram extraídos (vazio: pendente)",
+    )
 
     class Meta:
         verbose_name = "Anexo de Exame"
@@ -108,3 +120,114 @@ class ExamAttachment(AbstractDatableModel):
     def file_extension(self):
         """Retorna a extensão do arquivo"""
         return self.file.name.split(".")[-1].lower() if self.file else None
+
+
+class ExamResult(AbstractDatableModel):
+    """Um valor de exame laboratorial extraído de um anexo."""
+
+    resident = models.ForeignKey(
+        Resident,
+        on_delete=models.CASCADE,
+        related_name="exam_results",
+        verbose_name="Residente",
+        help_text="Residente ao qual o resultado pertence",
+    )
+    attachment = models.ForeignKey(
+        ExamAttachment,
+        on_delete=models.CASCADE,
+        related_name="results",
+        verbose_name="Anexo",
+        help_text="Anexo de onde o resultado foi extraído",
+    )
+    appointment_exam = models.ForeignKey(
+        AppointmentExam,
+        on_delete=models.CASCADE,
+        related_name="results",
+        null=True,
+        blank=True,
+        verbose_name="Consulta/Exame",
+        help_text="Consulta ou exame do anexo, se houver",
+    )
+    analyte = models.CharField(
+        max_length=120,
+        verbose_name="Analito",
+        help_text="Nome do analito como aparece no laudo",
+    )
+    analyte_key = models.CharField(
+        max_length=120,
+        verbose_name="Chave do analito",
+        help_text="Nome normalizado, comum entre laudos (ex.: glicose)",
+    )
+    value = models.DecimalField(
+        max_digits=16,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        verbose_name="Valor",
+        help_text="Valor numérico (vazio para resultados qualitativos)",
+    )
+    value_text = models.CharField(
+        max_length=60,
+        verbose_name="Resultado",
+        help_text="Resultado como aparece no laudo",
+    )
+    unit = models.CharField(
+        max_length=30,
+        blank=True,
+        verbose_name="Unidade",
+        help_text="Unidade do valor",
+    )
+    reference_min = models.DecimalField(
+        max_digits=16,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        verbose_name="Referência mínima",
+        help_text="Limite inferior da faixa de referência",
+    )
+    reference_max = models.DecimalField(
+        max_digits=16,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        verbose_name="Referência máxima",
+        help_text="Limite superior da faixa de referência",
+    )
+    reference_text = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name="Valor de referência",
+        help_text="Faixa de referência como aparece no laudo",
+    )
+    is_abnormal = models.BooleanField(
+        null=True,
+        blank=True,
+        verbose_name="Alterado",
+        help_text="Fora da faixa de referência (vazio: sem referência numérica)",
+    )
+    collected_at = models.DateTimeField(
+        verbose_name="Coletado em",
+        help_text="Data da coleta (do laudo, do exame ou do envio do anexo)",
+    )
+    source_line = models.CharField(
+        max_length=300,
+        blank=True,
+        verbose_name="Linha do laudo",
+        help_text="Linha do texto de onde o resultado foi lido",
+    )
+
+    class Meta:
+        verbose_name = "Resultado de Exame"
+        verbose_name_plural = "Resultados de Exames"
+        ordering = ["-collected_at", "analyte_key"]
+        indexes = [
+            # evolução de um analito do residente: uma consulta pelo índice
+            models.Index(
+                fields=["resident", "analyte_key", "-collected_at"],
+                name="exam_result_trend_idx",
+            ),
+        ]
+
+    def __str__(self):
+        result = f"{self.value_text} {self.unit}".strip()
+        return f"{self.resident.name} - {self.analyte}: {result}"
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import AppointmentExam, ExamAttachment
+from .models import AppointmentExam, ExamAttachment, ExamResult
 from residents.serializers import ResidentSerializer
 
 
@@ -34,10 +34,11 @@ class ExamAttachmentSerializer(serializers.ModelSerializer):
             "file",
             "description",
             "file_extension",
+            "results_extracted_at",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        read_only_fields = ["id", "results_extracted_at", "created_at", "updated_at"]
 
     def get_appointment_exam(self, obj):
         if obj.appointment_exam:
@@ -119,3 +120,30 @@ class AppointmentExamSerializer(serializers.ModelSerializer):
             resident_id = validated_data.pop("resident_id")
             validated_data["resident_id"] = resident_id
         return super().update(instance, validated_data)
+
+
+class ExamResultSerializer(serializers.ModelSerializer):
+    resident_name = serializers.CharField(source="resident.name", read_only=True)
+
+    class Meta:
+        model = ExamResult
+        fields = [
+            "id",
+            "resident",
+            "resident_name",
+            "attachment",
+            "appointment_exam",
+            "analyte",
+            "analyte_key",
+            "value",
+            "value_text",
+            "unit",
+            "reference_min",
+            "reference_max",
+            "reference_text",
+            "is_abnormal",
+            "collected_at",
+            "source_line",
+            "created_at",
+        ]
+        read_only_fields = fields
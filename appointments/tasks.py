@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+
+from common.tasks import extract_document_text
+from common.utils.lab_results import parse_collection_date, parse_lab_results
+from common.utils.text_index import exam_text_index
+
+from .models import ExamAttachment, ExamResult
+
+logger = logging.getLogger(__name__)
+
+# DecimalField(max_digits=16, decimal_places=4)
+_DECIMAL_PLACES = Decimal("0.0001")
+_DECIMAL_LIMIT = Decimal(10) ** 12
+
+
+def schedule_exam_results(attachment: ExamAttachment):
+    """
+    Extrai o texto do anexo na fila "ocr" (lendo do storage, sem URL
+    assinada) e em seguida grava os resultados de exame encontrados.
+    """
+    extract = extract_document_text.s(file_name=attachment.file.name)
+    save = save_exam_results.s(attachment_id=attachment.id)
+    return (extract | save).apply_async()
+
+
+def _quantize(value: Optional[Decimal]) -> Optional[Decimal]:
+    # número absurdo (OCR juntou colunas) fica só no texto do resultado
+    if value is None or abs(value) >= _DECIMAL_LIMIT:
+        return None
+    return value.quantize(_DECIMAL_PLACES)
+
+
+def _collected_at(attachment: ExamAttachment, text: str) -> datetime:
+    collected_on = parse_collection_date(text)
+    if collected_on:
+        return timezone.make_aware(datetime.combine(collected_on, time()))
+    if attachment.appointment_exam:
+        return attachment.appointment_exam.date_time
+    return attachment.created_at
+
+
+@shared_task
+def save_exam_results(document: Dict[str, Any], attachment_id: int) -> int:
+    """
+    Grava o texto extraído no anexo (e no índice de similaridade) e troca os
+    resultados dele pelos encontrados no texto (`parse_lab_results`). Devolve
+    quantos foram salvos.
+    """
+    attachment = (
+        ExamAttachment.objects.select_related("appointment_exam")
+        .filter(pk=attachment_id)
+        .first()
+    )
+    if attachment is None:
+        logger.warning(f"Exam attachment {attachment_id} not found")
+        return 0
+
+    text = (document or {}).get("text") or ""
+    collected_at = _collected_at(attachment, text)
+    now = timezone.now()
+    results = [
+        ExamResult(
+            resident_id=attachment.resident_id,
+            attachment_id=attachment.id,
+            appointment_exam_id=attachment.appointment_exam_id,
+            analyte=result.analyte[:120],
+            analyte_key=result.analyte_key[:120],
+            value=_quantize(result.value),
+            value_text=result.value_text[:60],
+            unit=result.unit[:30],
+            reference_min=_quantize(result.reference_min),
+            reference_max=_quantize(result.reference_max),
+            reference_text=result.reference_text,
+            is_abnormal=result.is_abnormal,
+            collected_at=collected_at,
+            source_line=result.line,
+            # bulk_create não passa pelo save() que preenche as datas
+            created_at=now,
+            updated_at=now,
+        )
+        for result in parse_lab_results(text)
+    ]
+
+    with transaction.atomic():
+        ExamAttachment.objects.filter(pk=attachment.id).update(
+            extracted_text=text, results_extracted_at=now, updated_at=now
+        )
+        ExamResult.objects.filter(attachment_id=attachment.id).delete()
+        ExamResult.objects.bulk_create(results)
+
+    # o índice é derivado do texto salvo (index_exam_texts recria do zero)
+    try:
+        exam_text_index.add(attachment.id, text, group=attachment.resident_id)
+    except Exception as e:
+        logger.warning(f"Could not index text of attachment {attachment.id}: {str(e)}")
+
+    logger.info(f"Saved {len(results)} exam results for attachment {attachment.id}")
+    return len(results)
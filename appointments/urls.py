@@ -7,6 +7,7 @@ app_name = "appointments"
 router = DefaultRouter()
 router.register(r"appointments", views.AppointmentExamViewSet)
 router.register(r"attachments", views.ExamAttachmentViewSet)
+router.register(r"results", views.ExamResultViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
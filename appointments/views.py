@@ -1,8 +1,21 @@
+from django.db import transaction
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import AppointmentExam, ExamAttachment
-from .serializers import AppointmentExamSerializer, ExamAttachmentSerializer
-from .filters import AppointmentExamFilter, ExamAttachmentFilter
+from common.utils.text_index import exam_text_index
+from .models import AppointmentExam, ExamAttachment, ExamResult
+from .serializers import (
+    AppointmentExamSerializer,
+    ExamAttachmentSerializer,
+    ExamResultSerializer,
+)
+from .filters import AppointmentExamFilter, ExamAttachmentFilter, ExamResultFilter
+from .tasks import schedule_exam_results
+
+SIMILAR_DEFAULT_LIMIT = 10
+SIMILAR_MAX_LIMIT = 50
 
 
 class AppointmentExamViewSet(viewsets.ModelViewSet):
@@ -43,3 +56,70 @@ class ExamAttachmentViewSet(viewsets.ModelViewSet):
     search_fields = ["description", "resident__name"]
     ordering_fields = ["created_at"]
     ordering = ["-created_at"]
+
+    def perform_create(self, serializer):
+        attachment = serializer.save()
+        transaction.on_commit(lambda: schedule_exam_results(attachment))
+
+    def perform_update(self, serializer):
+        file_changed = "file" in serializer.validated_data
+        attachment = serializer.save()
+        if file_changed:
+            transaction.on_commit(lambda: schedule_exam_results(attachment))
+
+    def perform_destroy(self, instance):
+        attachment_id = instance.id
+        instance.delete()
+        transaction.on_commit(lambda: exam_text_index.remove(attachment_id))
+
+    @action(detail=True, methods=["get"], url_path="similar")
+    def similar(self, request, pk=None):
+        """
+        Anexos com texto mais parecido com o deste (índice local TF-IDF), do
+        mesmo residente por padrão; ?scope=all busca em todos. Cada item vem
+        com `similarity` (cosseno, 0 a 1).
+        """
+        attachment = self.get_object()
+        try:
+            limit = int(request.query_params.get("limit", SIMILAR_DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "Informe um número inteiro."})
+        limit = max(1, min(limit, SIMILAR_MAX_LIMIT))
+        group = None
+        if request.query_params.get("scope") != "all":
+            group = attachment.resident_id
+
+        matches = exam_text_index.query(
+            attachment.extracted_text,
+            limit=limit,
+            group=group,
+            exclude=attachment.id,
+        )
+        scores = dict(matches)
+        # o índice pode ter anexos que já foram apagados
+        found = self.get_queryset().in_bulk(list(scores))
+        attachments = [found[id_] for id_ in scores if id_ in found]
+
+        data = self.get_serializer(attachments, many=True).data
+        for item in data:
+            item["similarity"] = round(scores[item["id"]], 4)
+        return Response(data)
+
+
+class ExamResultViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Resultados extraídos dos anexos. Evolução de um analito:
+    ?resident=<id>&analyte=creatinina&collected_at_after=<data>
+    """
+
+    queryset = ExamResult.objects.select_related("resident").all()
+    serializer_class = ExamResultSerializer
+    filter_backends = [
+        DjangoFilterBackend,
+        filters.SearchFilter,
+        filters.OrderingFilter,
+    ]
+    filterset_class = ExamResultFilter
+    search_fields = ["analyte", "analyte_key"]
+    ordering_fields = ["collected_at", "analyte_key", "value"]
+    ordering = ["-collected_at", "analyte_key"]
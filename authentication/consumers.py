@@ -8,11 +8,13 @@ from rest_framework_simplejwt.serializers import (TokenObtainPairSerializer,
                                                   TokenRefreshSerializer)
 from rest_framework_simplejwt.tokens import AccessToken
 
+from common.consumers import PooledActionsMixin, pooled_action
+
 logger = logging.getLogger(__name__)
 
-class JWTTokenConsumer(GenericAsyncAPIConsumer):
+class JWTTokenConsumer(PooledActionsMixin, GenericAsyncAPIConsumer):
 
-    @action()
+    @pooled_action()
     def validate(self, action=None, request_id=None, data=None, **kwargs):
         
         try: 
@@ -38,6 +40,7 @@ class JWTTokenConsumer(GenericAsyncAPIConsumer):
             }, 200
 
 
+    # não é somente leitura: com UPDATE_LAST_LOGIN grava o last_login
     @action()
     def obtain(self, action=None, request_id=None, data=None, **kwargs):
 
@@ -66,7 +69,7 @@ class JWTTokenConsumer(GenericAsyncAPIConsumer):
                 "request_id": request_id,
             }, 200
 
-    @action()
+    @pooled_action()
     def refresh(self, action=None, request_id=None, data=None, **kwargs):
         serializer = TokenRefreshSerializer(data=data)
 
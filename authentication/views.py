@@ -9,6 +9,8 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from common.utils.requests import get_http_session
+
 from .serializers import (
     AuthenticatedUserSerializer,
     TokenExchangeRequestSerializer,
@@ -27,7 +29,9 @@ class GoogleTokenExchangeView(APIView):
         token = request.data.get("token")
         try:
             # Verifica o token do Google
-            idinfo = id_token.verify_oauth2_token(token, requests.Request())
+            idinfo = id_token.verify_oauth2_token(
+                token, requests.Request(session=get_http_session())
+            )
 
             if "email" not in idinfo:
                 return Response(
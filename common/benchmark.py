@@ -0,0 +1,616 @@
+"""
+Corpus sintético e medições para os comandos `benchmark_*`.
+
+Nada aqui roda em produção: as páginas são geradas com o PIL a partir de um
+vocabulário de laudos, então os resultados são reproduzíveis pela semente.
+"""
+
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import statistics
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+import docx
+import fitz  # PyMuPDF
+import openpyxl
+from Levenshtein import distance as levenshtein_distance
+from PIL import Image, ImageDraw, ImageFont
+
+from common.utils.image import _osd_rotation, estimate_orientation
+
+logger = logging.getLogger(__name__)
+
+FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+)
+
+LAB_WORDS = (
+    "Hemoglobina Hematócrito Leucócitos Plaquetas Glicose Colesterol total "
+    "HDL LDL Triglicerídeos Creatinina Ureia Sódio Potássio TSH T4 livre "
+    "Resultado Valor de referência mg/dL g/dL mEq/L Paciente Data da coleta "
+    "Laboratório Material Sangue Método Enzimático Jejum Normal Alterado "
+    "12,5 98 140 4,2 0,9 37 250 1.020"
+).split()
+
+# linhas de tabela: (analito, unidade, referência)
+LAB_TABLE_ROWS = (
+    ("Hemoglobina", "g/dL", "12,0 a 16,0"),
+    ("Hematócrito", "%", "36 a 46"),
+    ("Leucócitos", "/mm³", "4.000 a 11.000"),
+    ("Plaquetas", "mil/mm³", "150 a 450"),
+    ("Glicose", "mg/dL", "70 a 99"),
+    ("Colesterol total", "mg/dL", "< 190"),
+    ("HDL", "mg/dL", "> 40"),
+    ("Triglicerídeos", "mg/dL", "< 150"),
+    ("Creatinina", "mg/dL", "0,6 a 1,1"),
+    ("Ureia", "mg/dL", "15 a 40"),
+    ("Sódio", "mEq/L", "135 a 145"),
+    ("Potássio", "mEq/L", "3,5 a 5,1"),
+    ("TSH", "µUI/mL", "0,4 a 4,0"),
+    ("T4 livre", "ng/dL", "0,9 a 1,8"),
+)
+LAB_KEY_VALUES = (
+    ("Paciente", "Maria"),
+    ("Idade", "72 anos"),
+    ("Data da coleta", "12/03/2024"),
+    ("Material", "Sangue"),
+    ("Método", "Enzimático"),
+    ("Jejum", "12 h"),
+    ("Glicose", "98 mg/dL"),
+    ("TSH", "2,1"),
+    ("HIV 1 e 2", "Não reagente"),
+    ("Resultado", "Normal"),
+)
+
+# A4 a 200 DPI
+PAGE_SIZE = (1654, 2339)
+
+
+def _lab_line(rng: random.Random) -> str:
+    return " ".join(rng.choice(LAB_WORDS) for _ in range(rng.randint(3, 8)))
+
+
+def load_font(size: int) -> ImageFont.ImageFont:
+    for path in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def make_text_page(
+    rng: random.Random,
+    lines: int,
+    size: Tuple[int, int] = PAGE_SIZE,
+    font_size: int = 34,
+) -> Tuple[Image.Image, str]:
+    """Página em tons de cinza com `lines` linhas de laudo. Devolve (imagem, texto)."""
+    font = load_font(font_size)
+    img = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(img)
+    text_lines = []
+    line_height = int(font_size * 2)
+    for i in range(lines):
+        y = 150 + i * line_height
+        if y + line_height > size[1] - 100:
+            break
+        line = _lab_line(rng)
+        draw.text((120, y), line, font=font, fill=0)
+        text_lines.append(line)
+    return img, "\n".join(text_lines)
+
+
+def make_table_page(
+    rng: random.Random,
+    rows: int,
+    size: Tuple[int, int] = PAGE_SIZE,
+    font_size: int = 34,
+) -> Tuple[Image.Image, str]:
+    """
+    Laudo em tabela (exame, resultado, unidade, referência) com colunas
+    alinhadas e muito espaço em branco entre elas. Devolve (imagem, texto).
+    """
+    font = load_font(font_size)
+    img = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(img)
+    columns = (120, 700, 950, 1200)
+    text_lines = []
+    line_height = int(font_size * 1.8)
+    header = ("Exame", "Resultado", "Unidade", "Referência")
+    for i in range(rows + 1):
+        y = 150 + i * line_height
+        if y + line_height > size[1] - 100:
+            break
+        if i == 0:
+            cells = header
+        else:
+            analyte, unit, reference = rng.choice(LAB_TABLE_ROWS)
+            value = f"{rng.uniform(0.5, 300):.1f}".replace(".", ",")
+            cells = (analyte, value, unit, reference)
+        for x, cell in zip(columns, cells):
+            draw.text((x, y), cell, font=font, fill=0)
+        text_lines.append(" ".join(cells))
+    return img, "\n".join(text_lines)
+
+
+def make_key_value_page(
+    rng: random.Random,
+    lines: int,
+    size: Tuple[int, int] = PAGE_SIZE,
+    font_size: int = 34,
+) -> Tuple[Image.Image, str]:
+    """
+    Linhas curtas "chave: valor" alinhadas à esquerda, como o cabeçalho de
+    um laudo ou um resultado qualitativo. Devolve (imagem, texto).
+    """
+    font = load_font(font_size)
+    img = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(img)
+    text_lines = []
+    line_height = int(font_size * 2)
+    for i in range(lines):
+        y = 150 + i * line_height
+        if y + line_height > size[1] - 100:
+            break
+        line = "{}: {}".format(*rng.choice(LAB_KEY_VALUES))
+        draw.text((120, y), line, font=font, fill=0)
+        text_lines.append(line)
+    return img, "\n".join(text_lines)
+
+
+# leiaute -> gerador (rng, linhas) do corpus de orientação
+PAGE_LAYOUTS = {
+    "text": make_text_page,
+    "table": make_table_page,
+    "key_value": make_key_value_page,
+}
+
+
+def make_rotated_corpus(
+    count: int, seed: int = 0, max_skew: float = 3.0
+) -> List[Tuple[Image.Image, int, float, str]]:
+    """
+    Páginas de cada leiaute, em corpos de letra variados, giradas em
+    0/90/180/270 com uma inclinação aleatória. Cada item é (imagem, rotação
+    esperada no formato do OSD, inclinação aplicada, leiaute).
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        layout = list(PAGE_LAYOUTS)[index % len(PAGE_LAYOUTS)]
+        img, _ = PAGE_LAYOUTS[layout](
+            rng, rng.choice([3, 6, 15, 30]), font_size=rng.choice([20, 34, 48])
+        )
+        rotate = rng.choice([0, 90, 180, 270])
+        skew = round(rng.uniform(-max_skew, max_skew), 1)
+        rotated = img.rotate(skew, expand=True, fillcolor=255).rotate(
+            rotate, expand=True, fillcolor=255
+        )
+        # girar `rotate` graus anti-horário pede `rotate` graus horário de volta
+        corpus.append((rotated, rotate, skew, layout))
+    return corpus
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(func: Callable, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def timing_summary(durations: List[float]) -> dict:
+    return {
+        "mean_ms": round(statistics.mean(durations) * 1000, 2) if durations else 0.0,
+        "p50_ms": round(percentile(durations, 50) * 1000, 2),
+        "p95_ms": round(percentile(durations, 95) * 1000, 2),
+    }
+
+
+def benchmark_orientation(
+    count: int = 100, seed: int = 0, with_osd: bool = False
+) -> dict:
+    """
+    Mede a estimativa barata de orientação no corpus girado: quantas imagens
+    ela resolve sozinha (chamadas de OSD evitadas), a acurácia nessas e o
+    tempo, no total e por leiaute. Com `with_osd`, roda também o OSD em todas
+    para comparar.
+    """
+    corpus = make_rotated_corpus(count, seed=seed)
+
+    estimate_times, osd_times = [], []
+    confident = confident_correct = 0
+    pipeline_correct = 0
+    osd_correct: Optional[int] = 0 if with_osd else None
+    by_layout = {
+        layout: {"images": 0, "confident": 0, "confident_correct": 0}
+        for layout in PAGE_LAYOUTS
+    }
+
+    for img, expected, _, layout in corpus:
+        estimate, elapsed = timed(estimate_orientation, img)
+        estimate_times.append(elapsed)
+        by_layout[layout]["images"] += 1
+
+        osd_rotation = None
+        if with_osd:
+            try:
+                osd_rotation, elapsed = timed(_osd_rotation, img)
+            except Exception:
+                # como no _fix_orientation: OSD que desiste ("Too few characters")
+                # deixa a página como está
+                osd_rotation, elapsed = 0, 0.0
+            osd_times.append(elapsed)
+            osd_correct += osd_rotation == expected
+
+        if estimate.confident:
+            confident += 1
+            confident_correct += estimate.rotate == expected
+            pipeline_correct += estimate.rotate == expected
+            by_layout[layout]["confident"] += 1
+            by_layout[layout]["confident_correct"] += estimate.rotate == expected
+        elif osd_rotation is not None:
+            pipeline_correct += osd_rotation == expected
+
+    result = {
+        "images": count,
+        "seed": seed,
+        "osd_calls_avoided": confident,
+        "osd_calls_avoided_pct": round(100.0 * confident / count, 1) if count else 0,
+        "estimate_accuracy_when_confident": (
+            round(confident_correct / confident, 4) if confident else None
+        ),
+        "estimate_time": timing_summary(estimate_times),
+        "by_layout": {
+            layout: {
+                "images": stats["images"],
+                "osd_calls_avoided": stats["confident"],
+                "estimate_accuracy_when_confident": (
+                    round(stats["confident_correct"] / stats["confident"], 4)
+                    if stats["confident"]
+                    else None
+                ),
+            }
+            for layout, stats in by_layout.items()
+        },
+    }
+    if with_osd:
+        result.update(
+            {
+                "osd_accuracy": round(osd_correct / count, 4) if count else None,
+                "osd_time": timing_summary(osd_times),
+                "pipeline_accuracy": (
+                    round(pipeline_correct / count, 4) if count else None
+                ),
+            }
+        )
+    return result
+
+
+# ----------------- benchmark de extração de documentos -----------------
+
+DOCUMENT_CASES = (
+    "native_pdf",
+    "scanned_pdf",
+    "rotated_pdf",
+    "rotated_image",
+    "long_strip",
+    "docx",
+    "xlsx",
+)
+
+# métricas comparadas entre execuções; True = maior é melhor
+COMPARED_METRICS = {
+    "pages_per_s": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "peak_rss_mb": False,
+    "char_accuracy": True,
+}
+
+
+def _native_pdf(rng: random.Random, pages: int) -> Tuple[bytes, str]:
+    doc = fitz.open()
+    expected = []
+    for _ in range(pages):
+        page = doc.new_page()
+        lines = [_lab_line(rng) for _ in range(30)]
+        page.insert_text((72, 72), "\n".join(lines), fontsize=11)
+        expected.extend(lines)
+    data = doc.tobytes()
+    doc.close()
+    return data, "\n".join(expected)
+
+
+def _scanned_pdf(
+    rng: random.Random, pages: int, rotations: Tuple[int, ...] = (0,)
+) -> Tuple[bytes, str]:
+    doc = fitz.open()
+    expected = []
+    for _ in range(pages):
+        img, text = make_text_page(rng, lines=25)
+        img = img.rotate(rng.choice(rotations), expand=True, fillcolor=255)
+        with BytesIO() as buf:
+            img.save(buf, "PNG")
+            stream = buf.getvalue()
+        # página do tamanho da imagem a 200 DPI, como um scanner
+        page = doc.new_page(width=img.width * 72 / 200, height=img.height * 72 / 200)
+        page.insert_image(page.rect, stream=stream)
+        expected.append(text)
+    data = doc.tobytes()
+    doc.close()
+    return data, "\n".join(expected)
+
+
+def _rotated_image(rng: random.Random) -> Tuple[Image.Image, str]:
+    img, text = make_text_page(rng, lines=20)
+    img = img.rotate(rng.choice([90, 180, 270]), expand=True, fillcolor=255)
+    img.info["dpi"] = (200, 200)
+    return img, text
+
+
+def _long_strip(rng: random.Random) -> Tuple[Image.Image, str]:
+    # ex.: print de conversa ou laudo "rolado", muito mais alto que largo
+    img, text = make_text_page(rng, lines=150, size=(1200, 12500))
+    return img, text
+
+
+def _docx(rng: random.Random) -> Tuple[bytes, str]:
+    document = docx.Document()
+    expected = []
+    for _ in range(40):
+        line = _lab_line(rng)
+        document.add_paragraph(line)
+        expected.append(line)
+    table = document.add_table(rows=10, cols=3)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = rng.choice(LAB_WORDS)
+            expected.append(cell.text)
+    with BytesIO() as buf:
+        document.save(buf)
+        return buf.getvalue(), "\n".join(expected)
+
+
+def _xlsx(rng: random.Random) -> Tuple[bytes, str]:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Resultados"
+    expected = []
+    sheet.append(["Exame", "Resultado", "Unidade"])
+    for _ in range(200):
+        row = [rng.choice(LAB_WORDS), str(rng.randint(1, 500)), rng.choice(LAB_WORDS)]
+        sheet.append(row)
+        expected.append(" ".join(row))
+    with BytesIO() as buf:
+        workbook.save(buf)
+        return buf.getvalue(), "\n".join(expected)
+
+
+def generate_document_corpus(
+    directory: str, docs: int = 3, pages: int = 5, seed: int = 0
+) -> Dict[str, List[dict]]:
+    """
+    Escreve o corpus em `directory` (um arquivo por documento, mais o texto
+    esperado) e devolve {caso: [{"path", "expected_path", "pages"}]}.
+    """
+    rng = random.Random(seed)
+    corpus = {case: [] for case in DOCUMENT_CASES}
+
+    def write(case: str, index: int, ext: str, content, expected: str, n_pages=1):
+        path = os.path.join(directory, f"{case}-{index}.{ext}")
+        if isinstance(content, Image.Image):
+            content.save(path, dpi=content.info.get("dpi", (72, 72)))
+        else:
+            with open(path, "wb") as f:
+                f.write(content)
+        expected_path = f"{path}.expected.txt"
+        with open(expected_path, "w", encoding="utf-8") as f:
+            f.write(expected)
+        corpus[case].append(
+            {"path": path, "expected_path": expected_path, "pages": n_pages}
+        )
+
+    os.makedirs(directory, exist_ok=True)
+    for i in range(docs):
+        write("native_pdf", i, "pdf", *_native_pdf(rng, pages), n_pages=pages)
+        write("scanned_pdf", i, "pdf", *_scanned_pdf(rng, pages), n_pages=pages)
+        write(
+            "rotated_pdf",
+            i,
+            "pdf",
+            *_scanned_pdf(rng, pages, rotations=(90, 180, 270)),
+            n_pages=pages,
+        )
+        write("rotated_image", i, "png", *_rotated_image(rng))
+        write("long_strip", i, "png", *_long_strip(rng))
+        write("docx", i, "docx", *_docx(rng))
+        write("xlsx", i, "xlsx", *_xlsx(rng))
+    return corpus
+
+
+_PAGE_MARKER = re.compile(r"^Page \d+:$", re.MULTILINE)
+
+
+def char_accuracy(expected: str, extracted: str) -> float:
+    """1 - distância de Levenshtein / tamanho esperado, ignorando espaços."""
+    expected = "".join(expected.split())
+    extracted = "".join(_PAGE_MARKER.sub("", extracted or "").split())
+    if not expected:
+        return 1.0 if not extracted else 0.0
+    distance = levenshtein_distance(expected, extracted)
+    return max(0.0, 1.0 - distance / len(expected))
+
+
+def _extract(case: str, path: str) -> str:
+    # import tardio: roda no processo filho
+    from common.utils.document import (
+        extract_text_from_docx,
+        extract_text_from_pdf,
+        extract_text_from_xlsx,
+    )
+    from common.utils.image import extract_text_from_image
+
+    if case.endswith("_pdf"):
+        text, _ = extract_text_from_pdf(path)
+        return text
+    if case == "docx":
+        return extract_text_from_docx(path)
+    if case == "xlsx":
+        return extract_text_from_xlsx(path)
+    with Image.open(path) as img:
+        img.load()
+        return extract_text_from_image(img)
+
+
+def _init_case_process():
+    # comando roda dentro do Django; o processo novo precisa do setup também
+    if os.environ.get("DJANGO_SETTINGS_MODULE"):
+        import django
+
+        django.setup()
+
+
+def _run_case(case: str, items: List[dict]) -> dict:
+    # carrega os módulos de extração antes de medir o primeiro documento
+    import common.utils.document  # noqa: F401
+    from common.utils.image import get_text_region_stats
+    from common.utils.ocr_governor import get_ocr_governor_stats
+    from common.utils.ocr_lang import get_ocr_lang_stats
+
+    durations, accuracies = [], []
+    pages = 0
+    errors = 0
+    for item in items:
+        with open(item["expected_path"], encoding="utf-8") as f:
+            expected = f.read()
+        try:
+            text, elapsed = timed(_extract, case, item["path"])
+        except Exception:
+            logger.exception(f"Error extracting {item['path']}")
+            errors += 1
+            continue
+        durations.append(elapsed)
+        accuracies.append(char_accuracy(expected, text))
+        pages += item["pages"]
+
+    total = sum(durations)
+    return {
+        "documents": len(items),
+        "errors": errors,
+        "pages": pages,
+        "total_s": round(total, 3),
+        "pages_per_s": round(pages / total, 3) if total else None,
+        **timing_summary(durations),
+        # ru_maxrss em KB no Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "char_accuracy": (
+            round(statistics.mean(accuracies), 4) if accuracies else None
+        ),
+        # imagens por língua escolhida no lang="auto" (processo do caso)
+        "ocr_langs": get_ocr_lang_stats(),
+        # pixels enviados ao Tesseract vs. pixels das páginas
+        "ocr_regions": get_text_region_stats(),
+        # limite de OCRs simultâneos e espera na fila
+        "ocr_governor": get_ocr_governor_stats(),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        return None
+
+
+def benchmark_documents(
+    corpus_dir: str,
+    docs: int = 3,
+    pages: int = 5,
+    seed: int = 0,
+    cases: Optional[List[str]] = None,
+) -> dict:
+    """
+    Gera o corpus em `corpus_dir` e mede cada caso num processo novo (para o
+    pico de RSS ser só daquele caso): páginas/s, latência p50/p95 por
+    documento, pico de RSS e acurácia de caracteres.
+    """
+    corpus = generate_document_corpus(corpus_dir, docs=docs, pages=pages, seed=seed)
+    cases = cases or list(DOCUMENT_CASES)
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=context, initializer=_init_case_process
+        ) as pool:
+            results[case] = pool.submit(_run_case, case, corpus[case]).result()
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "cpus": len(os.sched_getaffinity(0)),
+            "seed": seed,
+            "docs_per_case": docs,
+            "pages_per_pdf": pages,
+            "env": {
+                key: os.environ[key]
+                for key in sorted(os.environ)
+                if key.startswith("OCR_")
+            },
+        },
+        "cases": results,
+    }
+
+
+def compare_benchmarks(baseline: dict, current: dict) -> dict:
+    """Variação percentual por caso/métrica e se ela é melhora ou piora."""
+    comparison = {}
+    for case, metrics in current.get("cases", {}).items():
+        before = baseline.get("cases", {}).get(case)
+        if not before:
+            continue
+        comparison[case] = {}
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            improved = change > 0 if higher_is_better else change < 0
+            comparison[case][metric] = {
+                "before": old,
+                "after": new,
+                "change_pct": round(change, 1),
+                "improved": improved if change else None,
+            }
+    return comparison
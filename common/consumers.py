@@ -1,13 +1,27 @@
-from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, reduce, wraps
 from operator import or_
+import asyncio
 import base64
 import orjson
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.paginator import EmptyPage, Paginator
+from django.db import close_old_connections
 from django.db.models import Q, QuerySet
+from djangochannelsrestframework import permissions
+from djangochannelsrestframework.consumers import AsyncAPIConsumer
 from djangochannelsrestframework.decorators import action
 from djangochannelsrestframework.mixins import ListModelMixin
 from rest_framework import status
+from rest_framework.exceptions import Throttled
+
+from common.utils.task import (
+    TASK_FINISHED_STATES,
+    get_task_progress,
+    task_progress_group,
+)
 
 
 def _b64e(obj: dict) -> str:
@@ -20,6 +34,104 @@ def _b64d(s: str) -> dict:
     return orjson.loads(base64.urlsafe_b64decode((s + pad).encode()))
 
 
+_action_executor: ThreadPoolExecutor | None = None
+
+
+def _get_action_executor() -> ThreadPoolExecutor:
+    global _action_executor
+    if _action_executor is None:
+        _action_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "WS_ACTION_POOL_SIZE", 4),
+            thread_name_prefix="ws-action",
+        )
+    return _action_executor
+
+
+def _run_with_own_connection(func, *args, **kwargs):
+    # cada thread do pool mantém sua própria conexão (thread-local do Django)
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def get_action_slots(scope: dict) -> asyncio.Semaphore:
+    """
+    Semáforo de ações em andamento da conexão.
+
+    O demultiplexer compartilha o mesmo scope com todos os streams, então o
+    limite vale para a conexão inteira e não por stream.
+    """
+    slots = scope.get("ws_action_slots")
+    if slots is None:
+        slots = scope["ws_action_slots"] = asyncio.Semaphore(
+            getattr(settings, "WS_ACTION_MAX_IN_FLIGHT", 20)
+        )
+    return slots
+
+
+def pooled_action(**kwargs):
+    """
+    Variante do @action() para ações somente leitura.
+
+    Em vez do executor thread-sensitive único do `database_sync_to_async`
+    (que serializa o trabalho de banco de todos os sockets do processo),
+    executa a ação num pool de threads limitado, cada uma com sua própria
+    conexão, e de forma "detached" para não travar o stream. Cada conexão
+    tem no máximo `WS_ACTION_MAX_IN_FLIGHT` ações em andamento: a vaga é
+    tomada antes de criar a task, e pedidos além disso recebem 429.
+
+    Com `WS_ACTION_EXECUTION_MODE = "serial"` se comporta como @action().
+    """
+
+    def decorator(func):
+        if getattr(settings, "WS_ACTION_EXECUTION_MODE", "pooled") != "pooled":
+            return action(**kwargs)(func)
+
+        async def run(self, *args, **_kwargs):
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    _get_action_executor(),
+                    partial(_run_with_own_connection, func, self, *args, **_kwargs),
+                )
+            finally:
+                get_action_slots(self.scope).release()
+
+        run_detached = action(detached=True, **kwargs)(run)
+
+        @wraps(func)
+        async def pooled(self, *args, **_kwargs):
+            slots = get_action_slots(self.scope)
+            if slots.locked():
+                raise Throttled(detail="Too many actions in flight.")
+            # não espera: com a vaga livre, acquire() retorna na hora
+            await slots.acquire()
+            try:
+                # a resposta sai da task detached; aqui não há o que responder
+                await run_detached(self, *args, **_kwargs)
+            except BaseException:
+                slots.release()
+                raise
+
+        return action(**kwargs)(pooled)
+
+    return decorator
+
+
+class PooledActionsMixin:
+    """
+    Necessário em consumers que usam @pooled_action: o
+    `AsyncAPIConsumer.detached_tasks` é um atributo de classe, e no
+    disconnect de um socket cancelaria as tasks de todos os outros.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.detached_tasks = []
+
+
 class BaseConsumer:
     @classmethod
     async def decode_json(cls, text_data):
@@ -42,7 +154,7 @@ class BaseConsumer:
             raise
 
 
-class PaginatedListModelMixin(ListModelMixin):
+class PaginatedListModelMixin(PooledActionsMixin, ListModelMixin):
     """
     Mantém seu comportamento atual (LIMIT/OFFSET),
     e ativa keyset quando pager.useKeyset = True.
@@ -312,6 +424,69 @@ class PaginatedListModelMixin(ListModelMixin):
             }
         return data_resp, status.HTTP_200_OK
 
-    @action()
+    @pooled_action()
     def paginate(self, **kwargs):
         return self._perform_paginate(**kwargs)
+
+
+class TaskProgressConsumer(AsyncAPIConsumer):
+    """
+    Stream de progresso de tasks Celery (ver `common.utils.task.ProgressTask`).
+
+    O cliente assina com `{"action": "subscribe", "data": {"task_id": ...}}`
+    e recebe `{"action": "progress", ...}` a cada atualização, até
+    SUCCESS/FAILURE, sem precisar fazer polling. Ids sem nenhum estado
+    publicado (desconhecidos ou expirados) respondem 404.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # task_id -> request_id da assinatura
+        self.task_subscriptions = {}
+
+    @action()
+    async def subscribe(self, request_id=None, data=None, **kwargs):
+        task_id = (data or {}).get("task_id")
+        user_id = self.scope["user"].id
+        # entra no grupo antes de ler o estado: o que for publicado entre as
+        # duas coisas chega pelo grupo em vez de se perder
+        await self.add_group(task_progress_group(user_id))
+        self.task_subscriptions[task_id] = request_id
+
+        snapshot = await sync_to_async(get_task_progress, thread_sensitive=False)(
+            task_id
+        )
+        # sem nada publicado (id desconhecido ou expirado) não há o que esperar;
+        # task de outro usuário responde igual, sem revelar que existe
+        if not snapshot or snapshot.get("user_id") != user_id:
+            await self._end_subscription(task_id)
+            return {"task_id": task_id}, status.HTTP_404_NOT_FOUND
+
+        if snapshot["state"] in TASK_FINISHED_STATES:
+            await self._end_subscription(task_id)
+        return snapshot, status.HTTP_200_OK
+
+    @action()
+    async def unsubscribe(self, data=None, **kwargs):
+        task_id = (data or {}).get("task_id")
+        await self._end_subscription(task_id)
+        return {"task_id": task_id}, status.HTTP_200_OK
+
+    async def _end_subscription(self, task_id):
+        self.task_subscriptions.pop(task_id, None)
+        if not self.task_subscriptions:
+            await self.remove_group(task_progress_group(self.scope["user"].id))
+
+    async def task_progress(self, event):
+        task_id = event["task_id"]
+        if task_id not in self.task_subscriptions:
+            return
+
+        request_id = self.task_subscriptions[task_id]
+        data = event["data"]
+        if data["state"] in TASK_FINISHED_STATES:
+            await self._end_subscription(task_id)
+
+        await self.reply(action="progress", data=data, request_id=request_id)
@@ -3,7 +3,10 @@ from users.models import User
 from users.serializers import UserSerializer
 from .models import Note
 from channels_redis.serializers import BaseMessageSerializer
+from django.conf import settings
+import brotli
 import orjson
+import zlib
 from channels_redis.serializers import registry
 
 
@@ -16,12 +19,53 @@ class CrossUserContextSerializer(serializers.Serializer):
         return None
 
 
+# Byte de cabeçalho das mensagens comprimidas. JSON serializado pelo orjson
+# nunca começa com bytes de controle, então mensagens sem cabeçalho continuam
+# sendo lidas como JSON puro (permite rollout gradual entre workers).
+_HEADER_ZLIB = b"\x01"
+_HEADER_BROTLI = b"\x02"
+
+
 class JSONSerializer(BaseMessageSerializer):
+    """
+    Serializer orjson do channel layer com compressão transparente.
+
+    Mensagens acima de ``CHANNEL_LAYERS_COMPRESSION_MIN_SIZE`` bytes são
+    comprimidas (brotli ou zlib) e prefixadas com um byte de cabeçalho;
+    mensagens menores seguem como JSON puro.
+    """
+
+    compression = getattr(settings, "CHANNEL_LAYERS_COMPRESSION", "brotli")
+    compression_min_size = getattr(
+        settings, "CHANNEL_LAYERS_COMPRESSION_MIN_SIZE", 4096
+    )
+    compression_level = getattr(settings, "CHANNEL_LAYERS_COMPRESSION_LEVEL", None)
+
     def as_bytes(self, message, *args, **kwargs):
         message = orjson.dumps(message, *args, **kwargs)
+        if (
+            self.compression in ("brotli", "zlib")
+            and len(message) >= self.compression_min_size
+        ):
+            return self.compress(message)
         return message
 
-    from_bytes = staticmethod(orjson.loads)
+    def from_bytes(self, message, *args, **kwargs):
+        header = message[:1]
+        if header == _HEADER_BROTLI:
+            message = brotli.decompress(message[1:])
+        elif header == _HEADER_ZLIB:
+            message = zlib.decompress(message[1:])
+        return orjson.loads(message)
+
+    def compress(self, message: bytes) -> bytes:
+        if self.compression == "brotli":
+            quality = 4 if self.compression_level is None else self.compression_level
+            return _HEADER_BROTLI + brotli.compress(
+                message, mode=brotli.MODE_TEXT, quality=quality
+            )
+        level = 3 if self.compression_level is None else self.compression_level
+        return _HEADER_ZLIB + zlib.compress(message, level)
 
 
 registry.register_serializer("json", JSONSerializer)
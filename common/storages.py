@@ -4,6 +4,7 @@ from storages.backends.s3boto3 import S3Boto3Storage
 
 # garante que ".opus" seja reconhecido
 mimetypes.add_type("audio/opus", ".opus", strict=False)
+mimetypes.add_type("image/webp", ".webp", strict=False)
 
 
 class ConditionalS3CacheStorage(S3Boto3Storage):
@@ -24,6 +25,9 @@ class ConditionalS3CacheStorage(S3Boto3Storage):
             params["CacheControl"] = "max-age=604800, public"  # 7 dias
         elif name.startswith("uploads/media"):
             params["CacheControl"] = "max-age=31536000, immutable, public"
+        elif name.startswith("ocr-pages/"):
+            # nome = SHA-256 do conteúdo (ver common.utils.page_images)
+            params["CacheControl"] = "max-age=31536000, immutable, private"
 
         # Content-Type
         lower = name.lower()
@@ -35,5 +39,7 @@ class ConditionalS3CacheStorage(S3Boto3Storage):
             params["ContentType"] = "video/mp4"
         elif lower.endswith(".m4a"):
             params["ContentType"] = "audio/mp4"
+        elif lower.endswith(".webp"):
+            params["ContentType"] = "image/webp"
 
         return params
@@ -0,0 +1,303 @@
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+from celery import chord, shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from common.utils.document import (
+    OCR_BATCH_PAGES,
+    DocumentTextError,
+    PageExtraction,
+    _convert_downloaded_file,
+    _document_cache_key,
+    _extract_pages,
+    _join_pages,
+    _open_pdf,
+    _page_batches,
+)
+from common.utils.ocr_cache import ocr_cache
+from common.utils.ocr_lang import LANG_AUTO
+from common.utils.requests import (
+    DownloadedFile,
+    download_to_tempfile,
+    storage_to_tempfile,
+)
+from common.utils.task import ProgressTask, publish_task_progress
+
+logger = logging.getLogger(__name__)
+
+OCR_TASK_CHUNK_PAGES = getattr(settings, "OCR_TASK_CHUNK_PAGES", 4)
+OCR_CHECKPOINT_TTL = getattr(settings, "OCR_CHECKPOINT_TTL", 24 * 60 * 60)
+OCR_SOURCE_PREFIX = "ocr-sources"
+OCR_SOURCE_LOCAL_DIR = os.path.join(tempfile.gettempdir(), "ocr-sources")
+OCR_SOURCE_LOCAL_MAX_AGE = 60 * 60
+
+# prioridade dos pedaços por tamanho do documento (no Redis, 0 sai primeiro):
+# um laudo de 2 páginas não fica atrás das 50 partes de um prontuário
+OCR_CHUNK_PRIORITIES = ((8, 0), (40, 3), (160, 6))
+OCR_CHUNK_LOWEST_PRIORITY = 9
+
+
+def _checkpoint_key(content_sha256: str, lang: str, pno: int) -> str:
+    return f"ocr_checkpoint:{content_sha256}:{lang}:{pno}"
+
+
+def _chunk_progress_key(task_id: str) -> str:
+    return f"ocr_chunk_progress:{task_id}"
+
+
+def _chunk_priority(page_count: int) -> int:
+    for max_pages, priority in OCR_CHUNK_PRIORITIES:
+        if page_count <= max_pages:
+            return priority
+    return OCR_CHUNK_LOWEST_PRIORITY
+
+
+def _store_source(download: DownloadedFile, task_id: str) -> str:
+    """
+    Publica o PDF no storage para os workers da fila "ocr" (que podem estar
+    em outro container). Um arquivo por execução: o finalize apaga o seu sem
+    afetar outra extração do mesmo documento em andamento.
+    """
+    name = f"{OCR_SOURCE_PREFIX}/{task_id}.pdf"
+    with open(download.path, "rb") as f:
+        return default_storage.save(name, File(f))
+
+
+def _cleanup_local_sources():
+    now = time.time()
+    try:
+        entries = os.scandir(OCR_SOURCE_LOCAL_DIR)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            try:
+                if now - entry.stat().st_mtime > OCR_SOURCE_LOCAL_MAX_AGE:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def _local_source(name: str) -> str:
+    """
+    Caminho local do PDF publicado por `_store_source`. Com storage em disco
+    usa o próprio arquivo; no S3, baixa uma vez por container e reaproveita
+    entre os pedaços do mesmo documento.
+    """
+    try:
+        return default_storage.path(name)
+    except NotImplementedError:
+        pass
+
+    path = os.path.join(OCR_SOURCE_LOCAL_DIR, os.path.basename(name))
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+
+    _cleanup_local_sources()
+    os.makedirs(OCR_SOURCE_LOCAL_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=OCR_SOURCE_LOCAL_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out, default_storage.open(name, "rb") as src:
+            shutil.copyfileobj(src, out)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return path
+
+
+@shared_task(bind=True, base=ProgressTask)
+def extract_document_text(
+    self,
+    file_url: Optional[str] = None,
+    lang: str = LANG_AUTO,
+    file_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Versão em Celery de `convert_document_url_to_text`. PDFs são divididos em
+    pedaços de OCR_TASK_CHUNK_PAGES páginas processados na fila "ocr" e
+    juntados por um chord; a task é substituída pelo workflow, então o id
+    (e o progresso no websocket) continua o mesmo até o resultado final.
+    `file_name`: lê do storage (ex.: `FileField.name`) em vez do URL, que
+    pode expirar enquanto a task espera na fila.
+    Devolve {"text", "file_type", "images"}.
+    """
+    if file_name:
+        source = storage_to_tempfile(file_name)
+    else:
+        source = download_to_tempfile(file_url)
+
+    with source as download:
+        mime_type = download.headers.get("Content-Type")
+
+        if mime_type != "application/pdf":
+            text, file_type, images = _convert_downloaded_file(download)
+            return {"text": text, "file_type": file_type, "images": images}
+
+        if lang == LANG_AUTO:
+            cached = ocr_cache.get(_document_cache_key(download.sha256, mime_type))
+            if cached is not None:
+                return cached
+
+        with _open_pdf(download.path) as doc:
+            if doc.needs_pass:
+                raise DocumentTextError("PDF is password protected.")
+            page_count = doc.page_count
+
+        source_name = _store_source(download, self.request.id)
+        content_sha256 = download.sha256
+
+    user_id = self._progress_user_id()
+    self.report_progress(0, page_count)
+
+    priority = _chunk_priority(page_count)
+    chunks = [
+        extract_pdf_chunk.s(
+            source_name,
+            content_sha256,
+            pnos,
+            lang=lang,
+            root_task_id=self.request.id,
+            page_count=page_count,
+            user_id=user_id,
+        ).set(priority=priority)
+        for pnos in _page_batches(page_count, OCR_TASK_CHUNK_PAGES)
+    ]
+    finalize = finalize_document_text.s(
+        source_name=source_name,
+        content_sha256=content_sha256,
+        mime_type=mime_type,
+        lang=lang,
+        progress_user_id=user_id,
+    )
+    logger.info(
+        f"Extracting {page_count} PDF pages in {len(chunks)} chunks "
+        f"(priority {priority}) for task {self.request.id}"
+    )
+    # o corpo do chord herda o id desta task (ver Task.replace)
+    return self.replace(chord(chunks, finalize))
+
+
+def _report_chunk_progress(
+    root_task_id: Optional[str], user_id, pages_done: int, page_count: Optional[int]
+):
+    if not root_task_id or not pages_done:
+        return
+    key = _chunk_progress_key(root_task_id)
+    cache.add(key, 0, OCR_CHECKPOINT_TTL)
+    current = cache.incr(key, pages_done)
+    if page_count:
+        # uma entrega repetida (worker perdido) pode contar páginas de novo
+        current = min(current, page_count)
+    publish_task_progress(
+        root_task_id, user_id, "PROGRESS", current=current, total=page_count
+    )
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    max_retries=3,
+)
+def extract_pdf_chunk(
+    self,
+    source_name: str,
+    content_sha256: str,
+    pnos: List[int],
+    lang: str = LANG_AUTO,
+    root_task_id: Optional[str] = None,
+    page_count: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Extrai um pedaço de páginas do PDF. Cada página concluída vira um
+    checkpoint no cache compartilhado: se o worker cair ou a task estourar o
+    tempo, a nova tentativa só processa o que faltou.
+    """
+    keys = {pno: _checkpoint_key(content_sha256, lang, pno) for pno in pnos}
+    done = cache.get_many(list(keys.values()))
+    pages = {pno: done[key] for pno, key in keys.items() if key in done}
+    missing = [pno for pno in pnos if pno not in pages]
+    if not self.request.retries:
+        # páginas que vieram de uma execução anterior do mesmo documento
+        _report_chunk_progress(root_task_id, user_id, len(pages), page_count)
+
+    try:
+        if missing:
+            with _open_pdf(_local_source(source_name)) as doc:
+                for start in range(0, len(missing), OCR_BATCH_PAGES):
+                    batch = missing[start : start + OCR_BATCH_PAGES]
+                    extracted = [
+                        asdict(page) for page in _extract_pages(doc, batch, lang)
+                    ]
+                    cache.set_many(
+                        {keys[page["number"]]: page for page in extracted},
+                        OCR_CHECKPOINT_TTL,
+                    )
+                    pages.update((page["number"], page) for page in extracted)
+                    _report_chunk_progress(
+                        root_task_id, user_id, len(extracted), page_count
+                    )
+    except Exception as e:
+        if (
+            isinstance(e, SoftTimeLimitExceeded)
+            and self.request.retries < self.max_retries
+        ):
+            logger.warning(
+                f"Chunk {pnos[0]}-{pnos[-1]} of {source_name} hit the time limit, "
+                f"resuming from {len(pages)}/{len(pnos)} pages"
+            )
+            raise self.retry(exc=e, countdown=1)
+        # o chord falha sem rodar o finalize; avisa o dono pelo id original
+        if root_task_id:
+            publish_task_progress(root_task_id, user_id, "FAILURE", error=str(e))
+        raise
+
+    return [pages[pno] for pno in pnos]
+
+
+@shared_task(bind=True, base=ProgressTask)
+def finalize_document_text(
+    self,
+    chunks: List[List[Dict[str, Any]]],
+    source_name: str,
+    content_sha256: str,
+    mime_type: str,
+    lang: str = LANG_AUTO,
+) -> Dict[str, Any]:
+    """Junta os pedaços na ordem das páginas, grava o cache e limpa o resto."""
+    pages = sorted(
+        (PageExtraction(**page) for chunk in chunks for page in chunk),
+        key=lambda page: page.number,
+    )
+    text, images = _join_pages(pages)
+    result = {"text": text, "file_type": "pdf", "images": images}
+
+    if lang == LANG_AUTO:
+        ocr_cache.set(_document_cache_key(content_sha256, mime_type), result)
+
+    cache.delete_many(
+        [_checkpoint_key(content_sha256, lang, page.number) for page in pages]
+        + [_chunk_progress_key(self.request.id)]
+    )
+    try:
+        default_storage.delete(source_name)
+    except Exception as e:
+        logger.warning(f"Could not delete OCR source {source_name}: {str(e)}")
+
+    return result
@@ -1,3 +1,413 @@
-from django.test import TestCase
+import os
+import random
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+import fitz  # PyMuPDF
+import openpyxl
+import orjson
+from channels_redis.serializers import registry
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from common import throttling
+from common.benchmark import make_key_value_page, make_table_page
+from common.serializers import JSONSerializer
+from common.throttling import ConnectionThrottle, TokenBucket
+from common.utils.document import (
+    STRATEGY_IMAGE_OCR,
+    STRATEGY_NATIVE,
+    STRATEGY_RENDER_OCR,
+    TRUNCATED_MARKER,
+    _TextBuffer,
+    classify_page,
+    extract_text_from_xlsx,
+    profile_page,
+)
+from common.utils.image import estimate_orientation
+from common.utils.lab_results import parse_collection_date, parse_lab_results
+from common.utils.text_index import TextIndex
+
+
+class JSONSerializerTests(SimpleTestCase):
+    def setUp(self):
+        self.serializer = JSONSerializer()
+        self.serializer.compression_min_size = 256
+        self.small = {"type": "task.progress", "text": "ok"}
+        self.large = {"type": "task.progress", "text": "resultado do exame " * 100}
+
+    def test_registered_as_json_format(self):
+        self.assertIsInstance(registry.get_serializer("json"), JSONSerializer)
+
+    def test_small_message_stays_plain_json(self):
+        data = self.serializer.as_bytes(self.small)
+        self.assertEqual(data, orjson.dumps(self.small))
+        self.assertEqual(self.serializer.from_bytes(data), self.small)
+
+    def test_large_message_is_compressed_and_round_trips(self):
+        for compression, header in (("brotli", b"\x02"), ("zlib", b"\x01")):
+            with self.subTest(compression=compression):
+                self.serializer.compression = compression
+                data = self.serializer.as_bytes(self.large)
+                self.assertEqual(data[:1], header)
+                self.assertLess(len(data), len(orjson.dumps(self.large)))
+                self.assertEqual(self.serializer.from_bytes(data), self.large)
+
+    def test_compression_disabled(self):
+        self.serializer.compression = None
+        data = self.serializer.as_bytes(self.large)
+        self.assertEqual(data, orjson.dumps(self.large))
+
+    def test_reads_legacy_unprefixed_frames(self):
+        # workers sem compressão mandam JSON puro mesmo em mensagens grandes
+        legacy = orjson.dumps(self.large)
+        self.assertEqual(self.serializer.from_bytes(legacy), self.large)
+
+    def test_serialize_round_trip_with_random_prefix(self):
+        serializer = JSONSerializer(random_prefix_length=12)
+        serializer.compression_min_size = 256
+        for message in (self.small, self.large):
+            with self.subTest(size=len(orjson.dumps(message))):
+                data = serializer.serialize(message)
+                self.assertEqual(serializer.deserialize(data), message)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("common.throttling.time.monotonic", return_value=100.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_starts_full_and_refills_at_rate(self):
+        bucket = TokenBucket(rate=2, capacity=4)
+        self.assertEqual(bucket.wait_time(4), 0.0)
+        bucket.take(4)
+        self.assertEqual(bucket.wait_time(1), 0.5)
+        self.clock.return_value = 101.0
+        self.assertEqual(bucket.wait_time(2), 0.0)
+
+    def test_never_refills_past_capacity(self):
+        bucket = TokenBucket(rate=2, capacity=4)
+        self.clock.return_value = 1000.0
+        bucket.take(4)
+        self.assertEqual(bucket.wait_time(1), 0.5)
+
+    def test_cost_above_capacity_never_fits(self):
+        self.assertEqual(TokenBucket(rate=2, capacity=4).wait_time(5), float("inf"))
+
+
+@override_settings(
+    WS_THROTTLE_RATE=1,
+    WS_THROTTLE_BURST=2,
+    WS_THROTTLE_USER_RATE=1,
+    WS_THROTTLE_USER_BURST=3,
+    WS_THROTTLE_MAX_DEFER=0.1,
+    WS_THROTTLE_ACTION_COSTS={"search": 2},
+)
+class ConnectionThrottleTests(SimpleTestCase):
+    def setUp(self):
+        throttling._user_buckets.clear()
+        self.addCleanup(throttling._user_buckets.clear)
+        patcher = mock.patch.object(ConnectionThrottle, "_record")
+        self.record = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_allows_burst_then_rejects_with_retry_after(self):
+        throttle = ConnectionThrottle()
+        self.assertEqual(await throttle.acquire("list"), (True, None))
+        self.assertEqual(await throttle.acquire("list"), (True, None))
+        allowed, retry_after = await throttle.acquire("list")
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.0, places=1)
+        self.record.assert_called_once_with("rejected", "list")
+
+    async def test_defers_short_waits(self):
+        with override_settings(WS_THROTTLE_RATE=50):
+            throttle = ConnectionThrottle()
+        await throttle.acquire("list")
+        await throttle.acquire("list")
+        # falta 1 token a 50/s: 20 ms de espera, dentro do WS_THROTTLE_MAX_DEFER
+        self.assertEqual(await throttle.acquire("list"), (True, None))
+        self.record.assert_called_once_with("deferred", "list")
+
+    async def test_action_cost_and_oversized_action(self):
+        throttle = ConnectionThrottle()
+        self.assertEqual(await throttle.acquire("search"), (True, None))
+        self.assertFalse((await throttle.acquire("list"))[0])
+        with override_settings(WS_THROTTLE_ACTION_COSTS={"export": 5}):
+            throttle = ConnectionThrottle()
+        # nunca caberia no bucket: sem retry_after
+        self.assertEqual(await throttle.acquire("export"), (False, None))
+
+    async def test_user_bucket_is_shared_between_connections(self):
+        first, second = ConnectionThrottle(user_id=1), ConnectionThrottle(user_id=1)
+        self.assertTrue((await first.acquire("list"))[0])
+        self.assertTrue((await first.acquire("list"))[0])
+        self.assertTrue((await second.acquire("list"))[0])
+        # o bucket da segunda conexão ainda tem token, o do usuário não
+        self.assertFalse((await second.acquire("list"))[0])
+        self.assertTrue((await ConnectionThrottle(user_id=2).acquire("list"))[0])
+
+
+class ClassifyPageTests(SimpleTestCase):
+    # A4 em pontos; uma imagem de 1654 px na largura dá 200 DPI
+    page_size = (595, 842)
+
+    def make_page(self, text=None, image_size=None, image_rect=None, rotation=0):
+        doc = fitz.open()
+        self.addCleanup(doc.close)
+        page = doc.new_page(width=self.page_size[0], height=self.page_size[1])
+        if text:
+            page.insert_text((72, 72), text)
+        if image_size:
+            buffer = BytesIO()
+            Image.new("L", image_size, 255).save(buffer, format="PNG")
+            page.insert_image(image_rect or page.rect, stream=buffer.getvalue())
+        if rotation:
+            page.set_rotation(rotation)
+        return page
+
+    def classify(self, **kwargs) -> str:
+        return classify_page(profile_page(self.make_page(**kwargs)))
+
+    def test_text_layer_is_native(self):
+        text = "Hemoglobina 12,5 g/dL 12,0 a 16,0"
+        self.assertEqual(self.classify(text=text), STRATEGY_NATIVE)
+
+    def test_short_text_without_scan_is_native(self):
+        self.assertEqual(self.classify(text="Página 1"), STRATEGY_NATIVE)
+
+    def test_scan_with_enough_resolution_uses_image_ocr(self):
+        self.assertEqual(self.classify(image_size=(1654, 2339)), STRATEGY_IMAGE_OCR)
+        # carimbo curto de texto por cima do scan não conta como texto nativo
+        self.assertEqual(
+            self.classify(text="Página 1", image_size=(1654, 2339)),
+            STRATEGY_IMAGE_OCR,
+        )
+
+    def test_low_resolution_scan_is_rendered(self):
+        self.assertEqual(self.classify(image_size=(827, 1170)), STRATEGY_RENDER_OCR)
+
+    def test_rotated_page_is_rendered(self):
+        self.assertEqual(
+            self.classify(image_size=(1654, 2339), rotation=90), STRATEGY_RENDER_OCR
+        )
+
+    def test_small_image_without_text_is_rendered(self):
+        logo = fitz.Rect(72, 72, 272, 172)
+        self.assertEqual(
+            self.classify(image_size=(600, 300), image_rect=logo),
+            STRATEGY_RENDER_OCR,
+        )
+
+
+class EstimateOrientationTests(SimpleTestCase):
+    def rotated(self, img, rotate, skew=0.0):
+        # girar `rotate` graus anti-horário pede `rotate` graus horário de volta
+        return img.rotate(skew, expand=True, fillcolor=255).rotate(
+            rotate, expand=True, fillcolor=255
+        )
+
+    def assert_orientation(self, page_factory):
+        img, _ = page_factory(random.Random(0), 15)
+        for rotate in (0, 90, 180, 270):
+            with self.subTest(rotate=rotate):
+                estimate = estimate_orientation(self.rotated(img, rotate, skew=1.5))
+                self.assertTrue(estimate.confident)
+                self.assertEqual(estimate.rotate, rotate)
+
+    def test_table_layout(self):
+        self.assert_orientation(make_table_page)
+
+    def test_short_left_aligned_lines(self):
+        self.assert_orientation(make_key_value_page)
+
+    def test_not_confident_without_enough_text(self):
+        blank = Image.new("L", (1654, 2339), 255)
+        self.assertFalse(estimate_orientation(blank).confident)
+        img, _ = make_table_page(random.Random(0), 1)
+        self.assertFalse(estimate_orientation(self.rotated(img, 90)).confident)
+        # letras miúdas demais na cópia reduzida: o sentido fica para o OSD
+        img, _ = make_table_page(random.Random(0), 15, font_size=14)
+        self.assertFalse(estimate_orientation(self.rotated(img, 180)).confident)
+
+
+class TextBufferTests(SimpleTestCase):
+    def test_keeps_lines_under_the_cap(self):
+        text = _TextBuffer(max_chars=20)
+        self.assertTrue(text.append("Glicose 98"))
+        self.assertTrue(text.append("Ureia 30"))
+        self.assertFalse(text.truncated)
+        self.assertEqual(text.getvalue(), "Glicose 98\nUreia 30")
+
+    def test_cuts_the_line_that_crosses_the_cap(self):
+        text = _TextBuffer(max_chars=10)
+        self.assertTrue(text.append("abcd"))
+        self.assertFalse(text.append("efghij"))
+        self.assertTrue(text.truncated)
+        # o "\n" entre as linhas conta: 4 + 1 + 5 = 10
+        self.assertEqual(text.getvalue(), f"abcd\nefghi\n{TRUNCATED_MARKER}")
+        self.assertFalse(text.append("mais"))
+        text.truncate()
+        self.assertEqual(text.getvalue().count(TRUNCATED_MARKER), 1)
+
+    def make_xlsx(self, rows) -> bytes:
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Exames"
+        for row in rows:
+            sheet.append(row)
+        buffer = BytesIO()
+        workbook.save(buffer)
+        return buffer.getvalue()
+
+    def test_xlsx_stops_at_the_cell_cap(self):
+        source = self.make_xlsx([["Glicose", 98], ["Ureia", 30], ["Sódio", 140]])
+        self.assertEqual(
+            extract_text_from_xlsx(source).splitlines(),
+            ["Sheet: Exames", "", "Glicose\t98", "Ureia\t30", "Sódio\t140"],
+        )
+        with mock.patch("common.utils.document.XLSX_MAX_CELLS", 4):
+            self.assertEqual(
+                extract_text_from_xlsx(source).splitlines(),
+                ["Sheet: Exames", "", "Glicose\t98", "Ureia\t30", TRUNCATED_MARKER],
+            )
+
+
+class ParseLabResultsTests(SimpleTestCase):
+    report = """LABORATÓRIO EXEMPLO
+Paciente: Maria da Silva   Idade: 85 anos
+Data da coleta: 12/03/2025   Página 1 de 2
+GLICOSE ........ 98 mg/dL    70 a 99 mg/dL
+Creatinina: 1,4 mg/dL (VR: 0,6 a 1,3)
+Hemoglobina | 12,5 | g/dL | 12,0 - 16,0
+Plaquetas\t250.000\t/mm3\t150.000 a 450.000
+Hemoglobina glicada (HbA1c) 6,1 % até 5,6
+HIV 1 e 2: Não reagente
+UREIA
+Método: Enzimático
+Resultado: 48 mg/dL
+Valores de referência: 15 a 45 mg/dL
+CRM 12345
+GLICOSE ........ 98 mg/dL    70 a 99 mg/dL
+"""
+
+    def setUp(self):
+        self.results = {r.analyte_key: r for r in parse_lab_results(self.report)}
+
+    def test_finds_each_result_once(self):
+        self.assertEqual(
+            list(self.results),
+            [
+                "glicose",
+                "creatinina",
+                "hemoglobina",
+                "plaquetas",
+                "hemoglobina_glicada",
+                "hiv_1_e_2",
+                "ureia",
+            ],
+        )
+
+    def test_numeric_result_with_reference(self):
+        creatinina = self.results["creatinina"]
+        self.assertEqual(creatinina.value, Decimal("1.4"))
+        self.assertEqual(creatinina.unit, "mg/dL")
+        self.assertEqual(
+            (creatinina.reference_min, creatinina.reference_max),
+            (Decimal("0.6"), Decimal("1.3")),
+        )
+        self.assertTrue(creatinina.is_abnormal)
+        self.assertFalse(self.results["glicose"].is_abnormal)
+
+    def test_table_and_count_formats(self):
+        self.assertEqual(self.results["hemoglobina"].value, Decimal("12.5"))
+        plaquetas = self.results["plaquetas"]
+        self.assertEqual(plaquetas.value, Decimal(250000))
+        self.assertEqual(plaquetas.reference_max, Decimal(450000))
+        glicada = self.results["hemoglobina_glicada"]
+        self.assertEqual((glicada.unit, glicada.reference_max), ("%", Decimal("5.6")))
+
+    def test_qualitative_result_with_number_in_name(self):
+        hiv = self.results["hiv_1_e_2"]
+        self.assertEqual((hiv.analyte, hiv.value_text), ("HIV 1 e 2", "Não reagente"))
+        self.assertIsNone(hiv.value)
+        self.assertIsNone(hiv.is_abnormal)
+
+    def test_block_format(self):
+        ureia = self.results["ureia"]
+        self.assertEqual((ureia.value, ureia.unit), (Decimal(48), "mg/dL"))
+        self.assertEqual(ureia.reference_max, Decimal(45))
+        self.assertTrue(ureia.is_abnormal)
+
+    def test_collection_date(self):
+        self.assertEqual(parse_collection_date(self.report), date(2025, 3, 12))
+        self.assertIsNone(parse_collection_date("Emitido em 13/03/2025"))
+
+
+class TextIndexTests(SimpleTestCase):
+    documents = (
+        (1, "Hemograma completo: hemoglobina 12,5 g/dL, leucócitos 6.500 /mm³"),
+        (2, "Glicose de jejum 98 mg/dL, hemoglobina glicada 6,1 %"),
+        (3, "Ultrassonografia de abdome total sem alterações"),
+    )
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        self.index = TextIndex(self.directory, dim=1024)
+        for doc_id, text in self.documents:
+            self.index.add(doc_id, text, group=doc_id % 2)
+
+    def test_query_ranks_similar_documents(self):
+        results = self.index.query("hemoglobina glicada e glicose de jejum")
+        self.assertEqual(results[0][0], 2)
+        self.assertNotIn(3, [doc_id for doc_id, _ in results])
+        self.assertGreater(results[0][1], results[-1][1])
+
+    def test_query_filters(self):
+        query = "hemoglobina"
+        self.assertEqual([i for i, _ in self.index.query(query, group=1)], [1])
+        self.assertNotIn(2, [i for i, _ in self.index.query(query, exclude=2)])
+        self.assertEqual(len(self.index.query(query, limit=1)), 1)
+        self.assertEqual(self.index.query(""), [])
+
+    def test_replace_and_remove(self):
+        self.index.add(2, "Ultrassonografia de tireoide")
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.query("glicose de jejum"), [])
+        self.index.remove(3)
+        self.index.add(1, "")
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.index.query("ultrassonografia")[0][0], 2)
+
+    def test_shared_between_instances(self):
+        other = TextIndex(self.directory, dim=1024)
+        self.assertEqual(len(other), 3)
+        other.add(4, "Glicose pós-prandial 140 mg/dL")
+        # o arquivo mudou: a outra instância recarrega na próxima leitura
+        self.assertIn(4, [i for i, _ in self.index.query("glicose pós-prandial")])
+        # outra dimensão é outro arquivo
+        self.assertEqual(len(TextIndex(self.directory, dim=512)), 0)
+
+    def test_compacts_removed_records(self):
+        with mock.patch("common.utils.text_index.TEXT_INDEX_COMPACT_MIN", 4):
+            for _ in range(3):
+                for doc_id, text in self.documents:
+                    self.index.add(doc_id, text)
+        record_size = self.index.dtype.itemsize
+        self.assertLess(os.path.getsize(self.index.path), 12 * record_size)
+        self.assertEqual(len(self.index), 3)
+
+    def test_rebuild(self):
+        count = self.index.rebuild([(7, "Creatinina 0,9 mg/dL", 0), (8, "", 0)])
+        self.assertEqual(count, 1)
+        self.assertEqual([i for i, _ in self.index.query("creatinina")], [7])
+
+    def test_dimension_must_be_power_of_two(self):
+        with self.assertRaises(ValueError):
+            TextIndex(self.directory, dim=1000)
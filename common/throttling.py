@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Tuple
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+STATS_KEYS = ("deferred", "rejected")
+_STATS_CACHE_PREFIX = "ws_throttle"
+
+
+class TokenBucket:
+    """Token bucket clássico: `rate` tokens/s, até `capacity` acumulados."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self, cost: float) -> float:
+        """Segundos até haver `cost` tokens (0 se já houver)."""
+        self._refill()
+        if self.tokens >= cost:
+            return 0.0
+        if cost > self.capacity:
+            return float("inf")
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float):
+        self._refill()
+        self.tokens -= cost
+
+
+# buckets por usuário compartilhados entre as conexões do processo;
+# expiram 10 min após o último uso (o bucket já estaria cheio de novo)
+_user_buckets: TTLCache = TTLCache(maxsize=10_000, ttl=600)
+
+
+def _get_user_bucket(user_id) -> TokenBucket:
+    bucket = _user_buckets.get(user_id)
+    if bucket is None:
+        bucket = TokenBucket(
+            getattr(settings, "WS_THROTTLE_USER_RATE", 20),
+            getattr(settings, "WS_THROTTLE_USER_BURST", 60),
+        )
+    # o TTLCache conta o ttl a partir da inserção: reatribuir renova
+    _user_buckets[user_id] = bucket
+    return bucket
+
+
+def _bump_stat(name: str, action: Optional[str]):
+    for key in (name, f"{name}:{action}"):
+        cache_key = f"{_STATS_CACHE_PREFIX}:{key}"
+        try:
+            cache.add(cache_key, 0, timeout=None)
+            cache.incr(cache_key)
+        except Exception:
+            logger.exception(f"Could not update websocket throttle stat {key}")
+
+
+def get_throttle_stats() -> dict:
+    """Contadores agregados (todos os workers) de ações limitadas."""
+    keys = cache.keys(f"{_STATS_CACHE_PREFIX}:*")
+    values = cache.get_many(keys) if keys else {}
+    stats = {name: 0 for name in STATS_KEYS}
+    for key, value in values.items():
+        stats[key[len(_STATS_CACHE_PREFIX) + 1 :]] = value
+    return stats
+
+
+class ConnectionThrottle:
+    """
+    Limita as ações de uma conexão websocket com dois token buckets: um da
+    conexão e um do usuário (somando todas as conexões dele no processo).
+
+    Cada ação consome `WS_THROTTLE_ACTION_COSTS.get(action, 1)` tokens. Se
+    faltar pouco (até `WS_THROTTLE_MAX_DEFER` segundos), a ação é adiada;
+    senão é rejeitada.
+    """
+
+    def __init__(self, user_id=None):
+        self.bucket = TokenBucket(
+            getattr(settings, "WS_THROTTLE_RATE", 10),
+            getattr(settings, "WS_THROTTLE_BURST", 30),
+        )
+        self.user_id = user_id
+        self.action_costs = getattr(settings, "WS_THROTTLE_ACTION_COSTS", {})
+        self.max_defer = getattr(settings, "WS_THROTTLE_MAX_DEFER", 1.0)
+
+    def _user_bucket(self) -> Optional[TokenBucket]:
+        # buscado a cada uso, nunca guardado na conexão: todas as conexões do
+        # usuário usam sempre o mesmo bucket, mesmo depois de ele expirar
+        return _get_user_bucket(self.user_id) if self.user_id else None
+
+    def _wait_time(self, cost: float) -> float:
+        wait = self.bucket.wait_time(cost)
+        user_bucket = self._user_bucket()
+        if user_bucket is not None:
+            wait = max(wait, user_bucket.wait_time(cost))
+        return wait
+
+    def _take(self, cost: float):
+        self.bucket.take(cost)
+        user_bucket = self._user_bucket()
+        if user_bucket is not None:
+            user_bucket.take(cost)
+
+    async def acquire(self, action: Optional[str]) -> Tuple[bool, Optional[float]]:
+        """
+        Consome os tokens da ação. Retorna (permitido, retry_after), onde
+        retry_after é o tempo sugerido (segundos) para o cliente tentar de
+        novo, ou None se a ação nunca caberia no bucket.
+        """
+        cost = self.action_costs.get(action, 1)
+        wait = self._wait_time(cost)
+
+        if wait > 0 and wait <= self.max_defer:
+            self._record("deferred", action)
+            await asyncio.sleep(wait)
+            wait = self._wait_time(cost)
+
+        if wait > 0:
+            self._record("rejected", action)
+            return False, (round(wait, 2) if wait != float("inf") else None)
+
+        self._take(cost)
+        return True, None
+
+    def _record(self, name: str, action: Optional[str]):
+        # só os caminhos de exceção (adiar/rejeitar) contam, fora do event loop
+        asyncio.get_running_loop().run_in_executor(None, _bump_stat, name, action)
@@ -26,11 +26,17 @@ from .text import (
 from .requests import (
     retry_on_failure,
     url_to_buffer,
+    download_to_tempfile,
+    get_http_session,
 )
 
 # Image processing
 from .image import (
     extract_text_from_image,
+    extract_text_with_confidence,
+    ocr_image_budgeted,
+    estimate_orientation,
+    _looks_like_document,
     enhance_image,
 )
 
@@ -38,11 +44,15 @@ from .image import (
 
 # Document processing
 from .document import (
+    iter_pdf_pages,
+    extract_pages_from_pdf,
     extract_text_from_pdf,
     extract_text_from_docx,
     extract_text_from_xlsx,
+    extract_text_from_image_file,
     convert_document_url_to_text,
 )
+from .page_images import read_page_image
 
 # File handling
 from .file import save_tmp_file_from_url
@@ -75,15 +85,24 @@ __all__ = [
     # Requests
     "retry_on_failure",
     "url_to_buffer",
+    "download_to_tempfile",
+    "get_http_session",
     # Image
     "extract_text_from_image",
+    "extract_text_with_confidence",
+    "ocr_image_budgeted",
+    "estimate_orientation",
     "_looks_like_document",
     "enhance_image",
     # Document
+    "iter_pdf_pages",
+    "extract_pages_from_pdf",
     "extract_text_from_pdf",
     "extract_text_from_docx",
     "extract_text_from_xlsx",
+    "extract_text_from_image_file",
     "convert_document_url_to_text",
+    "read_page_image",
     # File
     "save_tmp_file_from_url",
     # Task
@@ -1,21 +1,46 @@
 import cv2
 import numpy as np
-import base64
-import statistics
 import time
-import gc
+from datetime import date, datetime, time as dt_time
 import logging
+import multiprocessing
+import os
+import tempfile
+import threading
 import traceback
-from PIL import Image
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from PIL import Image, ImageOps
 import fitz  # PyMuPDF
 import docx
-import pandas as pd
-from typing import List, Tuple
+import docx.table
+import openpyxl
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 from io import BytesIO
-from memoize import memoize
 
-from common.utils.image import enhance_image, extract_text_from_image
-from common.utils.requests import url_to_buffer
+from common.utils.image import (
+    DOCUMENT_THUMB_SIDE,
+    _looks_like_document,
+    ocr_image_budgeted,
+    ocr_images_with_lang,
+)
+from common.utils.ocr_cache import make_digest_cache_key, ocr_cache
+from common.utils.ocr_governor import mark_ocr_worker, reserve_ocr_slots
+from common.utils.ocr_lang import LANG_AUTO
+from common.utils.page_images import (
+    PAGE_IMAGE_MODE_REF,
+    page_image_to_b64,
+    resolve_page_image_mode,
+    store_page_image,
+)
+from common.utils.requests import DownloadedFile, download_to_tempfile
 
 logger = logging.getLogger(__name__)
 
@@ -24,30 +49,58 @@ class DocumentTextError(Exception):
     pass
 
 
-def _render_pdf_page_to_pil(
+# caminho em disco (aberto sem copiar para a memória) ou o conteúdo em bytes
+DocumentSource = Union[str, bytes]
+
+
+def _open_pdf(source: DocumentSource) -> fitz.Document:
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _render_pdf_page_to_array(
     page: fitz.Page,
     target_long_side: int = 2000,
     max_long_side: int = 3000,
     grayscale: bool = True,
-) -> Image.Image:
-    """Render leve da página (print), lado maior limitado."""
+) -> Tuple[np.ndarray, float]:
+    """
+    Render leve da página direto para um array uint8 (uma única cópia das
+    amostras do pixmap), lado maior limitado. Devolve (array, dpi).
+    """
     rect = page.rect
     long_pts = max(rect.width, rect.height)
+    # piso de 0.5 (36 DPI): páginas enormes não viram uma miniatura ilegível
     zoom = max(
         0.5, min(target_long_side / float(long_pts), max_long_side / float(long_pts))
     )
     mat = fitz.Matrix(zoom, zoom)
     cs = fitz.csGRAY if grayscale else fitz.csRGB
     pix = page.get_pixmap(matrix=mat, colorspace=cs, alpha=False)
-    mode = "L" if grayscale else "RGB"
-    img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
 
-    w, h = img.size
-    long_side = max(w, h)
-    if long_side > max_long_side:
-        scale = max_long_side / float(long_side)
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-    return img
+    shape = (pix.height, pix.width) if pix.n == 1 else (pix.height, pix.width, pix.n)
+    arr = np.empty(shape, dtype=np.uint8)
+    # stride do pixmap pode ter padding: copia linha a linha pela view
+    samples = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(
+        pix.height, pix.stride
+    )
+    arr.reshape(pix.height, -1)[:] = samples[:, : pix.width * pix.n]
+    del samples, pix
+    return arr, zoom * 72.0
+
+
+def _render_pdf_page_to_pil(
+    page: fitz.Page,
+    target_long_side: int = 2000,
+    max_long_side: int = 3000,
+    grayscale: bool = True,
+) -> Image.Image:
+    """Render leve da página (print), lado maior limitado."""
+    arr, _ = _render_pdf_page_to_array(
+        page, target_long_side, max_long_side, grayscale=grayscale
+    )
+    return Image.fromarray(arr)
 
 
 # ----------------- OCR orçamentado por página -----------------
@@ -55,17 +108,17 @@ def _render_pdf_page_to_pil(
 
 def ocr_page_budgeted(
     page: fitz.Page,
-    lang: str = "por",
+    lang: str = LANG_AUTO,
     time_budget_s: float = 6.0,
     conf_target: float = 70.0,
-) -> Tuple[str, float, Image.Image]:
+) -> Tuple[str, float, Optional[Image.Image]]:
     """
     Executa OCR numa página com limite de tempo e escalonamento de custo:
       1) tenta texto nativo (0 custo)
-      2) OCR "fast" (psm=6)
-      3) se conf < alvo, OCR "psm=4" (duas colunas)
-      4) se conf ainda baixo e img muito longa/larga, fatiar e juntar
-    Para não estressar CPU, SEMPRE sem upscale por DPI e com semáforo.
+      2) renderiza e segue a cascata de `ocr_image_budgeted`
+         (fast -> strong -> fatiado), parando no primeiro passo com
+         confiança >= conf_target
+    Devolve (texto, confiança, imagem renderizada ou None se nativo).
     """
     t0 = time.monotonic()
 
@@ -75,182 +128,713 @@ def ocr_page_budgeted(
         return native.strip(), 100.0, None
 
     # 1) render leve
-    img = _render_pdf_page_to_pil(
+    arr, dpi = _render_pdf_page_to_array(
         page, target_long_side=2000, max_long_side=2800, grayscale=True
     )
 
-    # FAST: psm=6
-    txt, conf = extract_text_from_image(
-        img, lang=lang, psm=6, oem=1, extra_config="", mode="fast"
+    remaining = time_budget_s - (time.monotonic() - t0)
+    txt, conf = ocr_image_budgeted(
+        arr, lang=lang, time_budget_s=remaining, conf_target=conf_target, dpi=dpi
     )
-    if conf >= conf_target or (time.monotonic() - t0) > time_budget_s:
-        return txt, conf, img
+    return txt, conf, Image.fromarray(arr)
+
+
+# ----------------- classificação e extração por página -----------------
+
+# Com pelo menos isso de texto nativo a página não passa por OCR.
+PAGE_NATIVE_MIN_CHARS = 16
+# Uma imagem que cobre essa fração da página é tratada como o scan dela.
+PAGE_SCAN_MIN_COVERAGE = 0.8
+# Abaixo dessa resolução efetiva, renderizar a página dá um OCR melhor.
+PAGE_IMAGE_MIN_DPI = 150
+
+STRATEGY_NATIVE = "native"
+STRATEGY_IMAGE_OCR = "image_ocr"
+STRATEGY_RENDER_OCR = "render_ocr"
+
+
+@dataclass
+class PageExtraction:
+    """Resultado da extração de uma página e de como ele foi obtido."""
 
-    # COLUNAS: psm=4
-    txt2, conf2 = extract_text_from_image(
-        img, lang=lang, psm=4, oem=1, extra_config="", mode="strong"
+    number: int
+    strategy: str
+    text: Optional[str] = None
+    image_ref: Optional[dict] = None
+    image_b64: Optional[str] = None
+    confidence: Optional[float] = None
+    # língua do OCR (com lang="auto", a escolhida para a página)
+    lang: Optional[str] = None
+    elapsed_s: float = 0.0
+
+
+@dataclass
+class PageProfile:
+    """Métricas baratas da página (só metadados do PyMuPDF, sem render)."""
+
+    native_text: str
+    image_coverage: float
+    dominant_image_xref: Optional[int]
+    dominant_image_dpi: float
+    dominant_image_upright: bool
+
+
+def profile_page(page: fitz.Page) -> PageProfile:
+    rect = page.rect
+    page_area = max(rect.width * rect.height, 1.0)
+
+    coverage = 0.0
+    dominant, dominant_area = None, 0.0
+    for info in page.get_image_info(xrefs=True):
+        bbox = fitz.Rect(info["bbox"]) & rect
+        if bbox.is_empty:
+            continue
+        area = bbox.width * bbox.height
+        coverage += area
+        if area > dominant_area:
+            dominant, dominant_area = info, area
+
+    dpi, upright, xref = 0.0, False, None
+    if dominant is not None:
+        xref = dominant.get("xref") or None
+        bbox = fitz.Rect(dominant["bbox"])
+        if bbox.width > 0:
+            dpi = dominant["width"] / (bbox.width / 72.0)
+        # só aproveitamos a imagem se ela estiver "em pé" na página
+        # (sem rotação/espelhamento na matriz nem /Rotate na página)
+        a, b, c, d, _, _ = dominant["transform"]
+        upright = b == 0 and c == 0 and a > 0 and d > 0 and page.rotation == 0
+
+    return PageProfile(
+        native_text=(page.get_text("text") or "").strip(),
+        image_coverage=min(coverage / page_area, 1.0),
+        dominant_image_xref=xref,
+        dominant_image_dpi=dpi,
+        dominant_image_upright=upright,
     )
-    if conf2 >= conf_target or (time.monotonic() - t0) > time_budget_s:
-        return txt2, conf2, img
 
-    from common.utils.image import slice_image_if_needed
 
-    # FATIA se realmente grande/alongada
-    tiles = slice_image_if_needed(img, max_dim=7000, stripe=2600, overlap=80)
-    out_parts: List[str] = []
-    confs: List[float] = []
-    for _, tile in sorted(tiles, key=lambda b: (b[0][1], b[0][0])):
-        if (time.monotonic() - t0) > time_budget_s:
-            break
-        txt_t, conf_t = extract_text_from_image(tile, lang=lang, psm=4, oem=1)
-        out_parts.append(txt_t)
-        confs.append(conf_t)
+def classify_page(profile: PageProfile) -> str:
+    """
+    Escolhe uma única estratégia para a página:
+      - native: camada de texto com conteúdo suficiente
+      - image_ocr: página escaneada (uma imagem cobrindo a página, em pé e
+        com resolução suficiente) -> OCR direto dos pixels originais
+      - render_ocr: demais casos (imagens pequenas, vetores, baixa resolução)
+    """
+    chars = len(profile.native_text)
+    if chars >= PAGE_NATIVE_MIN_CHARS or (
+        chars and profile.image_coverage < PAGE_SCAN_MIN_COVERAGE
+    ):
+        return STRATEGY_NATIVE
 
-    joined = " ".join([p for p in out_parts if p]).strip()
-    mean_conf = statistics.mean(confs) if confs else 0.0
-    return joined, mean_conf, img
+    if (
+        profile.dominant_image_xref
+        and profile.image_coverage >= PAGE_SCAN_MIN_COVERAGE
+        and profile.dominant_image_upright
+        and profile.dominant_image_dpi >= PAGE_IMAGE_MIN_DPI
+    ):
+        return STRATEGY_IMAGE_OCR
+
+    return STRATEGY_RENDER_OCR
+
+
+def _load_embedded_image(page: fitz.Page, xref: int) -> np.ndarray:
+    extracted = page.parent.extract_image(xref)
+    with Image.open(BytesIO(extracted["image"])) as img:
+        return np.array(img.convert("L"))
+
+
+def _attach_page_image(result: PageExtraction, img: np.ndarray, image_mode: str):
+    pil_img = Image.fromarray(img)
+    if image_mode == PAGE_IMAGE_MODE_REF:
+        try:
+            result.image_ref = store_page_image(pil_img, result.number)
+            return
+        except Exception as e:
+            # sem storage a página não se perde: volta para o base64
+            logger.warning(
+                f"Could not store image of page {result.number+1}: {str(e)}"
+            )
+    result.image_b64 = page_image_to_b64(pil_img)
+
+
+def _load_page_image(
+    page: fitz.Page, profile: PageProfile, result: PageExtraction
+) -> Tuple[np.ndarray, float]:
+    """Pixels para o OCR da página: a imagem embutida ou a página renderizada."""
+    if result.strategy == STRATEGY_IMAGE_OCR:
+        try:
+            img = _load_embedded_image(page, profile.dominant_image_xref)
+            return img, profile.dominant_image_dpi
+        except Exception as e:
+            # formato que o PIL não abre (ex.: JBIG2): renderiza a página
+            logger.warning(f"Could not load image of page {page.number+1}: {str(e)}")
+            result.strategy = STRATEGY_RENDER_OCR
+
+    return _render_pdf_page_to_array(
+        page, target_long_side=2000, max_long_side=2800, grayscale=True
+    )
 
 
-def extract_text_from_pdf(
-    file_content: bytes, lang: str = "por"
-) -> Tuple[str, list[str]]:
+def _extract_pages(
+    doc: fitz.Document, pnos: List[int], lang: str, image_mode: Optional[str] = None
+) -> List[PageExtraction]:
     """
-    Extrai texto de PDF com fallback pra OCR leve página a página.
-    - Usa renderização controlada (cinza, lado máx. ~3000 px).
+    Classifica cada página e roda só a estratégia escolhida. As páginas que
+    precisam de OCR vão juntas para `ocr_images_with_lang` (uma execução do
+    Tesseract para o lote). Sem texto, devolve a imagem usada no OCR como
+    fallback: referência ao arquivo gravado ou base64 (ver `page_images`).
     """
+    results, to_ocr = _prepare_pages(doc, pnos)
+    return _ocr_pages(results, to_ocr, lang, image_mode)
 
-    final_text = ""
-    out_pages = []
-    base64_images = []
 
-    with fitz.open(stream=file_content, filetype="pdf") as doc:
+def _prepare_pages(
+    doc: fitz.Document, pnos: List[int]
+) -> Tuple[List[PageExtraction], list]:
+    """
+    Parte de `_extract_pages` que usa o PyMuPDF: classifica as páginas, lê o
+    texto nativo e carrega os pixels das que vão para o OCR.
+    """
+    results = []
+    to_ocr = []
+    for pno in pnos:
+        t0 = time.monotonic()
+        page = doc.load_page(pno)
+        profile = profile_page(page)
+        result = PageExtraction(number=pno, strategy=classify_page(profile))
+        if result.strategy == STRATEGY_NATIVE:
+            result.text = profile.native_text
+            result.confidence = 100.0
+        else:
+            img, dpi = _load_page_image(page, profile, result)
+            to_ocr.append((result, img, dpi))
+        result.elapsed_s = time.monotonic() - t0
+        results.append(result)
+    return results, to_ocr
+
+
+def _ocr_pages(
+    results: List[PageExtraction],
+    to_ocr: list,
+    lang: str,
+    image_mode: Optional[str] = None,
+) -> List[PageExtraction]:
+    """Parte de `_extract_pages` sem PyMuPDF: OCR do lote e imagens de fallback."""
+    image_mode = resolve_page_image_mode(image_mode)
+    if to_ocr:
+        t0 = time.monotonic()
+        ocr_results = ocr_images_with_lang(
+            [img for _, img, _ in to_ocr],
+            lang=lang,
+            time_budget_s=6.0,
+            conf_target=70.0,
+            dpis=[dpi for _, _, dpi in to_ocr],
+        )
+        # o lote é dividido igualmente entre as páginas no tempo registrado
+        share = (time.monotonic() - t0) / len(to_ocr)
+        for (result, img, _), (text, confidence, used_lang) in zip(
+            to_ocr, ocr_results
+        ):
+            result.confidence = confidence
+            result.lang = used_lang
+            result.text = text.strip() or None
+            if not result.text:
+                _attach_page_image(result, img, image_mode)
+            result.elapsed_s += share
+        del to_ocr, img
+
+    for result in results:
+        result.elapsed_s = round(result.elapsed_s, 3)
+        logger.debug(
+            f"Page {result.number+1}: {result.strategy} in {result.elapsed_s}s "
+            f"(conf={result.confidence}, lang={result.lang})"
+        )
+    return results
+
+
+# ----------------- OCR paralelo por página -----------------
+
+# Abaixo disso o custo de subir o pool não compensa.
+OCR_PARALLEL_MIN_PAGES = int(os.getenv("OCR_PARALLEL_MIN_PAGES", 4))
+# Páginas por lote (uma execução do Tesseract por lote).
+OCR_BATCH_PAGES = int(os.getenv("OCR_BATCH_PAGES", 8))
+
+_page_worker_local = threading.local()
+
+
+def _page_worker_init(pdf_path: str):
+    # roda em cada processo do pool: abre o PDF uma única vez
+    mark_ocr_worker()
+    _page_worker_local.doc = fitz.open(pdf_path)
+
+
+def _page_worker(
+    pnos: List[int], lang: str, image_mode: Optional[str]
+) -> List[PageExtraction]:
+    return _extract_pages(_page_worker_local.doc, pnos, lang, image_mode)
+
+
+def _page_batches(
+    page_count: int, batch_size: int, first_page: int = 0
+) -> List[List[int]]:
+    return [
+        list(range(start, min(start + batch_size, page_count)))
+        for start in range(first_page, page_count, batch_size)
+    ]
+
+
+def _make_process_pool(workers: int, pdf_path: str) -> Optional[Executor]:
+    """Pool de processos para as páginas (None se não der para criar)."""
+    try:
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_page_worker_init,
+            initargs=(pdf_path,),
+        )
+    except (OSError, ValueError) as e:
+        logger.warning(f"Process pool unavailable, using threads: {str(e)}")
+        return None
+
+
+def _batch_results(pnos: List[int], future: Future) -> List[PageExtraction]:
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting pages {pnos[0]+1}-{pnos[-1]+1}: {str(e)}")
+        return [PageExtraction(number=pno, strategy="failed") for pno in pnos]
+
+
+def _bounded_results(
+    pool: Executor, jobs: Iterator[Tuple[List[int], Future]], workers: int
+) -> Iterator[PageExtraction]:
+    # no máximo um lote à frente de cada worker: resultados prontos e ainda
+    # não consumidos não se acumulam com o tamanho do documento (`jobs` só
+    # submete o próximo lote quando é pedido)
+    pending = deque()
+    try:
+        for job in jobs:
+            pending.append(job)
+            if len(pending) > workers:
+                yield from _batch_results(*pending.popleft())
+        while pending:
+            yield from _batch_results(*pending.popleft())
+    finally:
+        # consumidor parou no meio (ou erro): não processa o resto
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _iter_pages_threaded(
+    source: DocumentSource,
+    batches: List[List[int]],
+    lang: str,
+    image_mode: str,
+    workers: int,
+) -> Iterator[PageExtraction]:
+    """
+    Paralelo sem processos. O PyMuPDF não é thread-safe: esta thread abre o
+    documento, classifica e carrega as páginas (`_prepare_pages`), e o pool
+    só roda o OCR, cujo Tesseract é um subprocesso e libera o GIL.
+    """
+    with _open_pdf(source) as doc:
+        pool = ThreadPoolExecutor(max_workers=workers, initializer=mark_ocr_worker)
+
+        def jobs() -> Iterator[Tuple[List[int], Future]]:
+            for pnos in batches:
+                try:
+                    results, to_ocr = _prepare_pages(doc, pnos)
+                except Exception as e:
+                    failed = Future()
+                    failed.set_exception(e)
+                    yield pnos, failed
+                    continue
+                yield pnos, pool.submit(_ocr_pages, results, to_ocr, lang, image_mode)
+
+        yield from _bounded_results(pool, jobs(), workers)
+
+
+def _iter_pages_parallel(
+    source: DocumentSource, page_count: int, lang: str, image_mode: str, workers: int
+) -> Iterator[PageExtraction]:
+    # lotes menores que OCR_BATCH_PAGES quando preciso para ocupar todos os workers
+    batch_size = max(1, min(OCR_BATCH_PAGES, -(-page_count // workers)))
+    batches = _page_batches(page_count, batch_size)
+
+    # processos daemon (ex.: filhos do prefork do Celery) não criam processos
+    if multiprocessing.current_process().daemon:
+        yield from _iter_pages_threaded(source, batches, lang, image_mode, workers)
+        return
+
+    # os processos abrem o documento pelo caminho; bytes vão para um temporário
+    if not isinstance(source, str):
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+            tmp.write(source)
+            tmp.flush()
+            yield from _iter_pages_parallel(
+                tmp.name, page_count, lang, image_mode, workers
+            )
+        return
+
+    pool = _make_process_pool(workers, source)
+    if pool is None:
+        yield from _iter_pages_threaded(source, batches, lang, image_mode, workers)
+        return
+    jobs = (
+        (pnos, pool.submit(_page_worker, pnos, lang, image_mode)) for pnos in batches
+    )
+    yield from _bounded_results(pool, jobs, workers)
+
+
+def _iter_pages(
+    source: DocumentSource, page_count: int, lang: str, image_mode: str, parallel: bool
+) -> Iterator[PageExtraction]:
+    next_page = 0
+    if parallel:
+        with reserve_ocr_slots(page_count) as workers:
+            if workers > 1:
+                try:
+                    for page in _iter_pages_parallel(
+                        source, page_count, lang, image_mode, workers
+                    ):
+                        next_page = page.number + 1
+                        yield page
+                except BrokenProcessPool as e:
+                    logger.warning(f"Page pool broken, falling back to serial: {e}")
+
+    # sem pool, sem vagas livres ou pool quebrado: segue serial de onde parou
+    if next_page < page_count:
+        with _open_pdf(source) as doc:
+            for pnos in _page_batches(page_count, OCR_BATCH_PAGES, next_page):
+                yield from _extract_pages(doc, pnos, lang, image_mode)
+
+
+def iter_pdf_pages(
+    source: DocumentSource,
+    lang: str = LANG_AUTO,
+    parallel: Optional[bool] = None,
+    image_mode: Optional[str] = None,
+) -> Iterator[PageExtraction]:
+    """
+    Extrai cada página do PDF com uma única estratégia (ver `classify_page`)
+    e devolve as páginas em ordem, à medida que ficam prontas, com a
+    estratégia usada, a confiança e quanto tempo levou.
+    - `source`: caminho do arquivo (preferível: o PyMuPDF lê do disco sob
+      demanda) ou o conteúdo em bytes.
+    - `parallel`: processa as páginas num pool limitado pelo orçamento
+      global de OCR. Por padrão só liga a partir de OCR_PARALLEL_MIN_PAGES.
+      As vagas ficam reservadas até o gerador terminar (ou ser fechado).
+    - `image_mode`: como devolver a imagem das páginas sem texto, "ref"
+      (arquivo gravado, em `image_ref`) ou "base64" (compatibilidade, em
+      `image_b64`). Padrão: OCR_PAGE_IMAGE_MODE.
+    """
+    image_mode = resolve_page_image_mode(image_mode)
+    with _open_pdf(source) as doc:
         if doc.needs_pass:
             raise DocumentTextError("PDF is password protected.")
+        page_count = doc.page_count
+
+    if parallel is None:
+        parallel = page_count >= OCR_PARALLEL_MIN_PAGES
+    parallel = parallel and page_count > 1
+
+    strategies = {}
+    langs = {}
+    elapsed_s = 0.0
+    for page in _iter_pages(source, page_count, lang, image_mode, parallel):
+        strategies[page.strategy] = strategies.get(page.strategy, 0) + 1
+        if page.lang:
+            langs[page.lang] = langs.get(page.lang, 0) + 1
+        elapsed_s += page.elapsed_s
+        yield page
+
+    logger.info(
+        f"Extracted {page_count} PDF pages in {elapsed_s:.2f}s: {strategies}, "
+        f"OCR langs {langs}"
+    )
 
-        def extract_text_and_images(page, attempt=1):
-
-            text = None
-            img = None
-            print(f"Attempt {attempt}")
-
-            if attempt == 1:
-                text = page.get_text("text") or ""
-
-            elif attempt == 2:
-                images = page.get_images(full=True)
-                total_images = len(images)
-                if total_images > 0:
-                    if total_images <= 2:
-                        textpage = page.get_textpage_ocr(
-                            full=True, dpi=300, language="por"
-                        )
-                        text = textpage.extractTEXT()
-                        text = text.strip()
-            elif attempt == 3:
-                img = _render_pdf_page_to_pil(
-                    page, target_long_side=2000, max_long_side=2800, grayscale=True
-                )
-                text = extract_text_from_image(img, lang=lang, psm=6, oem=1)
-
-                text = text.strip()
-                if not text:
-                    text = None
-
-            attempt += 1
-            return text, img, attempt
-
-        for pno in range(doc.page_count):
-
-            page = doc.load_page(pno)
-            attempt = 1
-            while attempt <= 4:
-                text, img, attempt = extract_text_and_images(page, attempt)
-                if text:
-                    out_pages.append(f"Page {pno+1}:\n{text}")
-                    print(f"Page {pno+1}: {text}")
-                    break
 
-            if not text and img:
-                ocr_img = enhance_image(img, max_side=1024)
+def extract_pages_from_pdf(
+    source: DocumentSource,
+    lang: str = LANG_AUTO,
+    parallel: Optional[bool] = None,
+    image_mode: Optional[str] = None,
+) -> List[PageExtraction]:
+    """Lista com todas as páginas de `iter_pdf_pages`."""
+    return list(
+        iter_pdf_pages(source, lang=lang, parallel=parallel, image_mode=image_mode)
+    )
+
+
+def extract_text_from_pdf(
+    source: DocumentSource,
+    lang: str = LANG_AUTO,
+    parallel: Optional[bool] = None,
+    image_mode: Optional[str] = None,
+) -> Tuple[str, list]:
+    """
+    Extrai texto de PDF com fallback pra OCR leve página a página.
+    Devolve o texto das páginas e, das que ficaram sem texto, a imagem:
+    referência (dict, ver `store_page_image`) ou base64, conforme
+    `image_mode`. Ver `iter_pdf_pages`.
+    """
+
+    return _join_pages(
+        iter_pdf_pages(source, lang=lang, parallel=parallel, image_mode=image_mode)
+    )
 
-                with BytesIO() as buf:
-                    ocr_img.save(buf, "jpeg", quality=85)
-                    base64_images.append(base64.b64encode(buf.getvalue()).decode())
 
-                del ocr_img
-                del img
-                gc.collect()
+def _join_pages(pages: Iterable[PageExtraction]) -> Tuple[str, list]:
+    final_text = ""
+    out_pages = []
+    images = []
+
+    for page in pages:
+        if page.text:
+            out_pages.append(f"Page {page.number+1}:\n{page.text}")
+        elif page.image_ref:
+            images.append(page.image_ref)
+        elif page.image_b64:
+            images.append(page.image_b64)
 
     if out_pages:
         final_text = "\n\n".join(out_pages).strip()
 
-    return final_text, base64_images
+    return final_text, images
+
+
+# ----------------- DOCX / XLSX -----------------
+
+# Teto do texto extraído de um documento (planilhas enormes, docs gerados)
+DOCUMENT_MAX_CHARS = int(os.getenv("DOCUMENT_MAX_CHARS", 2_000_000))
+# Teto de células lidas de uma planilha, somando todas as abas
+XLSX_MAX_CELLS = int(os.getenv("XLSX_MAX_CELLS", 500_000))
+
+TRUNCATED_MARKER = "[...]"
+
+
+class _TextBuffer:
+    """Partes do texto numa lista, parando ao atingir `max_chars`."""
+
+    def __init__(self, max_chars: int = DOCUMENT_MAX_CHARS):
+        self.parts = []
+        self.size = 0
+        self.max_chars = max_chars
+        self.truncated = False
 
+    def append(self, text: str) -> bool:
+        """Adiciona uma linha; False quando o teto foi atingido."""
+        if self.truncated:
+            return False
+        room = self.max_chars - self.size
+        if len(text) > room:
+            self.parts.append(text[:room])
+            self.truncate()
+            return False
+        self.parts.append(text)
+        self.size += len(text) + 1
+        return True
 
-def extract_text_from_docx(file_content: bytes) -> str:
-    text = ""
+    def truncate(self):
+        if not self.truncated:
+            self.parts.append(TRUNCATED_MARKER)
+            self.truncated = True
+
+    def getvalue(self) -> str:
+        return "\n".join(self.parts)
+
+
+def _docx_table_lines(table: docx.table.Table) -> Iterator[str]:
+    for row in table.rows:
+        cells = []
+        previous = None
+        for cell in row.cells:
+            # células mescladas aparecem repetidas na linha
+            if cell._tc is previous:
+                continue
+            previous = cell._tc
+            cells.append(" ".join(cell.text.split()))
+        if any(cells):
+            yield " | ".join(cells)
+
+
+def extract_text_from_docx(source: DocumentSource) -> str:
+    """Parágrafos e tabelas na ordem do documento, uma linha por item."""
+    text = _TextBuffer()
     try:
-        doc = docx.Document(BytesIO(file_content))
-        for paragraph in doc.paragraphs:
-            text += paragraph.text
+        doc = docx.Document(source if isinstance(source, str) else BytesIO(source))
+        for block in doc.iter_inner_content():
+            if isinstance(block, docx.table.Table):
+                lines = _docx_table_lines(block)
+            else:
+                lines = [block.text] if block.text.strip() else []
+            if not all(text.append(line) for line in lines):
+                break
     except Exception as e:
         logger.error(f"Error extracting text from docx: {str(e)}")
 
-    return text
+    if text.truncated:
+        logger.warning(f"DOCX text truncated at {text.max_chars} chars")
+    return text.getvalue()
+
 
+def _xlsx_cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime) and value.time() == dt_time():
+        return value.date().isoformat()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value).strip()
 
-def extract_text_from_xlsx(file_content: bytes) -> str:
-    text = ""
 
+def extract_text_from_xlsx(source: DocumentSource) -> str:
+    """
+    Lê a planilha uma única vez em modo read-only (linha a linha, sem montar
+    DataFrames): "Sheet: <nome>" seguido das linhas não vazias, células
+    separadas por tab. Para em XLSX_MAX_CELLS células ou DOCUMENT_MAX_CHARS.
+    """
+    text = _TextBuffer()
+    cells = 0
     try:
-        for sheet_name in pd.ExcelFile(file_content).sheet_names:
-            df = pd.read_excel(file_content, sheet_name=sheet_name)
-            text += f"Sheet: {sheet_name}\n\n{df.to_string()}\n\n"
+        workbook = openpyxl.load_workbook(
+            source if isinstance(source, str) else BytesIO(source),
+            read_only=True,
+            data_only=True,
+        )
+        try:
+            for sheet in workbook.worksheets:
+                if not text.append(f"Sheet: {sheet.title}\n"):
+                    break
+                for row in sheet.iter_rows(values_only=True):
+                    cells += len(row)
+                    if cells > XLSX_MAX_CELLS:
+                        text.truncate()
+                        break
+                    values = [_xlsx_cell_text(value) for value in row]
+                    while values and not values[-1]:
+                        values.pop()
+                    if values and not text.append("\t".join(values)):
+                        break
+                if text.truncated:
+                    break
+                text.append("")
+        finally:
+            # read-only mantém o arquivo aberto até fechar o workbook
+            workbook.close()
     except Exception as e:
         logger.error(f"Error extracting text from xlsx: {str(e)}")
 
-    return text
+    if text.truncated:
+        logger.warning(f"XLSX text truncated ({cells} cells, {text.size} chars read)")
+    return text.getvalue()
+
+
+def extract_text_from_image_file(source: DocumentSource, lang: str = LANG_AUTO) -> str:
+    """
+    Texto de uma imagem anexada (foto de exame, print, scan). Uma triagem
+    barata numa miniatura (`_looks_like_document`) descarta fotos comuns
+    antes de gastar OCR nelas.
+    """
+
+    def open_image():
+        return Image.open(source if isinstance(source, str) else BytesIO(source))
 
+    try:
+        with open_image() as img:
+            # JPEG: decodifica já reduzido, bem mais rápido que a foto inteira
+            img.draft("RGB", (DOCUMENT_THUMB_SIDE, DOCUMENT_THUMB_SIDE))
+            if not _looks_like_document(ImageOps.exif_transpose(img)):
+                logger.info("Image does not look like a document, skipping OCR")
+                return ""
+
+        with open_image() as img:
+            text, confidence = ocr_image_budgeted(ImageOps.exif_transpose(img), lang)
+    except Exception as e:
+        logger.error(f"Error extracting text from image: {str(e)}")
+        return ""
 
-@memoize()
-def convert_document_url_to_text(file_url: str) -> Tuple[str, str, list[str]]:
+    logger.info(f"Image OCR finished (conf={confidence:.1f})")
+    return text.strip()
+
+
+def convert_document_url_to_text(
+    file_url: str, image_mode: Optional[str] = None
+) -> Tuple[str, str, list]:
     """
     Converts a file URL to text.
 
-    can handle text files (txt, pdf, docx, etc), and also xlsx files
+    can handle text files (txt, pdf, docx, etc), and also xlsx files.
+    PDF pages without text come back as images, see `extract_text_from_pdf`.
     """
 
-    # retrieve file content from url
-    file_content, headers = url_to_buffer(file_url)
+    # stream the file to disk (hashing on the fly) instead of holding it in memory
+    with download_to_tempfile(file_url) as download:
+        return _convert_downloaded_file(download, image_mode)
+
+
+def _document_cache_key(
+    content_sha256: str, mime_type: Optional[str], image_mode: Optional[str] = None
+) -> str:
+    return make_digest_cache_key(
+        content_sha256,
+        mime_type=mime_type,
+        images=resolve_page_image_mode(image_mode),
+        engine="convert-v6",
+    )
+
+
+def _convert_downloaded_file(
+    download: DownloadedFile, image_mode: Optional[str] = None
+) -> Tuple[str, str, list]:
+    file_path = download.path
     extracted_text = None
     file_type = None
 
     # check mime type
-    mime_type = headers.get("Content-Type")
+    mime_type = download.headers.get("Content-Type")
+
+    # URLs assinadas expiram; o cache é pelo conteúdo do arquivo
+    cache_key = _document_cache_key(download.sha256, mime_type, image_mode)
+    cached = ocr_cache.get(cache_key)
+    if cached is not None:
+        return cached["text"], cached["file_type"], cached["images"]
 
-    base64_images = []
+    images = []
 
     if mime_type == "application/pdf":
-        extracted_text, base64_images = extract_text_from_pdf(file_content)
+        extracted_text, images = extract_text_from_pdf(
+            file_path, image_mode=image_mode
+        )
         file_type = "pdf"
     elif (
         mime_type
         == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     ):
-        extracted_text = extract_text_from_docx(file_content)
+        extracted_text = extract_text_from_docx(file_path)
         file_type = "docx"
     elif (
         mime_type == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     ):
-        extracted_text = extract_text_from_xlsx(file_content)
+        extracted_text = extract_text_from_xlsx(file_path)
         file_type = "xlsx"
     elif mime_type == "text/plain":
-        extracted_text = file_content.decode("utf-8")
+        extracted_text = download.read_bytes().decode("utf-8")
         file_type = "txt"
-    elif "image" in mime_type:
-        extracted_text = ""
+    elif mime_type and mime_type.startswith("image/"):
+        extracted_text = extract_text_from_image_file(file_path)
         file_type = "image"
     else:
         logger.warning(f"Unsupported file type: {mime_type}")
 
-    return extracted_text, file_type, base64_images
+    if file_type:
+        ocr_cache.set(
+            cache_key,
+            {"text": extracted_text, "file_type": file_type, "images": images},
+        )
+
+    return extracted_text, file_type, images
@@ -6,11 +6,23 @@ import logging
 from PIL import Image, ImageFilter, ImageOps
 import re
 import os
-from typing import List, Optional, Tuple
+import statistics
+import tempfile
+import time
+from typing import List, Optional, Tuple, Union
+
+from common.utils.ocr_cache import make_cache_key, ocr_cache
+from common.utils.ocr_governor import cv2_threads, ocr_slot
+from common.utils.ocr_lang import (
+    LANG_AUTO,
+    OCR_AUTO_FALLBACK_LANG,
+    OCR_AUTO_PRIMARY_LANG,
+    needs_fallback_lang,
+    record_ocr_lang,
+)
 
 logger = logging.getLogger(__name__)
-cv2.setNumThreads(1)
-_OCR_SEMAPHORE = threading.Semaphore(1)
+cv2.setNumThreads(cv2_threads())
 
 
 def enhance_image(img: Image.Image, max_side: int = 1024) -> Image.Image:
@@ -24,72 +36,495 @@ def enhance_image(img: Image.Image, max_side: int = 1024) -> Image.Image:
     return img_sharp
 
 
-def _ensure_300dpi(img: Image.Image, target_dpi: int = 300) -> Image.Image:
-    # Se não houver DPI definido, assume 72
-    dpi = img.info.get("dpi", (72, 72))[0] or 72
-    if dpi >= target_dpi:
+# ---------- Pré-processamento em um único buffer uint8 ----------
+
+# Imagens aceitas pelo pipeline de OCR: PIL ou array uint8 (cinza ou RGB/RGBA).
+ImageInput = Union[Image.Image, np.ndarray]
+
+
+def _to_gray_array(img: ImageInput) -> np.ndarray:
+    """Array uint8 2D. Arrays já em cinza passam sem cópia (não modificar!)."""
+    if isinstance(img, np.ndarray):
+        if img.ndim == 3:
+            code = cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(img, code)
         return img
-    scale = target_dpi / dpi
-    new_size = (int(img.width * scale), int(img.height * scale))
-    return img.resize(new_size, Image.LANCZOS)
+    if img.mode != "L":
+        img = ImageOps.grayscale(img)
+    return np.array(img)
+
+
+def _image_dpi(img: ImageInput) -> Optional[float]:
+    if isinstance(img, Image.Image) and img.info.get("dpi"):
+        return float(img.info["dpi"][0]) or None
+    return None
+
+
+def _image_size(img: ImageInput) -> Tuple[int, int]:
+    if isinstance(img, np.ndarray):
+        return img.shape[1], img.shape[0]
+    return img.size
 
 
-def _binarize(img: Image.Image) -> Image.Image:
-    # conversão para OpenCV (grayscale já garantido)
-    np_img = np.array(img)
+def _crop(img: ImageInput, box: Tuple[int, int, int, int]) -> ImageInput:
+    if isinstance(img, np.ndarray):
+        x, y, x2, y2 = box
+        return img[y:y2, x:x2]
+    return img.crop(box)
+
+
+def _working_copy(
+    gray: np.ndarray,
+    max_long_side: int = 3000,
+    dpi: Optional[float] = None,
+    target_dpi: int = 300,
+) -> np.ndarray:
+    """
+    Buffer próprio (C-contíguo) para o pré-processamento in-place, já na
+    escala final: sobe para `target_dpi` quando o DPI é conhecido e limita o
+    lado maior a `max_long_side`. Sem DPI não há upscale.
+    """
+    h, w = gray.shape
+    long_side = max(h, w)
+    scale = target_dpi / dpi if dpi and dpi < target_dpi else 1.0
+    scale = min(scale, max_long_side / float(long_side))
+
+    if abs(scale - 1.0) < 0.01:
+        return np.array(gray, dtype=np.uint8, order="C", copy=True)
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(
+        gray, (int(w * scale), int(h * scale)), interpolation=interpolation
+    )
+
+
+def _autocontrast_inplace(gray: np.ndarray, cutoff: float = 0.5) -> np.ndarray:
+    """Como ImageOps.autocontrast: corta `cutoff`% de cada ponta e estica."""
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    cdf = np.cumsum(hist)
+    cut = cdf[-1] * cutoff / 100.0
+    lo = int(np.searchsorted(cdf, cut, side="right"))
+    hi = int(np.searchsorted(cdf, cdf[-1] - cut, side="left"))
+    if hi <= lo:
+        return gray
+    lut = np.clip((np.arange(256) - lo) * (255.0 / (hi - lo)), 0, 255)
+    cv2.LUT(gray, lut.astype(np.uint8), dst=gray)
+    return gray
+
+
+def _unsharp_inplace(
+    gray: np.ndarray, sigma: float = 1.2, amount: float = 1.5
+) -> np.ndarray:
+    """Unsharp mask: gray + amount * (gray - blur), saturado em uint8."""
+    blurred = cv2.GaussianBlur(gray, (0, 0), sigma)
+    cv2.addWeighted(gray, 1.0 + amount, blurred, -amount, 0, dst=gray)
+    return gray
+
+
+def _binarize_inplace(gray: np.ndarray) -> np.ndarray:
     # Redução de ruído leve
-    np_img = cv2.medianBlur(np_img, 3)
+    cv2.medianBlur(gray, 3, dst=gray)
     # Limiar adaptativo robusto para documentos
-    thr = cv2.adaptiveThreshold(
-        np_img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 35, 15
+    cv2.adaptiveThreshold(
+        gray,
+        255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        35,
+        15,
+        dst=gray,
     )
-    return Image.fromarray(thr)
+    return gray
+
+
+def _preprocess_for_ocr(gray: np.ndarray) -> np.ndarray:
+    """Perfil "strong" (in-place): autocontraste, nitidez e binarização."""
+    _autocontrast_inplace(gray, cutoff=0.5)
+    _unsharp_inplace(gray, sigma=1.2, amount=1.5)
+    return _binarize_inplace(gray)
+
+
+# ---------- Orientação: estimativa barata, OSD só na dúvida ----------
+
+ORIENTATION_WORK_SIDE = 1000  # lado maior da cópia reduzida (px)
+ORIENTATION_MAX_SKEW = 5.0  # graus procurados no deskew, para cada lado
+# o pico do deskew tem ~0.2 grau em linhas longas e pouco espaçadas
+# (tabelas): uma grade mais grossa pode cair fora dele
+ORIENTATION_SKEW_COARSE_STEP = 0.25
+ORIENTATION_SKEW_STEP = 0.1
+ORIENTATION_MIN_LINES = 3
+# abaixo disso as faixas de ascendentes/descendentes têm 1-2 px na cópia
+# reduzida e o sentido (0 vs 180) vira sorteio
+ORIENTATION_MIN_GLYPH = 8
+# margens mínimas para aceitar a estimativa sem chamar o OSD
+# diferença de alongamento médio (log da razão largura/altura) das linhas
+# horizontais vs verticais
+ORIENTATION_AXIS_MARGIN = 0.5
+ORIENTATION_UPRIGHT_MARGIN = 1.4  # tinta acima vs abaixo do miolo da linha
+
+_orientation_stats = {"estimated": 0, "osd": 0}
+_orientation_stats_lock = threading.Lock()
+
+
+def _bump_orientation_stat(name: str):
+    with _orientation_stats_lock:
+        _orientation_stats[name] += 1
 
 
-def _preprocess_for_ocr(img: Image.Image) -> Image.Image:
-    # 1) garantir 300 DPI e escala adequada
-    img = _ensure_300dpi(img)
-    # 2) converter para tons de cinza
-    img = ImageOps.grayscale(img)
-    # 3) autocontraste e leve nitidez
-    img = ImageOps.autocontrast(img, cutoff=0.5)
-    img = img.filter(ImageFilter.UnsharpMask(radius=1.2, percent=150, threshold=3))
-    # 4) binarização
-    img = _binarize(img)
-    return img
+def get_orientation_stats() -> dict:
+    """Quantas orientações foram resolvidas pela estimativa e quantas pelo OSD."""
+    with _orientation_stats_lock:
+        return dict(_orientation_stats)
 
 
-def _fix_orientation(img: Image.Image) -> Image.Image:
-    """Tenta detectar rotação com OSD do Tesseract e corrigir."""
+class OrientationEstimate:
+    """
+    `rotate`: graus (sentido horário) para deixar o texto em pé, no mesmo
+    formato do "Rotate:" do OSD. `skew`: inclinação residual em graus (positivo
+    = anti-horário). `confident`: se False, a estimativa não deve ser usada.
+    """
+
+    def __init__(self, rotate: int, skew: float, confident: bool):
+        self.rotate = rotate
+        self.skew = skew
+        self.confident = confident
+
+    def __repr__(self):
+        return (
+            f"OrientationEstimate(rotate={self.rotate}, skew={self.skew}, "
+            f"confident={self.confident})"
+        )
+
+
+def _text_mask(img: ImageInput) -> np.ndarray:
+    """Cópia reduzida e binarizada (Otsu), texto = 1."""
+    gray = _to_gray_array(img)
+    h, w = gray.shape
+    scale = ORIENTATION_WORK_SIDE / float(max(h, w))
+    if scale < 1:
+        gray = cv2.resize(
+            gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA
+        )
+    _, mask = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return mask
+
+
+def _profile_sharpness(profile: np.ndarray) -> float:
+    # linhas de texto bem alinhadas ao eixo geram um perfil em "pente". O valor
+    # bruto só compara ângulos da mesma máscara: entre eixos diferentes ele
+    # depende de quanta tinta cabe em cada linha/coluna (tabelas, linhas curtas)
+    diff = np.diff(profile.astype(np.float64))
+    return float(np.dot(diff, diff))
+
+
+def _glyph_size(mask: np.ndarray) -> int:
+    """Tamanho típico de um caractere (px): mediana do lado maior das manchas."""
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    stats = stats[1:]
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= 4]
+    if not len(stats):
+        return 0
+    sides = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+    return int(round(float(np.median(sides))))
+
+
+def _line_elongation(mask: np.ndarray, glyph_size: int) -> float:
+    """
+    Fecha a máscara na horizontal na escala de um caractere, o que junta as
+    letras de cada linha de texto horizontal numa mancha comprida, e devolve
+    o log médio da razão largura/altura das manchas (pesado pela área). Não
+    depende de quanta tinta há por linha ou coluna, só da forma das linhas.
+    """
+    closed = cv2.morphologyEx(
+        mask, cv2.MORPH_CLOSE, np.ones((1, glyph_size), dtype=np.uint8)
+    )
+    _, _, stats, _ = cv2.connectedComponentsWithStats(closed, connectivity=8)
+    stats = stats[1:]
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= glyph_size]
+    if not len(stats):
+        return 0.0
+    ratios = stats[:, cv2.CC_STAT_WIDTH] / stats[:, cv2.CC_STAT_HEIGHT]
+    return float(np.average(np.log(ratios), weights=stats[:, cv2.CC_STAT_AREA]))
+
+
+def _rotate_mask(mask: np.ndarray, angle: float) -> np.ndarray:
+    h, w = mask.shape
+    matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    return cv2.warpAffine(mask, matrix, (w, h), flags=cv2.INTER_NEAREST)
+
+
+def _estimate_skew(mask: np.ndarray) -> Tuple[float, float]:
+    """Ângulo (±ORIENTATION_MAX_SKEW) que deixa as linhas mais horizontais."""
+    ys, xs = np.nonzero(mask)
+    if not len(ys):
+        return 0.0, 0.0
+    ys = ys.astype(np.float64)
+    xs = xs.astype(np.float64) - mask.shape[1] / 2.0
+
+    def score(angle: float) -> float:
+        # perfil das linhas da máscara girada (mesmo sentido do _rotate_mask)
+        # projetando só os pixels de tinta, sem girar a imagem inteira
+        rad = np.deg2rad(angle)
+        rows = np.rint(ys * np.cos(rad) - xs * np.sin(rad)).astype(np.intp)
+        return _profile_sharpness(np.bincount(rows - rows.min()))
+
+    # busca grossa e depois refina em volta do melhor
+    coarse = ORIENTATION_SKEW_COARSE_STEP
+    steps = int(ORIENTATION_MAX_SKEW / coarse)
+    angles = [round(i * coarse, 2) for i in range(-steps, steps + 1)]
+    scores = {angle: score(angle) for angle in angles}
+    best = max(scores, key=scores.get)
+    for angle in (best - ORIENTATION_SKEW_STEP, best + ORIENTATION_SKEW_STEP):
+        angle = round(angle, 2)
+        if abs(angle) <= ORIENTATION_MAX_SKEW:
+            scores[angle] = score(angle)
+    best = max(scores, key=scores.get)
+    return best, scores[best]
+
+
+def _ink_above_below(mask: np.ndarray) -> Tuple[float, float, int]:
+    """
+    Para cada linha de texto, soma a tinta acima e abaixo do miolo (faixa da
+    altura-x). Em texto latino em pé há mais ascendentes/maiúsculas/dígitos
+    do que descendentes, então "acima" domina.
+    """
+    rows = mask.sum(axis=1).astype(np.float64)
+    if not rows.any():
+        return 0.0, 0.0, 0
+    active = rows > rows.max() * 0.05
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.view(np.int8), [0]))))
+    above = below = 0.0
+    lines = 0
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start < 4:
+            continue
+        segment = rows[start:end]
+        core = np.flatnonzero(segment >= segment.max() * 0.5)
+        above += segment[: core[0]].sum()
+        below += segment[core[-1] + 1 :].sum()
+        lines += 1
+    return above, below, lines
+
+
+def estimate_orientation(img: ImageInput) -> OrientationEstimate:
+    """
+    Estima orientação (0/90/180/270) e inclinação numa cópia reduzida, sem
+    Tesseract: o formato das linhas decide entre horizontal/vertical, o
+    perfil de projeção dá o deskew e a assimetria ascendentes vs descendentes
+    decide o sentido.
+    """
+    mask = _text_mask(img)
+    glyph_size = _glyph_size(mask)
+    if glyph_size < 2:
+        return OrientationEstimate(0, 0.0, confident=False)
+
+    # texto "deitado": rot90 horário e mede de novo
+    mask_v = np.ascontiguousarray(np.rot90(mask, k=-1))
+    elongation_h = _line_elongation(mask, glyph_size)
+    elongation_v = _line_elongation(mask_v, glyph_size)
+    axis_margin = abs(elongation_h - elongation_v)
+
+    base, upright_mask = (0, mask) if elongation_h >= elongation_v else (90, mask_v)
+    skew, _ = _estimate_skew(upright_mask)
+    if skew:
+        upright_mask = _rotate_mask(upright_mask, skew)
+
+    above, below, lines = _ink_above_below(upright_mask)
+    flipped = below > above
+    rotate = (base + (180 if flipped else 0)) % 360
+    updown_margin = max(above, below) / max(min(above, below), 1.0)
+
+    confident = (
+        lines >= ORIENTATION_MIN_LINES
+        and glyph_size >= ORIENTATION_MIN_GLYPH
+        and axis_margin >= ORIENTATION_AXIS_MARGIN
+        and updown_margin >= ORIENTATION_UPRIGHT_MARGIN
+    )
+    return OrientationEstimate(rotate, skew, confident)
+
+
+def _osd_rotation(img: ImageInput) -> int:
+    _bump_orientation_stat("osd")
+    osd = pytesseract.image_to_osd(img)
+    m = re.search(r"Rotate:\s+(\d+)", osd)
+    return int(m.group(1)) % 360 if m else 0
+
+
+def _rotate_expand(gray: np.ndarray, angle: float) -> np.ndarray:
+    """Gira `angle` graus (anti-horário) sem cortar os cantos; fundo branco."""
+    h, w = gray.shape
+    matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_w, new_h = int(h * sin + w * cos), int(h * cos + w * sin)
+    matrix[0, 2] += new_w / 2.0 - w / 2.0
+    matrix[1, 2] += new_h / 2.0 - h / 2.0
+    return cv2.warpAffine(
+        gray, matrix, (new_w, new_h), flags=cv2.INTER_CUBIC, borderValue=255
+    )
+
+
+def _fix_orientation(gray: np.ndarray) -> np.ndarray:
+    """
+    Corrige rotação e inclinação. Usa a estimativa barata quando ela é
+    conclusiva; senão recorre ao OSD do Tesseract (processo extra).
+    """
     try:
-        osd = pytesseract.image_to_osd(img)
-        m = re.search(r"Rotate:\s+(\d+)", osd)
-        if m:
-            angle = int(m.group(1)) % 360
-            if angle:
-                # Tesseract indica rotação necessária em graus (clockwise).
-                return img.rotate(360 - angle, expand=True)
+        estimate = estimate_orientation(gray)
+        if estimate.confident:
+            _bump_orientation_stat("estimated")
+            angle, skew = estimate.rotate, estimate.skew
+        else:
+            angle, skew = _osd_rotation(gray), 0.0
     except Exception:
-        pass
-    return img
+        return gray
+
+    if angle:
+        # rotação necessária em graus (clockwise), como no OSD.
+        gray = np.ascontiguousarray(np.rot90(gray, k=-(angle // 90)))
+    if skew:
+        gray = _rotate_expand(gray, skew)
+    return gray
+
+
+# ---------- Documento ou foto: triagem barata antes do OCR ----------
+
+DOCUMENT_THUMB_SIDE = 400  # lado maior da miniatura analisada (px)
+DOCUMENT_MIN_TEXT_LINES = 4  # linhas de texto candidatas na miniatura
+DOCUMENT_MAX_COLOR_FRACTION = 0.35  # pixels saturados em volta do texto
+DOCUMENT_MIN_PAPER_FRACTION = 0.6  # pixels claros e pouco saturados
+DOCUMENT_MIN_EDGE_DENSITY = 0.005  # bordas (Canny): papel em branco não conta
+
+
+def _thumbnail_array(img: ImageInput, side: int = DOCUMENT_THUMB_SIDE) -> np.ndarray:
+    """Miniatura RGB uint8 com lado maior `side` (sem ampliar)."""
+    if isinstance(img, Image.Image):
+        thumb = img.convert("RGB") if img.mode != "RGB" else img.copy()
+        thumb.thumbnail((side, side), Image.BILINEAR)
+        return np.asarray(thumb)
+    arr = img if img.ndim == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+    if arr.shape[2] == 4:
+        arr = cv2.cvtColor(arr, cv2.COLOR_RGBA2RGB)
+    h, w = arr.shape[:2]
+    scale = side / float(max(h, w))
+    if scale < 1:
+        arr = cv2.resize(
+            arr, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA
+        )
+    return arr
+
+
+def _text_line_boxes(
+    gray: np.ndarray, max_height: float = 0.05
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Retângulos (x, y, w, h) com cara de linha de texto: gradiente morfológico
+    binarizado, fechado na horizontal para juntar as letras, e componentes
+    finos, alongados e sólidos (mesmo levemente inclinados).
+    `max_height`: altura máxima da linha como fração da altura da imagem.
+    """
+    h_img = gray.shape[0]
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel)
+    _, bw = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    closed = cv2.morphologyEx(
+        bw, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1))
+    )
+    # RETR_CCOMP: componentes dentro de molduras (borda da folha, tabelas)
+    # também aparecem no nível de cima
+    contours, hierarchy = cv2.findContours(
+        closed, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE
+    )
+    if hierarchy is None:
+        return []
+
+    boxes = []
+    for contour, (_, _, _, parent) in zip(contours, hierarchy[0]):
+        if parent >= 0:
+            continue
+        _, (rw, rh), _ = cv2.minAreaRect(contour)
+        long_side, short_side = max(rw, rh), min(rw, rh)
+        if short_side < 2 or short_side > h_img * max_height:
+            continue
+        if long_side < 3 * short_side:
+            continue
+        if cv2.contourArea(contour) < 0.5 * long_side * short_side:
+            continue
+        boxes.append(cv2.boundingRect(contour))
+    return boxes
+
+
+def _document_features(img: ImageInput) -> dict:
+    """
+    Métricas da miniatura: linhas de texto candidatas (nos dois eixos, para
+    páginas deitadas), densidade de bordas, fração de pixels coloridos em
+    volta do texto e fração de "papel" (claros e pouco saturados).
+    """
+    rgb = _thumbnail_array(img)
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+    saturation, value = hsv[..., 1], hsv[..., 2]
+
+    boxes = _text_line_boxes(gray)
+    boxes_t = _text_line_boxes(np.ascontiguousarray(gray.T))
+    if len(boxes_t) > len(boxes):
+        boxes = [(y, x, h, w) for x, y, w, h in boxes_t]
+
+    # cor só onde está o texto: a mesa em volta da folha fotografada não conta
+    region = saturation
+    if boxes:
+        x0 = min(x for x, _, _, _ in boxes)
+        y0 = min(y for _, y, _, _ in boxes)
+        x1 = max(x + w for x, _, w, _ in boxes)
+        y1 = max(y + h for _, y, _, h in boxes)
+        region = saturation[y0:y1, x0:x1]
+
+    edges = cv2.Canny(gray, 50, 150)
+    return {
+        "text_lines": len(boxes),
+        "edge_density": float(np.count_nonzero(edges)) / edges.size,
+        "color_fraction": float(np.count_nonzero(region > 80)) / region.size,
+        "paper_fraction": float(np.count_nonzero((saturation < 50) & (value > 150)))
+        / value.size,
+    }
+
+
+def _looks_like_document(img: ImageInput) -> bool:
+    """
+    Decide em milissegundos se vale rodar OCR na imagem: páginas (escaneadas
+    ou fotografadas) têm linhas de texto sobre fundo claro e pouca cor; fotos
+    comuns não. Na dúvida favorece o OCR: perder um laudo custa mais que um
+    OCR à toa.
+    """
+    features = _document_features(img)
+    lines = features["text_lines"]
+    if lines >= 2 * DOCUMENT_MIN_TEXT_LINES:
+        return True
+    if features["color_fraction"] > DOCUMENT_MAX_COLOR_FRACTION:
+        return False
+    if lines >= DOCUMENT_MIN_TEXT_LINES:
+        return True
+    # pouco texto (etiqueta, receita curta): folha clara com algum traço
+    return (
+        features["paper_fraction"] >= DOCUMENT_MIN_PAPER_FRACTION
+        and features["edge_density"] >= DOCUMENT_MIN_EDGE_DENSITY
+    )
 
 
 # ---------- Fatiamento seguro (lida com imagens enormes/alongadas) ----------
 
 
 def _slice_for_ocr(
-    img: Image.Image,
+    img: ImageInput,
     max_dim: int = 8000,
     stripe: int = 2200,
     overlap: int = 100,
-) -> List[Tuple[Tuple[int, int, int, int], Image.Image]]:
+) -> List[Tuple[Tuple[int, int, int, int], ImageInput]]:
     """
     Devolve cortes (box, tile_img) para OCR.
     - evita limites do Tesseract (dimensão/área)
     - usa tiras verticais para páginas muito largas; horizontais para muito altas
     - se a imagem já for "pequena", retorna 1 tile
     """
-    w, h = img.size
+    w, h = _image_size(img)
     # área limite (~64MP) para evitar estouro de memória
     if (max(w, h) <= max_dim) and (w * h <= 64_000_000):
         return [((0, 0, w, h), img)]
@@ -102,7 +537,7 @@ def _slice_for_ocr(
         while x < w:
             x2 = min(x + stripe, w)
             box = (x, 0, x2, h)
-            tiles.append((box, img.crop(box)))
+            tiles.append((box, _crop(img, box)))
             if x2 == w:
                 break
             x += step
@@ -113,7 +548,7 @@ def _slice_for_ocr(
         while y < h:
             y2 = min(y + stripe, h)
             box = (0, y, w, y2)
-            tiles.append((box, img.crop(box)))
+            tiles.append((box, _crop(img, box)))
             if y2 == h:
                 break
             y += step
@@ -128,86 +563,652 @@ def _slice_for_ocr(
             (midx, midy, w, h),
         ]
         for b in boxes:
-            tiles.append((b, img.crop(b)))
+            tiles.append((b, _crop(img, b)))
     return tiles
 
 
-def _tesseract(
-    img: Image.Image,
+# ---------- Regiões de texto: OCR só onde há texto ----------
+
+OCR_TEXT_REGIONS = os.getenv("OCR_TEXT_REGIONS", "True").lower() == "true"
+TEXT_REGION_MIN_GLYPHS = 10  # componentes com cara de letra para confiar
+TEXT_REGION_MAX_GLYPH_HEIGHT = 4.0  # em alturas de letra; acima: logo, moldura
+TEXT_REGION_MAX_COVERAGE = 0.85  # fração da página; acima, vai a página inteira
+TEXT_REGION_MIN_CONFIDENCE = 50.0  # abaixo disso, refaz com a página inteira
+
+_text_region_stats = {
+    "pages": 0,
+    "region_pages": 0,
+    "whole_pages": 0,
+    "retried_pages": 0,
+    "pixels": 0,
+    "ocr_pixels": 0,
+}
+_text_region_stats_lock = threading.Lock()
+
+
+def _bump_text_region_stats(**counts: int):
+    with _text_region_stats_lock:
+        for name, value in counts.items():
+            _text_region_stats[name] += value
+
+
+def get_text_region_stats() -> dict:
+    """Páginas lidas por regiões/inteiras e pixels enviados ao Tesseract."""
+    with _text_region_stats_lock:
+        return dict(_text_region_stats)
+
+
+def _text_regions(binary: np.ndarray) -> Optional[List[Tuple[int, int, int, int]]]:
+    """
+    Faixas (x, y, x2, y2) com texto na imagem binarizada (texto preto em
+    fundo branco), de cima para baixo:
+      - componentes conexos do tamanho de letras viram a máscara (logos,
+        carimbos, molduras e filetes de tabela ficam de fora, para não colar
+        as linhas);
+      - a dilatação junta letras em linhas e linhas em parágrafos;
+      - blocos lado a lado (colunas de uma tabela) ficam na mesma faixa,
+        então o Tesseract lê cada linha inteira, como na página toda.
+    Componentes grandes que têm letras dentro (tabelas) entram como bloco.
+    [] se não há tinta; None se a detecção não é confiável.
+    """
+    h_img, w_img = binary.shape
+    ink = cv2.bitwise_not(binary)
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        ink, connectivity=8
+    )
+    if count <= 1:
+        return []
+
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    glyphs = (
+        (heights >= 4)
+        & (heights <= h_img * 0.05)
+        & (widths <= heights * 5)
+        & (areas >= 6)
+    )
+    if glyphs.sum() < TEXT_REGION_MIN_GLYPHS:
+        return None
+    char_h = float(np.median(heights[glyphs]))
+
+    small = heights <= TEXT_REGION_MAX_GLYPH_HEIGHT * char_h
+    rules = (widths > 10 * char_h) & (heights < 0.5 * char_h)
+    keep = small & ~rules & (areas >= 3)
+    lut = np.zeros(count, dtype=np.uint8)
+    lut[1:][keep] = 255
+    mask = lut[labels]
+    del labels
+
+    kx, ky = int(2 * char_h) | 1, int(char_h) | 1
+    blocks = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (kx, ky)))
+    del mask
+    # contornos externos bastam para as caixas dos blocos (mais barato que
+    # rotular de novo)
+    contours, _ = cv2.findContours(
+        blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+    del blocks
+
+    boxes = []
+    for x, y, w, h in map(cv2.boundingRect, contours):
+        # só ruído: sem meia letra de altura além da dilatação
+        if h - ky < 0.5 * char_h:
+            continue
+        boxes.append((x, y, x + w, y + h))
+
+    glyph_centers = centroids[1:][glyphs]
+    for x, y, w, h, _ in stats[1:][~small & ~rules]:
+        inside = (
+            (glyph_centers[:, 0] > x)
+            & (glyph_centers[:, 0] < x + w)
+            & (glyph_centers[:, 1] > y)
+            & (glyph_centers[:, 1] < y + h)
+        )
+        if inside.any():
+            boxes.append((x, y, x + w, y + h))
+
+    # blocos que se sobrepõem na vertical viram uma faixa só
+    bands: List[List[int]] = []
+    for x, y, x2, y2 in sorted(boxes, key=lambda b: b[1]):
+        if bands and y < bands[-1][3]:
+            band = bands[-1]
+            band[0] = min(band[0], x)
+            band[2] = max(band[2], x2)
+            band[3] = max(band[3], y2)
+        else:
+            bands.append([x, y, x2, y2])
+
+    pad = int(char_h / 2)
+    regions = [
+        (
+            max(0, int(x) - pad),
+            max(0, int(y) - pad),
+            min(w_img, int(x2) + pad),
+            min(h_img, int(y2) + pad),
+        )
+        for x, y, x2, y2 in bands
+    ]
+    covered = sum((x2 - x) * (y2 - y) for x, y, x2, y2 in regions)
+    if covered > TEXT_REGION_MAX_COVERAGE * h_img * w_img:
+        return None
+    return regions
+
+
+def _page_tiles(page: np.ndarray) -> List[np.ndarray]:
+    # Heurística de ordenação: blocos por top->bottom, left->right
+    pieces = _slice_for_ocr(page, max_dim=8000, stripe=2200, overlap=100)
+    return [tile for _, tile in sorted(pieces, key=lambda it: (it[0][1], it[0][0]))]
+
+
+def _ocr_pieces(page: np.ndarray) -> Tuple[List[np.ndarray], bool]:
+    """Cortes da página para o Tesseract e se vieram das regiões de texto."""
+    regions = _text_regions(page) if OCR_TEXT_REGIONS else None
+    if regions is None:
+        return _page_tiles(page), False
+    return [page[y:y2, x:x2] for x, y, x2, y2 in regions], True
+
+
+def _text_from_tesseract_data(data: dict) -> Tuple[str, List[float]]:
+    """Remonta o texto (uma linha por linha do Tesseract) e as confianças das palavras."""
+    lines = {}
+    confs = []
+    for i, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        if not word:
+            continue
+        conf = float(data["conf"][i])
+        if conf >= 0:
+            confs.append(conf)
+        key = (
+            data["page_num"][i],
+            data["block_num"][i],
+            data["par_num"][i],
+            data["line_num"][i],
+        )
+        lines.setdefault(key, []).append(word)
+    return "\n".join(" ".join(words) for words in lines.values()), confs
+
+
+def _tesseract_config(psm: int, oem: int, extra_config: str = "") -> str:
+    config = f"--oem {oem} --psm {psm} -c load_system_dawg=0 -c load_freq_dawg=0"
+    if extra_config:
+        config = f"{config} {extra_config}"
+    return config
+
+
+def _tesseract_data(
+    img: ImageInput,
     lang: str = "por+eng",
     psm: int = 6,
     oem: int = 3,
+    extra_config: str = "",
     tessdata_dir: Optional[str] = None,
-) -> str:
+) -> Tuple[str, List[float]]:
+    """OCR via TSV (`image_to_data`), para ter a confiança de cada palavra."""
     if tessdata_dir:
         os.environ["TESSDATA_PREFIX"] = tessdata_dir
-    config = f"--oem {oem} --psm {psm} -c load_system_dawg=0 -c load_freq_dawg=0"
-    return pytesseract.image_to_string(img, lang=lang, config=config)
+    data = pytesseract.image_to_data(
+        img,
+        lang=lang,
+        config=_tesseract_config(psm, oem, extra_config),
+        output_type=pytesseract.Output.DICT,
+    )
+    return _text_from_tesseract_data(data)
 
 
-def _normalize_pixels(
-    img: Image.Image,
-    target_long_side: int = 2200,
-    max_long_side: int = 3000,
-    allow_upscale: bool = False,
-) -> Image.Image:
-    """
-    Normaliza por pixels, não por DPI.
-    - Se o lado maior > max_long_side -> downscale
-    - Se allow_upscale=True e lado maior < target_long_side -> upscale moderado
-    - Caso contrário, retorna como está.
-    """
-    w, h = img.size
-    long_side = max(w, h)
+# Máximo de imagens por execução do Tesseract em lote.
+OCR_BATCH_MAX_ITEMS = int(os.getenv("OCR_BATCH_MAX_ITEMS", 16))
 
-    if long_side > max_long_side:
-        scale = max_long_side / float(long_side)
-        return img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
 
-    if allow_upscale and long_side < target_long_side:
-        scale = target_long_side / float(long_side)
-        return img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+def _save_for_tesseract(img: ImageInput, path: str):
+    if isinstance(img, np.ndarray):
+        # PNG com compressão baixa: o arquivo só vive até o Tesseract ler
+        cv2.imwrite(path, img, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    else:
+        img.save(path, "PNG", compress_level=1)
 
-    return img
 
+def _split_tesseract_pages(data: dict, count: int) -> List[dict]:
+    """Separa o TSV de uma execução com lista de imagens por `page_num`."""
+    pages = [{key: [] for key in data} for _ in range(count)]
+    for i, page_num in enumerate(data.get("page_num", [])):
+        page = pages[int(page_num) - 1]
+        for key, values in data.items():
+            page[key].append(values[i])
+    return pages
 
-def extract_text_from_image(
-    img: Image.Image,
+
+def _tesseract_batch(
+    images: List[ImageInput],
     lang: str = "por+eng",
     psm: int = 6,
     oem: int = 3,
+    extra_config: str = "",
     tessdata_dir: Optional[str] = None,
-) -> str:
+) -> List[Tuple[str, List[float]]]:
+    """
+    OCR de várias imagens numa única execução do Tesseract (entrada em lista
+    de arquivos), pagando a carga do traineddata uma vez só. O TSV sai com
+    um `page_num` por imagem, na ordem da lista.
+    """
+    if len(images) == 1:
+        return [
+            _tesseract_data(
+                images[0], lang, psm, oem, extra_config, tessdata_dir=tessdata_dir
+            )
+        ]
 
-    img_norm = _normalize_pixels(
-        img, target_long_side=2200, max_long_side=3000, allow_upscale=False
-    )
-    oriented = _fix_orientation(ImageOps.grayscale(img_norm))
+    results = []
+    for start in range(0, len(images), OCR_BATCH_MAX_ITEMS):
+        chunk = images[start : start + OCR_BATCH_MAX_ITEMS]
+        if tessdata_dir:
+            os.environ["TESSDATA_PREFIX"] = tessdata_dir
 
-    # 3) Pré-processar
-    pre = _preprocess_for_ocr(oriented)
+        with tempfile.TemporaryDirectory(prefix="ocr-batch-") as tmp:
+            paths = []
+            for i, img in enumerate(chunk):
+                path = os.path.join(tmp, f"{i:04d}.png")
+                _save_for_tesseract(img, path)
+                paths.append(path)
+            list_path = os.path.join(tmp, "images.txt")
+            with open(list_path, "w") as f:
+                f.write("\n".join(paths) + "\n")
 
-    # 4) Fatiar se necessário e OCR tile a tile
-    pieces = _slice_for_ocr(pre, max_dim=8000, stripe=2200, overlap=100)
+            output_base = os.path.join(tmp, "out")
+            pytesseract.pytesseract.run_tesseract(
+                list_path,
+                output_base,
+                extension="tsv",
+                lang=lang,
+                config=(
+                    "-c tessedit_create_tsv=1 "
+                    + _tesseract_config(psm, oem, extra_config)
+                ),
+            )
+            with open(f"{output_base}.tsv", encoding="utf-8") as f:
+                tsv = f.read()
 
-    # Heurística de ordenação: blocos por top->bottom, left->right
-    pieces_sorted = sorted(pieces, key=lambda it: (it[0][1], it[0][0]))
+        data = pytesseract.pytesseract.file_to_dict(tsv, "\t", -1)
+        results.extend(
+            _text_from_tesseract_data(page) if page.get("text") else ("", [])
+            for page in _split_tesseract_pages(data, len(chunk))
+        )
+    return results
+
+
+def _recognize(
+    images: List[np.ndarray],
+    lang: str,
+    psm: int,
+    oem: int,
+    extra_config: str = "",
+    tessdata_dir: Optional[str] = None,
+) -> List[Tuple[str, List[float]]]:
+    """
+    OCR das imagens já pré-processadas, em lote. Se o lote falhar (ex.: uma
+    imagem acima dos limites do Tesseract), refaz uma a uma, reduzindo um
+    pouco as que falharem de novo.
+    """
+    try:
+        return _tesseract_batch(images, lang, psm, oem, extra_config, tessdata_dir)
+    except pytesseract.TesseractError:
+        if len(images) > 1:
+            logger.warning("Tesseract batch failed, recognizing images one by one")
 
-    out = []
-    for _, tile in pieces_sorted:
+    results = []
+    for img in images:
         try:
-            out.append(
-                _tesseract(
-                    tile, lang=lang, psm=psm, oem=oem, tessdata_dir=tessdata_dir
-                ).strip()
+            results.append(
+                _tesseract_data(img, lang, psm, oem, extra_config, tessdata_dir)
             )
         except pytesseract.TesseractError:
             # fallback: reduzir um pouco e tentar de novo
-            tw, th = tile.size
-            fallback = tile.resize((int(tw * 0.8), int(th * 0.8)), Image.LANCZOS)
-            out.append(
-                _tesseract(
-                    fallback, lang=lang, psm=psm, oem=oem, tessdata_dir=tessdata_dir
-                ).strip()
+            h, w = img.shape
+            fallback = cv2.resize(
+                img, (int(w * 0.8), int(h * 0.8)), interpolation=cv2.INTER_AREA
+            )
+            results.append(
+                _tesseract_data(fallback, lang, psm, oem, extra_config, tessdata_dir)
             )
-    return "\n".join([t for t in out if t])
+    return results
+
+
+def _preprocess_fast(gray: np.ndarray) -> np.ndarray:
+    """Perfil "fast" (in-place): só binarização, sem upscale por DPI nem nitidez."""
+    return _binarize_inplace(gray)
+
+
+def _prepare_for_ocr(
+    img: ImageInput, mode: str, dpi: Optional[float] = None
+) -> np.ndarray:
+    """Pré-processa uma imagem no perfil `mode` (nova cópia; a entrada fica intacta)."""
+    gray = _to_gray_array(img)
+    if mode == "fast":
+        return _preprocess_fast(_working_copy(gray, max_long_side=3000))
+    work = _working_copy(gray, max_long_side=3000, dpi=dpi)
+    return _preprocess_for_ocr(_fix_orientation(work))
+
+
+def _join_tiles(results: List[Tuple[str, List[float]]]) -> Tuple[str, float]:
+    texts = [text.strip() for text, _ in results]
+    confs = [conf for _, tile_confs in results for conf in tile_confs]
+    mean_conf = sum(confs) / len(confs) if confs else 0.0
+    return "\n".join([t for t in texts if t]), mean_conf
+
+
+def _recognize_groups(
+    groups: List[List[np.ndarray]], **kwargs
+) -> List[Tuple[str, float]]:
+    """`_recognize` de vários grupos de cortes num lote só, juntando por grupo."""
+    flat = [piece for group in groups for piece in group]
+    raw = _recognize(flat, **kwargs) if flat else []
+    results, start = [], 0
+    for group in groups:
+        results.append(_join_tiles(raw[start : start + len(group)]))
+        start += len(group)
+    return results
+
+
+def _recognize_pages(
+    pages: List[np.ndarray],
+    lang: str,
+    psm: int,
+    oem: int,
+    extra_config: str = "",
+    tessdata_dir: Optional[str] = None,
+) -> List[Tuple[str, float]]:
+    """
+    OCR de páginas já pré-processadas, numa execução só, enviando ao
+    Tesseract apenas as regiões de texto (`_text_regions`). Página lida por
+    regiões com confiança abaixo de TEXT_REGION_MIN_CONFIDENCE é refeita
+    inteira, e fica o melhor resultado.
+    """
+    kwargs = dict(
+        lang=lang,
+        psm=psm,
+        oem=oem,
+        extra_config=extra_config,
+        tessdata_dir=tessdata_dir,
+    )
+    plans = [_ocr_pieces(page) for page in pages]
+    results = _recognize_groups([pieces for pieces, _ in plans], **kwargs)
+
+    retry = [
+        index
+        for index, (pieces, by_regions) in enumerate(plans)
+        if by_regions and pieces and results[index][1] < TEXT_REGION_MIN_CONFIDENCE
+    ]
+    whole = _recognize_groups([_page_tiles(pages[i]) for i in retry], **kwargs)
+    for index, result in zip(retry, whole):
+        results[index] = max(results[index], result, key=lambda r: r[1])
+
+    by_regions = sum(1 for _, regions in plans if regions)
+    _bump_text_region_stats(
+        pages=len(pages),
+        region_pages=by_regions,
+        whole_pages=len(pages) - by_regions,
+        retried_pages=len(retry),
+        pixels=sum(page.size for page in pages),
+        ocr_pixels=sum(piece.size for pieces, _ in plans for piece in pieces)
+        + sum(pages[i].size for i in retry),
+    )
+    return results
+
+
+def extract_text_with_confidence(
+    img: ImageInput,
+    lang: str = LANG_AUTO,
+    psm: int = 6,
+    oem: int = 3,
+    mode: str = "strong",
+    extra_config: str = "",
+    tessdata_dir: Optional[str] = None,
+    dpi: Optional[float] = None,
+) -> Tuple[str, float]:
+    """
+    OCR devolvendo (texto, confiança média das palavras 0-100).
+
+    Aceita PIL ou array uint8; a imagem de entrada nunca é modificada. Todo
+    o pré-processamento roda em uma única cópia em cinza.
+
+    Perfis:
+      - "fast": sem detecção de orientação e com pré-processamento mínimo;
+        bom para páginas limpas renderizadas de PDF.
+      - "strong": corrige orientação, sobe para 300 DPI quando o DPI é
+        conhecido (`dpi` ou metadado da imagem) e faz o pré-processamento
+        completo.
+
+    `lang="auto"`: roda só o modelo principal (OCR_AUTO_PRIMARY_LANG) e
+    repete com OCR_AUTO_FALLBACK_LANG quando o resultado parece ruim (ver
+    `needs_fallback_lang`); fica o de maior confiança.
+    """
+    if mode not in ("fast", "strong"):
+        raise ValueError(f"Invalid OCR mode: {mode}")
+
+    if lang == LANG_AUTO:
+        kwargs = dict(
+            psm=psm,
+            oem=oem,
+            mode=mode,
+            extra_config=extra_config,
+            tessdata_dir=tessdata_dir,
+            dpi=dpi,
+        )
+        best = extract_text_with_confidence(img, OCR_AUTO_PRIMARY_LANG, **kwargs)
+        used = OCR_AUTO_PRIMARY_LANG
+        if needs_fallback_lang(*best):
+            fallback = extract_text_with_confidence(
+                img, OCR_AUTO_FALLBACK_LANG, **kwargs
+            )
+            if fallback[1] >= best[1]:
+                best, used = fallback, OCR_AUTO_FALLBACK_LANG
+        record_ocr_lang(used)
+        return best
+
+    dpi = dpi or _image_dpi(img)
+    with ocr_slot():
+        pre = _prepare_for_ocr(img, mode, dpi)
+        return _recognize_pages(
+            [pre],
+            lang=lang,
+            psm=psm,
+            oem=oem,
+            extra_config=extra_config,
+            tessdata_dir=tessdata_dir,
+        )[0]
+
+
+def extract_text_from_image(
+    img: ImageInput,
+    lang: str = LANG_AUTO,
+    psm: int = 6,
+    oem: int = 3,
+    tessdata_dir: Optional[str] = None,
+) -> str:
+    text, _ = extract_text_with_confidence(
+        img, lang=lang, psm=psm, oem=oem, mode="strong", tessdata_dir=tessdata_dir
+    )
+    return text
+
+
+def _budgeted_cache_key(gray: np.ndarray, dpi, lang: str, conf_target: float) -> str:
+    return make_cache_key(
+        gray.data,
+        shape=gray.shape,
+        dpi=dpi,
+        lang=lang,
+        conf_target=conf_target,
+        engine="budgeted-v3",
+    )
+
+
+def ocr_image_budgeted(
+    img: ImageInput,
+    lang: str = LANG_AUTO,
+    time_budget_s: float = 6.0,
+    conf_target: float = 70.0,
+    dpi: Optional[float] = None,
+) -> Tuple[str, float]:
+    """
+    OCR em cascata, do passo mais barato ao mais caro, parando assim que a
+    confiança atinge `conf_target` ou o tempo acaba:
+      1) perfil "fast", psm=6 (bloco único)
+      2) perfil "strong", psm=4 (colunas)
+      3) se a imagem for muito grande/alongada, fatiar e juntar
+    Devolve o melhor (texto, confiança) obtido. O resultado fica no cache de
+    OCR endereçado pelos pixels da imagem, então a mesma página em outro
+    documento (ou URL) não passa de novo pelo Tesseract. Com `lang="auto"`
+    a língua é escolhida como em `ocr_images_with_lang`.
+    """
+    return ocr_images_budgeted(
+        [img],
+        lang=lang,
+        time_budget_s=time_budget_s,
+        conf_target=conf_target,
+        dpis=[dpi],
+    )[0]
+
+
+def ocr_images_budgeted(
+    images: List[ImageInput],
+    lang: str = LANG_AUTO,
+    time_budget_s: float = 6.0,
+    conf_target: float = 70.0,
+    dpis: Optional[List[Optional[float]]] = None,
+) -> List[Tuple[str, float]]:
+    """
+    `ocr_image_budgeted` para várias imagens (ex.: páginas de um PDF): o
+    passo 1 de todas roda numa única execução do Tesseract; só as que não
+    atingirem `conf_target` seguem, uma a uma, pelo resto da cascata.
+    `time_budget_s` vale por imagem.
+    """
+    if lang == LANG_AUTO:
+        results = ocr_images_with_lang(
+            images, lang, time_budget_s, conf_target, dpis=dpis
+        )
+        return [(text, confidence) for text, confidence, _ in results]
+
+    dpis = dpis or [None] * len(images)
+    results: List[Optional[Tuple[str, float]]] = [None] * len(images)
+
+    pending = []
+    for index, (img, dpi) in enumerate(zip(images, dpis)):
+        dpi = dpi or _image_dpi(img)
+        gray = np.ascontiguousarray(_to_gray_array(img))
+        cache_key = _budgeted_cache_key(gray, dpi, lang, conf_target)
+        cached = ocr_cache.get(cache_key)
+        if cached is not None:
+            results[index] = (cached["text"], cached["confidence"])
+        else:
+            pending.append((index, gray, dpi, cache_key))
+
+    if pending:
+        t0 = time.monotonic()
+        # FAST: psm=6, todas as imagens num lote
+        with ocr_slot():
+            prepared = [_prepare_for_ocr(gray, "fast") for _, gray, _, _ in pending]
+            fast_results = _recognize_pages(prepared, lang=lang, psm=6, oem=1)
+            del prepared
+        spent = (time.monotonic() - t0) / len(pending)
+
+        for (index, gray, dpi, cache_key), best in zip(pending, fast_results):
+            if best[1] < conf_target:
+                best = _ocr_image_cascade(
+                    gray, lang, time_budget_s - spent, conf_target, dpi, best
+                )
+            ocr_cache.set(cache_key, {"text": best[0], "confidence": best[1]})
+            results[index] = best
+
+    return results
+
+
+def ocr_images_with_lang(
+    images: List[ImageInput],
+    lang: str = LANG_AUTO,
+    time_budget_s: float = 6.0,
+    conf_target: float = 70.0,
+    dpis: Optional[List[Optional[float]]] = None,
+) -> List[Tuple[str, float, str]]:
+    """
+    `ocr_images_budgeted` devolvendo também a língua usada em cada imagem.
+    Com `lang="auto"`, todas passam pelo modelo principal (um modelo só, metade
+    do custo de "por+eng"); as que parecerem ruins (`needs_fallback_lang`)
+    repetem com o par de línguas, e fica o resultado de maior confiança.
+    """
+    dpis = dpis or [None] * len(images)
+    if lang != LANG_AUTO:
+        results = ocr_images_budgeted(images, lang, time_budget_s, conf_target, dpis)
+        return [(text, confidence, lang) for text, confidence in results]
+
+    primary = ocr_images_budgeted(
+        images, OCR_AUTO_PRIMARY_LANG, time_budget_s, conf_target, dpis
+    )
+    results = [(text, conf, OCR_AUTO_PRIMARY_LANG) for text, conf in primary]
+
+    retry = [
+        index
+        for index, (text, conf) in enumerate(primary)
+        if needs_fallback_lang(text, conf)
+    ]
+    if retry:
+        fallback = ocr_images_budgeted(
+            [images[index] for index in retry],
+            OCR_AUTO_FALLBACK_LANG,
+            time_budget_s,
+            conf_target,
+            [dpis[index] for index in retry],
+        )
+        for index, (text, conf) in zip(retry, fallback):
+            if conf >= results[index][1]:
+                results[index] = (text, conf, OCR_AUTO_FALLBACK_LANG)
+
+    for _, _, used in results:
+        record_ocr_lang(used)
+    return results
+
+
+def _ocr_image_cascade(
+    img: np.ndarray,
+    lang: str,
+    time_budget_s: float,
+    conf_target: float,
+    dpi: Optional[float] = None,
+    fast_result: Optional[Tuple[str, float]] = None,
+) -> Tuple[str, float]:
+    t0 = time.monotonic()
+
+    def out_of_time():
+        return (time.monotonic() - t0) > time_budget_s
+
+    # FAST: psm=6 (pode já vir pronto do lote)
+    best = fast_result or extract_text_with_confidence(
+        img, lang=lang, psm=6, oem=1, mode="fast"
+    )
+    if best[1] >= conf_target or out_of_time():
+        return best
+
+    # COLUNAS: psm=4
+    strong = extract_text_with_confidence(
+        img, lang=lang, psm=4, oem=1, mode="strong", dpi=dpi
+    )
+    best = max(best, strong, key=lambda r: r[1])
+    if best[1] >= conf_target or out_of_time():
+        return best
+
+    # FATIA se realmente grande/alongada
+    tiles = _slice_for_ocr(img, max_dim=7000, stripe=2600, overlap=80)
+    if len(tiles) == 1:
+        return best
+
+    with ocr_slot():
+        prepared = []
+        for _, tile in sorted(tiles, key=lambda b: (b[0][1], b[0][0])):
+            if out_of_time():
+                break
+            prepared.append(_prepare_for_ocr(tile, "strong", dpi))
+        per_tile = _recognize_pages(prepared, lang=lang, psm=4, oem=1)
+
+    joined = "\n".join([text for text, _ in per_tile if text]).strip()
+    mean_conf = statistics.mean([conf for _, conf in per_tile]) if per_tile else 0.0
+    return max(best, (joined, mean_conf), key=lambda r: r[1])
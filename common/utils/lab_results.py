@@ -0,0 +1,323 @@
+import re
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional, Tuple
+
+from unidecode import unidecode
+
+# Extração de resultados de exames laboratoriais do texto (OCR, PDF, DOCX
+# ou XLSX): uma linha por analito, nos formatos mais comuns dos laudos
+#   "GLICOSE ........ 98 mg/dL    70 a 99 mg/dL"
+#   "Creatinina: 0,9 mg/dL (VR: 0,6 a 1,3)"
+#   "Hemoglobina | 12,5 | g/dL | 12,0 - 16,0"      (tabelas de DOCX/XLSX)
+# e o formato em bloco
+#   "GLICOSE" / "Resultado: 98 mg/dL" / "Valores de referência: 70 a 99"
+
+_NUMBER = r"\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:[.,]\d+)?"
+
+# unidades aceitas logo após o valor ("µ" também casa "u", comum no OCR)
+_UNITS = (
+    "mg/dL mg/dl g/dL g/dl mEq/L mmol/L µmol/L nmol/L pmol/L mg/L g/L ng/mL "
+    "ng/dL pg/mL µg/dL µg/L mcg/dL mcg/L µUI/mL µIU/mL mUI/mL UI/mL UI/L U/L "
+    "U/mL mL/min/1,73m² mL/min/1,73m2 mL/min fL pg % mil/mm³ mil/mm3 "
+    "milhões/mm³ milhões/mm3 /mm³ /mm3 x10³/µL x10^3/µL 10³/µL 10^3/µL "
+    "10^6/µL /µL mm/h mg/24h g/24h seg"
+).split()
+_UNIT = "|".join(
+    re.escape(unit).replace("µ", "[µu]")
+    for unit in sorted(_UNITS, key=len, reverse=True)
+)
+_COUNT_UNIT_RE = re.compile(r"mm[³3]|[µu]L", re.IGNORECASE)
+
+_QUALITATIVE = (
+    r"n[ãa]o\s+reagente|reagente|negativo|positivo|ausentes?|presentes?|"
+    r"n[ãa]o\s+detectado|detectado|indetect[áa]vel|detect[áa]vel"
+)
+
+_ANALYTE = r"(?P<analyte>[^\W_][\w ()/+\-.,']*?)"
+_VALUE_SEP = r"\s*[:=]?\s+"
+
+_RESULT_RE = re.compile(
+    rf"^{_ANALYTE}{_VALUE_SEP}"
+    rf"(?P<value>(?:[<>≤≥]=?\s*)?(?:{_NUMBER}))(?![\d/.,:])"
+    rf"(?:\s*(?P<unit>{_UNIT})(?=[\s)\],;]|$))?"
+    rf"(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+_QUALITATIVE_RE = re.compile(
+    rf"^{_ANALYTE}{_VALUE_SEP}(?P<value>{_QUALITATIVE})\b(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+_RESULT_LINE_RE = re.compile(r"^resultados?\s*[:.]?\s+(?P<value>.+)$", re.IGNORECASE)
+_REFERENCE_LINE_RE = re.compile(
+    r"^(?:valor(?:es)?\s+de\s+refer[êe]ncia|refer[êe]ncia|v\.?\s?r\.?)\s*[:.]?\s*"
+    r"(?P<reference>.+)$",
+    re.IGNORECASE,
+)
+_REFERENCE_PREFIX_RE = re.compile(
+    r"^[\s|:;(\-]*(?:valor(?:es)?\s+de\s+refer[êe]ncia|refer[êe]ncia|ref\.?|"
+    r"v\.?\s?r\.?)?\s*[:.]?\s*",
+    re.IGNORECASE,
+)
+_RANGE_RE = re.compile(
+    rf"(?P<min>{_NUMBER})\s*(?:a|à|-|–|até|ate)\s*(?P<max>{_NUMBER})", re.IGNORECASE
+)
+_UPPER_RE = re.compile(
+    r"(?:<|≤|até|ate|inferior\s+a|menor\s+que|abaixo\s+de)\s*=?\s*"
+    rf"(?P<max>{_NUMBER})",
+    re.IGNORECASE,
+)
+_LOWER_RE = re.compile(
+    rf"(?:>|≥|superior\s+a|maior\s+que|acima\s+de)\s*=?\s*(?P<min>{_NUMBER})",
+    re.IGNORECASE,
+)
+_LEADERS_RE = re.compile(r"\.{3,}|_{3,}|…+|\t")
+_COLLECTION_DATE_RE = re.compile(
+    r"(?:data\s+d[ae]\s+coleta|coletad[oa]\s+em|colhid[oa]\s+em|"
+    r"data\s+do\s+exame|coleta)\s*[:\-]?\s*"
+    r"(?P<day>\d{1,2})[/.\-](?P<month>\d{1,2})[/.\-](?P<year>\d{2,4})",
+    re.IGNORECASE,
+)
+
+# nomes equivalentes para a mesma chave (depois da normalização)
+ANALYTE_ALIASES = {
+    "glicemia": "glicose",
+    "glicemia_de_jejum": "glicose",
+    "glicose_em_jejum": "glicose",
+    "glicose_jejum": "glicose",
+    "hb": "hemoglobina",
+    "ht": "hematocrito",
+    "hto": "hematocrito",
+    "hba1c": "hemoglobina_glicada",
+    "a1c": "hemoglobina_glicada",
+    "tgo": "ast",
+    "aspartato_aminotransferase": "ast",
+    "tgp": "alt",
+    "alanina_aminotransferase": "alt",
+    "gama_gt": "ggt",
+    "colesterol": "colesterol_total",
+    "hdl_colesterol": "hdl",
+    "colesterol_hdl": "hdl",
+    "ldl_colesterol": "ldl",
+    "colesterol_ldl": "ldl",
+    "triglicerides": "triglicerideos",
+    "pcr": "proteina_c_reativa",
+    "tsh_ultrassensivel": "tsh",
+    "tsh_ultra_sensivel": "tsh",
+    "t4l": "t4_livre",
+    "vitamina_b12": "b12",
+    "eritrocitos": "hemacias",
+}
+_ANALYTE_SUFFIXES = ("_serica", "_serico", "_plasmatica", "_plasmatico", "_sanguinea")
+_ANALYTE_PREFIXES = ("dosagem_de_", "dosagem_do_", "dosagem_da_")
+
+# aceitos mesmo sem unidade nem referência na linha
+KNOWN_ANALYTES = frozenset(
+    """
+    glicose hemoglobina hematocrito hemacias leucocitos plaquetas vcm hcm chcm
+    rdw creatinina ureia sodio potassio cloro calcio magnesio fosforo
+    acido_urico colesterol_total hdl ldl vldl triglicerideos tsh t4_livre t3
+    ast alt ggt fosfatase_alcalina bilirrubina_total albumina
+    proteina_c_reativa vhs ferritina b12 acido_folico hemoglobina_glicada inr
+    """.split()
+)
+# cabeçalhos que parecem "nome valor" mas não são resultado
+_IGNORED_ANALYTES = frozenset(
+    """
+    data idade pagina crm cpf rg cns telefone protocolo pedido atendimento
+    leito quarto registro cep sexo peso altura numero resultado resultados
+    referencia valor_de_referencia valores_de_referencia vr material metodo
+    """.split()
+)
+
+
+@dataclass
+class LabResult:
+    analyte: str
+    analyte_key: str
+    value: Optional[Decimal]
+    value_text: str
+    unit: str = ""
+    reference_min: Optional[Decimal] = None
+    reference_max: Optional[Decimal] = None
+    reference_text: str = ""
+    line: str = ""
+
+    @property
+    def is_abnormal(self) -> Optional[bool]:
+        if self.value is None or (
+            self.reference_min is None and self.reference_max is None
+        ):
+            return None
+        if self.reference_min is not None and self.value < self.reference_min:
+            return True
+        return self.reference_max is not None and self.value > self.reference_max
+
+
+def analyte_key(name: str) -> str:
+    """Chave normalizada do analito ("Glicemia de jejum" -> "glicose")."""
+    name = re.sub(r"\([^)]*\)", " ", unidecode(name).lower())
+    key = re.sub(r"[^a-z0-9]+", "_", name).strip("_")
+    for prefix in _ANALYTE_PREFIXES:
+        if key.startswith(prefix):
+            key = key[len(prefix) :]
+    for suffix in _ANALYTE_SUFFIXES:
+        if key.endswith(suffix):
+            key = key[: -len(suffix)]
+    return ANALYTE_ALIASES.get(key, key)
+
+
+def parse_decimal(text: str, unit: str = "") -> Optional[Decimal]:
+    """
+    Número no formato brasileiro ("12,5", "250.000"). Um ponto seguido de 3
+    dígitos só é separador de milhar com mais de um ponto ou em contagens
+    (/mm³, /µL); senão é decimal (ex.: densidade urinária 1.020).
+    """
+    text = text.strip().lstrip("<>≤≥= ")
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", text) and (
+        text.count(".") > 1 or _COUNT_UNIT_RE.search(unit)
+    ):
+        text = text.replace(".", "")
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+def parse_reference(
+    text: str, unit: str = ""
+) -> Tuple[Optional[Decimal], Optional[Decimal], str]:
+    """(mínimo, máximo, texto) da faixa de referência, se houver."""
+    text = _REFERENCE_PREFIX_RE.sub("", text).strip(" |;)")[:200]
+    match = _RANGE_RE.search(text)
+    if match:
+        return (
+            parse_decimal(match["min"], unit),
+            parse_decimal(match["max"], unit),
+            text,
+        )
+    match = _UPPER_RE.search(text)
+    if match:
+        return None, parse_decimal(match["max"], unit), text
+    match = _LOWER_RE.search(text)
+    if match:
+        return parse_decimal(match["min"], unit), None, text
+    return None, None, text
+
+
+def _normalize_line(line: str) -> str:
+    line = line.replace("μ", "µ")
+    line = _LEADERS_RE.sub("  ", line)
+    return " ".join(line.replace("|", " ").split())
+
+
+def _match_line(line: str) -> Optional[re.Match]:
+    numeric = _RESULT_RE.match(line)
+    qualitative = _QUALITATIVE_RE.match(line)
+    # número sem unidade antes de um resultado qualitativo é parte do nome
+    # do analito (ex.: "HIV 1 e 2: Não reagente")
+    if qualitative and not (numeric and numeric["unit"]):
+        return qualitative
+    return numeric
+
+
+def _parse_line(line: str) -> Optional[LabResult]:
+    match = _match_line(line)
+    if not match:
+        return None
+
+    analyte = match["analyte"].strip(" .,:-")
+    key = analyte_key(analyte)
+    if (
+        len(re.findall(r"[^\W\d_]", analyte)) < 2
+        or len(analyte) > 60
+        or key in _IGNORED_ANALYTES
+    ):
+        return None
+
+    groups = match.groupdict()
+    unit = (groups.get("unit") or "").replace("μ", "µ")
+    value_text = " ".join(match["value"].split())
+    numeric = "unit" in groups
+    value = parse_decimal(value_text, unit) if numeric else None
+    reference_min, reference_max, reference_text = parse_reference(
+        match["rest"], unit
+    )
+    has_reference = reference_min is not None or reference_max is not None
+
+    if numeric and not (unit or has_reference or key in KNOWN_ANALYTES):
+        return None
+    return LabResult(
+        analyte=analyte,
+        analyte_key=key,
+        value=value,
+        value_text=value_text,
+        unit=unit,
+        reference_min=reference_min,
+        reference_max=reference_max,
+        reference_text=reference_text,
+        line=line[:300],
+    )
+
+
+def parse_lab_results(text: str) -> List[LabResult]:
+    """
+    Resultados encontrados no texto, na ordem do documento. O mesmo analito
+    com o mesmo valor (ex.: cabeçalho repetido por página) entra uma vez.
+    """
+    results: List[LabResult] = []
+    seen = set()
+    heading = None
+    last, last_at = None, -1
+
+    for index, raw_line in enumerate((text or "").splitlines()):
+        line = _normalize_line(raw_line)
+        if not line:
+            continue
+
+        result = None
+        block = _RESULT_LINE_RE.match(line)
+        if block and heading:
+            # formato em bloco: nome numa linha, "Resultado: ..." depois
+            result = _parse_line(f"{heading} {block['value']}")
+        if result is None:
+            result = _parse_line(line)
+
+        if result is None:
+            reference = _REFERENCE_LINE_RE.match(line)
+            if reference and last is not None and index - last_at <= 3:
+                if last.reference_min is None and last.reference_max is None:
+                    minimum, maximum, reference_text = parse_reference(
+                        reference["reference"], last.unit
+                    )
+                    last.reference_min, last.reference_max = minimum, maximum
+                    last.reference_text = reference_text
+            elif not re.search(r"\d|:", line) and len(line) <= 60:
+                heading = line
+            continue
+
+        identity = (result.analyte_key, result.value_text, result.unit)
+        if identity in seen:
+            continue
+        seen.add(identity)
+        results.append(result)
+        last, last_at = result, index
+        heading = None
+
+    return results
+
+
+def parse_collection_date(text: str) -> Optional[date]:
+    """Data da coleta informada no laudo ("Data da coleta: 12/03/2025")."""
+    for match in _COLLECTION_DATE_RE.finditer(text or ""):
+        year = int(match["year"])
+        if year < 100:
+            year += 2000
+        try:
+            return date(year, int(match["month"]), int(match["day"]))
+        except ValueError:
+            continue
+    return None
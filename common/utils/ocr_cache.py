@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "True").lower() == "true"
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "/tmp/ocr-cache")
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def make_cache_key(content: bytes, **params: Any) -> str:
+    """
+    Chave endereçada por conteúdo: SHA-256 dos bytes (página renderizada ou
+    arquivo inteiro) + parâmetros que mudam o resultado do OCR.
+    """
+    return make_digest_cache_key(hashlib.sha256(content).hexdigest(), **params)
+
+
+def make_digest_cache_key(content_sha256: str, **params: Any) -> str:
+    """Igual a `make_cache_key`, para quando o SHA-256 já foi calculado."""
+    digest = hashlib.sha256(content_sha256.encode())
+    digest.update(orjson.dumps(params, option=orjson.OPT_SORT_KEYS))
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """
+    Cache em disco de resultados de OCR, compartilhado pelos processos do
+    container. Cada entrada é um arquivo em `<dir>/<k[:2]>/<k><suffix>` (JSON
+    por padrão; `get_bytes`/`set_bytes` guardam bytes crus); leituras
+    atualizam o mtime, e a limpeza remove os menos usados quando o total
+    passa de `max_bytes` (LRU aproximado).
+    """
+
+    # a varredura do diretório só roda a cada ~5% do teto gravados
+    EVICT_EVERY_FRACTION = 0.05
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        enabled: bool = True,
+        suffix: str = ".json",
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.suffix = suffix
+        self._written_since_evict = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}{self.suffix}")
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            data = self.get_bytes(key)
+            return None if data is None else orjson.loads(data)
+        except Exception as e:
+            logger.warning(f"Invalid OCR cache entry {key}: {str(e)}")
+            return None
+
+    def set(self, key: str, value: Any):
+        if self.enabled:
+            self.set_bytes(key, orjson.dumps(value))
+
+    def set_bytes(self, key: str, data: bytes) -> Optional[str]:
+        """Grava a entrada e devolve o caminho (None se desligado ou falhou)."""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # escreve num temporário e renomeia: leitores nunca veem arquivo pela metade
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write OCR cache entry {key}: {str(e)}")
+            return None
+
+        with self._lock:
+            self._written_since_evict += len(data)
+            should_evict = (
+                self._written_since_evict
+                >= self.max_bytes * self.EVICT_EVERY_FRACTION
+            )
+            if should_evict:
+                self._written_since_evict = 0
+        if should_evict:
+            self.evict()
+        return path
+
+    def evict(self):
+        """Remove as entradas mais antigas até ficar em 90% do teto."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+ocr_cache = OcrCache(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES, enabled=OCR_CACHE_ENABLED)
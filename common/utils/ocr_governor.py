@@ -0,0 +1,278 @@
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Quantos OCRs (threads e pools de páginas somados) o processo roda ao mesmo
+# tempo. O teto vem da cota de CPU do cgroup (ou OCR_MAX_CONCURRENCY); o
+# limite efetivo cai quando falta memória ou o container está sendo
+# estrangulado pela cota, e volta a subir, uma vaga por vez, quando alivia.
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", 0))
+# memória estimada por OCR em andamento (página a 300 DPI + Tesseract)
+OCR_MEMORY_PER_SLOT = int(os.getenv("OCR_MEMORY_PER_SLOT_MB", 350)) * 1024 * 1024
+# intervalo mínimo entre releituras do cgroup (s)
+OCR_GOVERNOR_INTERVAL = float(os.getenv("OCR_GOVERNOR_INTERVAL", 2.0))
+# fração do tempo com a CPU estrangulada pela cota que conta como pressão
+OCR_CPU_THROTTLE_MAX = float(os.getenv("OCR_CPU_THROTTLE_MAX", 0.1))
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(CGROUP_ROOT, path)) as f:
+            return f.read().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def _read_stat(path: str, key: str) -> Optional[int]:
+    content = _read(path)
+    for line in (content or "").splitlines():
+        name, _, value = line.partition(" ")
+        if name == key:
+            return int(value)
+    return None
+
+
+def cgroup_cpu_limit() -> float:
+    """CPUs que o container pode usar: cota do cgroup (v2 ou v1) ou afinidade."""
+    cpus = float(len(os.sched_getaffinity(0)))
+    quota = period = None
+    cpu_max = _read("cpu.max")
+    if cpu_max:
+        q, _, p = cpu_max.partition(" ")
+        if q != "max":
+            quota, period = int(q), int(p)
+    else:
+        q, p = _read("cpu/cpu.cfs_quota_us"), _read("cpu/cpu.cfs_period_us")
+        if q and p and int(q) > 0:
+            quota, period = int(q), int(p)
+    if quota and period:
+        cpus = min(cpus, quota / float(period))
+    return cpus
+
+
+def cgroup_memory_headroom() -> Optional[int]:
+    """
+    Bytes que ainda cabem antes do limite de memória do container (cache de
+    arquivos inativo conta como livre). Sem limite, a memória disponível do
+    host; None se nada puder ser lido.
+    """
+    limit = _read("memory.max")
+    if limit is not None:
+        usage = _read("memory.current")
+        inactive = _read_stat("memory.stat", "inactive_file") or 0
+    else:
+        limit = _read("memory/memory.limit_in_bytes")
+        usage = _read("memory/memory.usage_in_bytes")
+        inactive = _read_stat("memory/memory.stat", "total_inactive_file") or 0
+
+    total = _meminfo("MemTotal")
+    # v1 sem limite devolve um número enorme; v2 devolve "max"
+    if limit and limit != "max" and usage and (not total or int(limit) < total):
+        return max(0, int(limit) - (int(usage) - inactive))
+    return _meminfo("MemAvailable")
+
+
+def _meminfo(key: str) -> Optional[int]:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith(f"{key}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _cpu_throttled_usec() -> Optional[int]:
+    usec = _read_stat("cpu.stat", "throttled_usec")
+    if usec is not None:
+        return usec
+    nsec = _read_stat("cpu/cpu.stat", "throttled_time")
+    return nsec // 1000 if nsec is not None else None
+
+
+class OcrGovernor:
+    """
+    Semáforo com limite ajustável. O limite é recalculado no máximo a cada
+    OCR_GOVERNOR_INTERVAL, por quem pede ou devolve vagas:
+      - teto: cota de CPU do cgroup (arredondada para cima) ou `ceiling`;
+      - memória: as vagas em uso + as que cabem na folga (OCR_MEMORY_PER_SLOT
+        cada);
+      - CPU estrangulada pela cota: tira uma vaga; sem pressão, devolve uma
+        (subir uma por intervalo dá tempo de a memória das vagas novas
+        aparecer na próxima leitura).
+    Vagas já concedidas não são tomadas de volta: com o limite abaixo do uso,
+    novos pedidos esperam. Sempre há ao menos uma vaga.
+    """
+
+    def __init__(self, ceiling: int = 0, interval: float = OCR_GOVERNOR_INTERVAL):
+        self.cpu_limit = cgroup_cpu_limit()
+        self.ceiling = ceiling or max(1, math.ceil(self.cpu_limit))
+        self.limit = self.ceiling
+        self.interval = interval
+        self.active = 0
+        self.waiting = 0
+        self.memory_headroom: Optional[int] = None
+        self._cond = threading.Condition()
+        self._checked_at = 0.0
+        self._throttled_usec = _cpu_throttled_usec()
+        self._stats = {
+            "acquired": 0,
+            "waited": 0,
+            "wait_s": 0.0,
+            "max_wait_s": 0.0,
+            "adjustments": 0,
+        }
+
+    def _refresh(self):
+        now = time.monotonic()
+        elapsed = now - self._checked_at
+        if elapsed < self.interval:
+            return
+        self._checked_at = now
+
+        limit = self.limit
+        throttled = _cpu_throttled_usec()
+        if throttled is not None and self._throttled_usec is not None:
+            fraction = (throttled - self._throttled_usec) / (elapsed * 1e6)
+            if fraction > OCR_CPU_THROTTLE_MAX:
+                limit -= 1
+            else:
+                limit += 1
+        else:
+            limit += 1
+        self._throttled_usec = throttled
+        limit = min(limit, self.ceiling)
+
+        self.memory_headroom = cgroup_memory_headroom()
+        if self.memory_headroom is not None:
+            fits = self.memory_headroom // OCR_MEMORY_PER_SLOT
+            limit = min(limit, self.active + fits)
+
+        limit = max(1, limit)
+        if limit != self.limit:
+            logger.info(
+                f"OCR concurrency {self.limit} -> {limit} (active {self.active}, "
+                f"waiting {self.waiting}, headroom "
+                f"{(self.memory_headroom or 0) // (1024 * 1024)} MB)"
+            )
+            self._stats["adjustments"] += 1
+            self.limit = limit
+            self._cond.notify_all()
+
+    def _record_wait(self, waited: float):
+        self._stats["acquired"] += 1
+        if waited > 0:
+            self._stats["waited"] += 1
+            self._stats["wait_s"] += waited
+            self._stats["max_wait_s"] = max(self._stats["max_wait_s"], waited)
+
+    def acquire(self, blocking: bool = True) -> bool:
+        with self._cond:
+            self._refresh()
+            if self.active >= self.limit:
+                if not blocking:
+                    return False
+                t0 = time.monotonic()
+                self.waiting += 1
+                try:
+                    while self.active >= self.limit:
+                        # acorda de tempos em tempos para reavaliar o limite
+                        self._cond.wait(self.interval)
+                        self._refresh()
+                finally:
+                    self.waiting -= 1
+                self._record_wait(time.monotonic() - t0)
+            else:
+                self._record_wait(0.0)
+            self.active += 1
+            return True
+
+    def release(self, count: int = 1):
+        with self._cond:
+            self.active -= count
+            self._refresh()
+            self._cond.notify(count)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(
+                limit=self.limit,
+                ceiling=self.ceiling,
+                cpu_limit=round(self.cpu_limit, 2),
+                active=self.active,
+                waiting=self.waiting,
+                memory_headroom_mb=(
+                    self.memory_headroom // (1024 * 1024)
+                    if self.memory_headroom is not None
+                    else None
+                ),
+                mean_wait_ms=(
+                    round(1000 * stats["wait_s"] / stats["waited"], 1)
+                    if stats["waited"]
+                    else 0.0
+                ),
+            )
+            stats["wait_s"] = round(stats["wait_s"], 3)
+            stats["max_wait_s"] = round(stats["max_wait_s"], 3)
+            return stats
+
+
+ocr_governor = OcrGovernor(OCR_MAX_CONCURRENCY)
+_ocr_local = threading.local()
+
+
+def get_ocr_governor_stats() -> dict:
+    """Limite atual, vagas em uso e tempo de espera na fila de OCR."""
+    return ocr_governor.stats()
+
+
+def cv2_threads() -> int:
+    """
+    Threads do OpenCV por OCR: a paralelização é entre páginas, então só
+    sobra CPU para o OpenCV quando o teto de OCRs é menor que a cota.
+    """
+    return max(1, int(ocr_governor.cpu_limit // ocr_governor.ceiling))
+
+
+@contextmanager
+def ocr_slot() -> Iterator[None]:
+    """Ocupa 1 vaga de OCR (no-op em workers de um pool que já reservou)."""
+    if getattr(_ocr_local, "reserved", False):
+        yield
+        return
+    ocr_governor.acquire()
+    try:
+        yield
+    finally:
+        ocr_governor.release()
+
+
+@contextmanager
+def reserve_ocr_slots(wanted: int) -> Iterator[int]:
+    """
+    Reserva até `wanted` vagas (espera pela primeira, pega as demais só se
+    estiverem livres) e devolve quantas conseguiu.
+    """
+    ocr_governor.acquire()
+    reserved = 1
+    while reserved < wanted and ocr_governor.acquire(blocking=False):
+        reserved += 1
+    try:
+        yield reserved
+    finally:
+        ocr_governor.release(reserved)
+
+
+def mark_ocr_worker():
+    """Marca a thread atual como worker de um pool com vagas já reservadas."""
+    _ocr_local.reserved = True
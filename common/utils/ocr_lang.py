@@ -0,0 +1,85 @@
+import os
+import re
+import threading
+from typing import Optional
+
+from unidecode import unidecode
+
+# lang="auto": OCR só com o modelo principal e, se o resultado parecer
+# ruim (confiança baixa ou palavras de outra língua), de novo com o par.
+LANG_AUTO = "auto"
+OCR_AUTO_PRIMARY_LANG = os.getenv("OCR_AUTO_PRIMARY_LANG", "por")
+OCR_AUTO_FALLBACK_LANG = os.getenv("OCR_AUTO_FALLBACK_LANG", "por+eng")
+OCR_AUTO_MIN_CONFIDENCE = float(os.getenv("OCR_AUTO_MIN_CONFIDENCE", 60.0))
+OCR_AUTO_MIN_DICT_HIT = float(os.getenv("OCR_AUTO_MIN_DICT_HIT", 0.6))
+# abaixo disso não dá para julgar a língua pelo vocabulário
+OCR_AUTO_MIN_KNOWN_WORDS = 5
+
+# Vocabulário curto e frequente de cada língua (sem acentos): palavras
+# funcionais e termos comuns em laudos. Palavras iguais nas duas línguas
+# (ex.: "normal", "total") não contam para nenhuma.
+_PORTUGUESE_WORDS = frozenset(
+    """
+    a ao aos as com como da das de do dos e em entre era essa esse esta este
+    foi ha isso ja mais mas na nas nao no nos o os ou para pela pelo por que
+    se sem ser seu sua sao tem um uma uns umas
+    abaixo acima alterado amostra analise colesterol coleta creatinina data
+    exame exames glicose hemacias hemograma hemoglobina jejum laboratorio
+    laudo leucocitos limite material medico metodo nome paciente plaquetas
+    potassio referencia resultado resultados sangue sodio soro urina ureia
+    valor valores
+    """.split()
+)
+_ENGLISH_WORDS = frozenset(
+    """
+    the of and to in is it for on with as was by at from this that be are or
+    an which have has not but were been their they will would can all any
+    there these than other into only also its our
+    above below blood count date high level low negative patient positive
+    range reference result results sample specimen test tests units value
+    values
+    """.split()
+) - _PORTUGUESE_WORDS
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+_lang_stats = {}
+_lang_stats_lock = threading.Lock()
+
+
+def record_ocr_lang(lang: str):
+    with _lang_stats_lock:
+        _lang_stats[lang] = _lang_stats.get(lang, 0) + 1
+
+
+def get_ocr_lang_stats() -> dict:
+    """Quantas imagens ficaram em cada língua na seleção automática."""
+    with _lang_stats_lock:
+        return dict(_lang_stats)
+
+
+def dictionary_hit_rate(text: str) -> Optional[float]:
+    """
+    Fração das palavras conhecidas do texto que são do vocabulário em
+    português (vs. inglês). None se há poucas palavras conhecidas.
+    """
+    portuguese = english = 0
+    for word in _WORD_RE.findall(unidecode(text).lower()):
+        if word in _PORTUGUESE_WORDS:
+            portuguese += 1
+        elif word in _ENGLISH_WORDS:
+            english += 1
+    if portuguese + english < OCR_AUTO_MIN_KNOWN_WORDS:
+        return None
+    return portuguese / float(portuguese + english)
+
+
+def needs_fallback_lang(text: str, confidence: float) -> bool:
+    """Se o resultado do modelo principal justifica rodar o par de línguas."""
+    if not text.strip():
+        # página em branco: outro modelo não vai achar texto
+        return False
+    if confidence < OCR_AUTO_MIN_CONFIDENCE:
+        return True
+    hit_rate = dictionary_hit_rate(text)
+    return hit_rate is not None and hit_rate < OCR_AUTO_MIN_DICT_HIT
@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import logging
+import os
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, features
+
+from common.utils.image import enhance_image
+from common.utils.ocr_cache import OcrCache
+
+logger = logging.getLogger(__name__)
+
+# Imagens das páginas que ficaram sem texto:
+#   - "ref": grava o arquivo (WebP, ou JPEG sem suporte a WebP) e devolve
+#     uma referência leve (ver `store_page_image`)
+#   - "base64": compatibilidade, a imagem em JPEG/base64 vai no resultado
+PAGE_IMAGE_MODE_REF = "ref"
+PAGE_IMAGE_MODE_BASE64 = "base64"
+OCR_PAGE_IMAGE_MODE = os.getenv("OCR_PAGE_IMAGE_MODE", PAGE_IMAGE_MODE_REF)
+
+# Onde ficam as referências: "storage" (default_storage do Django, S3 em
+# produção) ou "local" (diretório endereçado por conteúdo, com limpeza LRU)
+PAGE_IMAGE_STORE_STORAGE = "storage"
+PAGE_IMAGE_STORE_LOCAL = "local"
+OCR_PAGE_IMAGE_STORE = os.getenv("OCR_PAGE_IMAGE_STORE", PAGE_IMAGE_STORE_STORAGE)
+OCR_PAGE_IMAGE_PREFIX = "ocr-pages"
+OCR_PAGE_IMAGE_DIR = os.getenv("OCR_PAGE_IMAGE_DIR", "/tmp/ocr-page-images")
+OCR_PAGE_IMAGE_MAX_BYTES = int(
+    os.getenv("OCR_PAGE_IMAGE_MAX_BYTES", 1024 * 1024 * 1024)
+)
+OCR_PAGE_IMAGE_MAX_SIDE = 1024
+
+# WebP quando o Pillow tem suporte; senão JPEG
+if features.check("webp"):
+    PAGE_IMAGE_FORMAT = "webp"
+    PAGE_IMAGE_CONTENT_TYPE = "image/webp"
+    PAGE_IMAGE_SUFFIX = ".webp"
+else:
+    PAGE_IMAGE_FORMAT = "jpeg"
+    PAGE_IMAGE_CONTENT_TYPE = "image/jpeg"
+    PAGE_IMAGE_SUFFIX = ".jpg"
+
+local_page_images = OcrCache(
+    OCR_PAGE_IMAGE_DIR, OCR_PAGE_IMAGE_MAX_BYTES, suffix=PAGE_IMAGE_SUFFIX
+)
+
+
+def resolve_page_image_mode(mode: Optional[str] = None) -> str:
+    mode = mode or OCR_PAGE_IMAGE_MODE
+    if mode not in (PAGE_IMAGE_MODE_REF, PAGE_IMAGE_MODE_BASE64):
+        raise ValueError(f"Unknown page image mode: {mode}")
+    return mode
+
+
+def encode_page_image(img: Image.Image) -> Tuple[bytes, Image.Image]:
+    """Versão realçada e reduzida da página, no formato das referências."""
+    page_img = enhance_image(img, max_side=OCR_PAGE_IMAGE_MAX_SIDE)
+    with BytesIO() as buf:
+        if PAGE_IMAGE_FORMAT == "webp":
+            page_img.save(buf, "webp", quality=80, method=4)
+        else:
+            page_img.save(buf, "jpeg", quality=85, optimize=True)
+        return buf.getvalue(), page_img
+
+
+def page_image_to_b64(img: Image.Image) -> str:
+    page_img = enhance_image(img, max_side=OCR_PAGE_IMAGE_MAX_SIDE)
+    with BytesIO() as buf:
+        page_img.save(buf, "jpeg", quality=85)
+        return base64.b64encode(buf.getvalue()).decode()
+
+
+def _save_to_storage(name: str, data: bytes) -> str:
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+
+    # mesmo conteúdo, mesmo nome: a página já gravada não sobe de novo
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(data))
+
+
+def store_page_image(
+    img: Image.Image, page_number: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Grava a imagem da página endereçada pelo SHA-256 do arquivo codificado e
+    devolve a referência: {"store", "name", "content_type", "sha256",
+    "size", "width", "height", "page"}. `name` é o nome no storage ou o
+    caminho local (sujeito à limpeza LRU do diretório). Use
+    `read_page_image` para obter os bytes de volta.
+    """
+    data, page_img = encode_page_image(img)
+    digest = hashlib.sha256(data).hexdigest()
+
+    if OCR_PAGE_IMAGE_STORE == PAGE_IMAGE_STORE_LOCAL:
+        name = local_page_images.set_bytes(digest, data)
+        if name is None:
+            raise OSError(f"Could not write page image to {OCR_PAGE_IMAGE_DIR}")
+    else:
+        name = _save_to_storage(
+            f"{OCR_PAGE_IMAGE_PREFIX}/{digest[:2]}/{digest}{PAGE_IMAGE_SUFFIX}", data
+        )
+
+    return {
+        "store": OCR_PAGE_IMAGE_STORE,
+        "name": name,
+        "content_type": PAGE_IMAGE_CONTENT_TYPE,
+        "sha256": digest,
+        "size": len(data),
+        "width": page_img.width,
+        "height": page_img.height,
+        "page": page_number,
+    }
+
+
+def read_page_image(ref: Dict[str, Any]) -> bytes:
+    """Bytes da imagem de uma referência criada por `store_page_image`."""
+    if ref["store"] == PAGE_IMAGE_STORE_LOCAL:
+        with open(ref["name"], "rb") as f:
+            return f.read()
+
+    from django.core.files.storage import default_storage
+
+    with default_storage.open(ref["name"], "rb") as f:
+        return f.read()
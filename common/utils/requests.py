@@ -1,12 +1,105 @@
+import hashlib
+import mimetypes
+import os
+import tempfile
+import threading
 import time
 import logging
 import requests
+from contextlib import contextmanager
 from functools import wraps
+from typing import Iterable, Iterator, Optional, Tuple
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError
-from memoize import memoize
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
+# pool de conexões HTTP de saída (por processo)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 10))  # hosts
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 20))  # conexões por host
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.5))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+
+# teto de tamanho para downloads de documentos (padrão 100 MB)
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", 100 * 1024 * 1024))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadTooLargeError(Exception):
+    pass
+
+
+class DownloadedFile:
+    """
+    Arquivo baixado para um temporário em disco. `path` pode ser entregue
+    direto ao PyMuPDF/python-docx/pandas, sem cópia do conteúdo em memória.
+    """
+
+    def __init__(self, path: str, headers: dict, sha256: str, size: int):
+        self.path = path
+        self.headers = headers
+        self.sha256 = sha256
+        self.size = size
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+_http_session: Optional[requests.Session] = None
+_http_session_pid: Optional[int] = None
+_http_session_lock = threading.Lock()
+
+
+def _build_http_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        # o chamador decide com raise_for_status()
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """
+    Sessão HTTP compartilhada pelo processo, com keep-alive, pool de conexões
+    e retry com backoff exponencial para GETs idempotentes.
+
+    É recriada após um fork (workers do Celery/gunicorn), já que sockets
+    herdados do processo pai não podem ser reaproveitados.
+    """
+    global _http_session, _http_session_pid
+
+    pid = os.getpid()
+    if _http_session is None or _http_session_pid != pid:
+        with _http_session_lock:
+            if _http_session is None or _http_session_pid != pid:
+                _http_session = _build_http_session()
+                _http_session_pid = pid
+    return _http_session
+
+
+def http_timeout(read_timeout: float) -> tuple[float, float]:
+    """Timeout (conexão, leitura) no formato aceito pelo requests."""
+    return (min(HTTP_CONNECT_TIMEOUT, read_timeout), read_timeout)
+
 
 def retry_on_failure(max_retries=3, delay=3):
     """
@@ -41,17 +134,101 @@ def retry_on_failure(max_retries=3, delay=3):
     return decorator
 
 
-@memoize()
+@contextmanager
+def download_to_tempfile(
+    url: str, timeout: int = 30, max_bytes: Optional[int] = None
+) -> Iterator[DownloadedFile]:
+    """
+    Baixa um URL em streaming para um arquivo temporário, calculando o
+    SHA-256 durante a cópia. O arquivo é removido ao sair do contexto.
+
+    Args:
+        url: URL do arquivo
+        timeout: Timeout da conexão/leitura (em segundos)
+        max_bytes: Tamanho máximo aceito (padrão DOWNLOAD_MAX_BYTES)
+
+    Raises:
+        DownloadTooLargeError: se o arquivo passar de `max_bytes`
+    """
+    max_bytes = DOWNLOAD_MAX_BYTES if max_bytes is None else max_bytes
+
+    with get_http_session().get(
+        url, timeout=http_timeout(timeout), stream=True
+    ) as response:
+        response.raise_for_status()
+
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise DownloadTooLargeError(
+                f"File too large: {declared} bytes (max {max_bytes})"
+            )
+
+        with _chunks_to_tempfile(
+            response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE), max_bytes
+        ) as (path, sha256, size):
+            yield DownloadedFile(path, response.headers, sha256, size)
+
+
+@contextmanager
+def storage_to_tempfile(
+    name: str, max_bytes: Optional[int] = None
+) -> Iterator[DownloadedFile]:
+    """
+    Como `download_to_tempfile`, mas lendo um arquivo do storage do Django
+    (ex.: `FileField.name`), sem depender de URL assinada. O Content-Type
+    vem da extensão do nome.
+    """
+    from django.core.files.storage import default_storage
+
+    max_bytes = DOWNLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    content_type, _ = mimetypes.guess_type(name)
+
+    with default_storage.open(name, "rb") as src:
+        with _chunks_to_tempfile(
+            src.chunks(DOWNLOAD_CHUNK_SIZE), max_bytes
+        ) as (path, sha256, size):
+            yield DownloadedFile(path, {"Content-Type": content_type}, sha256, size)
+
+
+@contextmanager
+def _chunks_to_tempfile(
+    chunks: Iterable[bytes], max_bytes: int
+) -> Iterator[Tuple[str, str, int]]:
+    """Grava os pedaços num temporário e devolve (caminho, SHA-256, tamanho)."""
+    fd, path = tempfile.mkstemp(suffix=".download")
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise DownloadTooLargeError(
+                        f"File too large: more than {max_bytes} bytes"
+                    )
+                digest.update(chunk)
+                f.write(chunk)
+
+        yield path, digest.hexdigest(), size
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
 def url_to_buffer(url: str, timeout: int = 30) -> tuple[bytes, dict]:
     """
     Baixa o conteúdo de um URL e retorna o conteúdo e os headers.
 
+    Para documentos grandes prefira `download_to_tempfile`, que não mantém o
+    arquivo inteiro em memória.
+
     Args:
         url: URL do arquivo
 
     Returns:
         tuple[bytes, dict]: Conteúdo e headers do arquivo
     """
-    response = requests.get(url, timeout=timeout)
-    response.raise_for_status()
-    return response.content, response.headers
+    with download_to_tempfile(url, timeout=timeout) as download:
+        return download.read_bytes(), download.headers
@@ -1,6 +1,9 @@
 import logging
 from typing import Any, Dict, List, Optional
+from asgiref.sync import async_to_sync
 from celery.app.task import Task
+from celery.utils import uuid
+from channels.layers import get_channel_layer
 from django.core.cache import cache
 from service.celery import app as celery_app
 
@@ -190,3 +193,128 @@ def release_lock(key: str) -> bool:
         bool: True if the lock was released, False otherwise.
     """
     return cache.delete(key)
+
+
+# ----------------- progresso de tasks via websocket -----------------
+
+TASK_PROGRESS_TTL = 60 * 60
+TASK_FINISHED_STATES = ("SUCCESS", "FAILURE")
+
+
+def task_progress_group(user_id) -> str:
+    return f"task_progress_{user_id}"
+
+
+def task_progress_cache_key(task_id: str) -> str:
+    return f"task_progress:{task_id}"
+
+
+def get_task_progress(task_id: str) -> Optional[Dict[str, Any]]:
+    """Último estado publicado de uma task (sem consultar o result backend)."""
+    return cache.get(task_progress_cache_key(task_id))
+
+
+def publish_task_progress(
+    task_id: str,
+    user_id: Optional[int],
+    state: str,
+    current: Optional[int] = None,
+    total: Optional[int] = None,
+    result: Any = None,
+    error: Optional[str] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Publishes the task state to the owner's channel group and keeps a snapshot
+    in the cache, so a client subscribing late still gets the latest state.
+    Only the owner can read the snapshot, so tasks without one (e.g. started
+    by the system, not through `delay_for_user`) publish nothing.
+    Args:
+        task_id (str): The celery task id.
+        user_id (int, optional): Owner of the task, recorded in the snapshot.
+        state (str): PENDING, PROGRESS, SUCCESS or FAILURE.
+    Returns:
+        Dict[str, any]: The snapshot (published only when there is an owner).
+    """
+    snapshot = {
+        "task_id": task_id,
+        "user_id": user_id,
+        "state": state,
+        "current": current,
+        "total": total,
+        "result": result,
+        "error": error,
+        "meta": meta or {},
+    }
+    if user_id is None:
+        return snapshot
+
+    cache.set(task_progress_cache_key(task_id), snapshot, TASK_PROGRESS_TTL)
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            task_progress_group(user_id),
+            {"type": "task.progress", "task_id": task_id, "data": snapshot},
+        )
+    except Exception as e:
+        logger.error(f"Error publishing progress of task {task_id}: {str(e)}")
+
+    return snapshot
+
+
+class ProgressTask(Task):
+    """
+    Base class for tasks that report progress over the websocket "tasks"
+    stream. The owner is given by the `progress_user_id` kwarg, which is
+    removed before the task body runs:
+
+        @shared_task(bind=True, base=ProgressTask)
+        def my_task(self, document_id):
+            self.report_progress(1, 10)
+
+        my_task.delay_for_user(request.user.id, document_id=1)
+
+    `delay_for_user` já publica o estado PENDING, então o cliente pode assinar
+    o id logo em seguida (ids sem nada publicado dão 404 no stream).
+    """
+
+    def __call__(self, *args, **kwargs):
+        kwargs.pop("progress_user_id", None)
+        return super().__call__(*args, **kwargs)
+
+    def delay_for_user(self, user_id: int, *args, **kwargs):
+        # publica antes de enfileirar: depois, poderia sobrescrever um
+        # PROGRESS/SUCCESS que o worker já publicou
+        task_id = uuid()
+        publish_task_progress(task_id, user_id, "PENDING")
+        return self.apply_async(
+            args, {**kwargs, "progress_user_id": user_id}, task_id=task_id
+        )
+
+    def _progress_user_id(self, kwargs: Optional[Dict[str, Any]] = None):
+        if kwargs is None:
+            kwargs = self.request.kwargs or {}
+        return kwargs.get("progress_user_id")
+
+    def report_progress(
+        self, current: int, total: Optional[int] = None, **meta
+    ) -> Dict[str, Any]:
+        return publish_task_progress(
+            self.request.id,
+            self._progress_user_id(),
+            "PROGRESS",
+            current=current,
+            total=total,
+            meta=meta,
+        )
+
+    def on_success(self, retval, task_id, args, kwargs):
+        publish_task_progress(
+            task_id, self._progress_user_id(kwargs), "SUCCESS", result=retval
+        )
+        super().on_success(retval, task_id, args, kwargs)
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        publish_task_progress(
+            task_id, self._progress_user_id(kwargs), "FAILURE", error=str(exc)
+        )
+        super().on_failure(exc, task_id, args, kwargs, einfo)
@@ -0,0 +1,271 @@
+import fcntl
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from unidecode import unidecode
+
+logger = logging.getLogger(__name__)
+
+# Índice local de similaridade entre textos extraídos (sem serviço externo):
+# cada documento vira um vetor de n-gramas de palavras (1 e 2) com hashing,
+# TF sublinear; o IDF é recalculado a partir da própria matriz na leitura.
+EXAM_TEXT_INDEX_DIR = os.getenv("EXAM_TEXT_INDEX_DIR", "/tmp/exam-text-index")
+# dimensão dos vetores (potência de 2); N documentos ocupam N * dim * 4 bytes
+TEXT_INDEX_DIM = int(os.getenv("TEXT_INDEX_DIM", 4096))
+# muda quando a vetorização muda: arquivos de versões antigas são ignorados
+TEXT_INDEX_VERSION = 1
+
+# compacta o arquivo quando as linhas removidas passam das vivas
+TEXT_INDEX_COMPACT_MIN = 64
+
+_WORD_RE = re.compile(r"[a-z][a-z0-9]+")
+# palavras comuns em qualquer laudo, que só aproximariam documentos diferentes
+_STOPWORDS = set(
+    "a as ao aos com da das de do dos e em na nas no nos o os ou para por que se "
+    "um uma".split()
+)
+
+_DELETED = -1
+
+
+def text_features(text: str) -> Counter:
+    """Unigramas e bigramas de palavras (sem acento, minúsculas) do texto."""
+    words = [
+        word
+        for word in _WORD_RE.findall(unidecode(text or "").lower())
+        if word not in _STOPWORDS
+    ]
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return features
+
+
+def hash_vector(text: str, dim: int = TEXT_INDEX_DIM) -> np.ndarray:
+    """
+    Vetor de TF sublinear (1 + log tf) com hashing: o CRC32 de cada n-grama
+    escolhe a posição e o bit mais alto o sinal, para as colisões se
+    cancelarem em vez de se somarem.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    features = text_features(text)
+    if not features:
+        return vector
+    hashes = np.fromiter(
+        (zlib.crc32(feature.encode()) for feature in features),
+        dtype=np.uint32,
+        count=len(features),
+    )
+    weights = np.fromiter(
+        (1.0 + math.log(count) for count in features.values()),
+        dtype=np.float32,
+        count=len(features),
+    )
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes & (dim - 1)).astype(np.intp), weights * signs)
+    return vector
+
+
+class TextIndex:
+    """
+    Vetores de documentos num único arquivo de registros (id, grupo, vetor),
+    compartilhado pelos processos (e containers) que montam o diretório:
+      - incluir um documento acrescenta um registro no fim; a versão anterior
+        dele é marcada como removida (id = -1) no lugar;
+      - escritas são serializadas por um flock; a compactação reescreve num
+        temporário e renomeia, então leitores nunca veem arquivo pela metade;
+      - cada processo guarda a matriz TF-IDF normalizada em memória e só a
+        recalcula quando o arquivo muda. A consulta é um produto matriz-vetor.
+    O grupo (residente, no índice dos exames) permite restringir a busca.
+    """
+
+    def __init__(self, directory: str, dim: int = TEXT_INDEX_DIM):
+        if dim & (dim - 1):
+            raise ValueError(f"Text index dimension must be a power of 2: {dim}")
+        self.directory = directory
+        self.dim = dim
+        self.dtype = np.dtype(
+            [("id", "<i8"), ("group", "<i8"), ("vector", "<f4", (dim,))]
+        )
+        self.path = os.path.join(directory, f"index-v{TEXT_INDEX_VERSION}-d{dim}.bin")
+        self._lock = threading.Lock()
+        self._loaded_key = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._groups = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._idf = np.ones(dim, dtype=np.float32)
+
+    # Escrita
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_ids(self) -> np.ndarray:
+        """Ids dos registros (chamar com o flock)."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=np.int64)
+        count, partial = divmod(size, self.dtype.itemsize)
+        if partial:
+            # sobra de uma escrita interrompida: desalinharia os próximos registros
+            logger.warning(f"Truncating partial record at the end of {self.path}")
+            os.truncate(self.path, count * self.dtype.itemsize)
+        if not count:
+            return np.empty(0, dtype=np.int64)
+        records = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(count,))
+        return np.array(records["id"])
+
+    def _mark_deleted(self, ids: np.ndarray, doc_id: int) -> int:
+        rows = np.flatnonzero(ids == doc_id)
+        if len(rows):
+            deleted = np.array(_DELETED, dtype="<i8").tobytes()
+            with open(self.path, "r+b") as f:
+                for row in rows:
+                    f.seek(int(row) * self.dtype.itemsize)
+                    f.write(deleted)
+        return len(rows)
+
+    def _record(self, doc_id: int, group: int, vector: np.ndarray) -> np.ndarray:
+        record = np.zeros(1, dtype=self.dtype)
+        record["id"], record["group"], record["vector"] = doc_id, group, vector
+        return record
+
+    def add(self, doc_id: int, text: str, group: int = 0):
+        """Inclui ou substitui o documento (texto vazio só remove)."""
+        vector = hash_vector(text, self.dim)
+        with self._write_lock():
+            ids = self._read_ids()
+            self._mark_deleted(ids, doc_id)
+            if vector.any():
+                with open(self.path, "ab") as f:
+                    f.write(self._record(doc_id, group, vector).tobytes())
+                ids = np.append(ids, doc_id)
+            self._maybe_compact(ids)
+
+    def remove(self, doc_id: int):
+        with self._write_lock():
+            ids = self._read_ids()
+            if self._mark_deleted(ids, doc_id):
+                self._maybe_compact(ids)
+
+    def _maybe_compact(self, ids: np.ndarray):
+        deleted = int(np.count_nonzero(ids == _DELETED))
+        if deleted >= TEXT_INDEX_COMPACT_MIN and deleted > len(ids) - deleted:
+            records = np.fromfile(self.path, dtype=self.dtype)
+            self._replace(records[records["id"] != _DELETED])
+            logger.info(f"Compacted {self.path}: {deleted} removed records dropped")
+
+    def _replace(self, records: np.ndarray):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(records.tobytes())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def rebuild(self, documents: Iterable[Tuple[int, str, int]]) -> int:
+        """Recria o índice a partir de (id, texto, grupo); devolve quantos."""
+        records = []
+        for doc_id, text, group in documents:
+            vector = hash_vector(text, self.dim)
+            if vector.any():
+                records.append(self._record(doc_id, group, vector))
+        with self._write_lock():
+            self._replace(
+                np.concatenate(records) if records else np.zeros(0, self.dtype)
+            )
+        return len(records)
+
+    # Leitura
+
+    def _load(self):
+        try:
+            stat = os.stat(self.path)
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = None
+        if key == self._loaded_key:
+            return
+
+        if key is None:
+            records = np.zeros(0, dtype=self.dtype)
+        else:
+            # registro incompleto no fim (escrita em andamento) fica de fora
+            count = stat.st_size // self.dtype.itemsize
+            records = np.fromfile(self.path, dtype=self.dtype, count=count)
+            records = records[records["id"] != _DELETED]
+
+        matrix = np.ascontiguousarray(records["vector"], dtype=np.float32)
+        # IDF suavizado, como no scikit-learn: log((1 + N) / (1 + df)) + 1
+        df = np.count_nonzero(matrix, axis=0)
+        idf = (np.log((1.0 + len(matrix)) / (1.0 + df)) + 1.0).astype(np.float32)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+
+        self._ids = np.array(records["id"])
+        self._groups = np.array(records["group"])
+        self._matrix = matrix
+        self._idf = idf
+        self._loaded_key = key
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._ids)
+
+    def query(
+        self,
+        text: str,
+        limit: int = 10,
+        group: Optional[int] = None,
+        exclude: Optional[int] = None,
+        min_score: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Documentos mais parecidos com o texto, como (id, similaridade de
+        cosseno), em ordem decrescente.
+        """
+        vector = hash_vector(text, self.dim)
+        with self._lock:
+            self._load()
+            ids, groups, matrix = self._ids, self._groups, self._matrix
+            vector *= self._idf
+
+        norm = np.linalg.norm(vector)
+        if not norm or not len(ids):
+            return []
+        scores = matrix @ (vector / norm)
+
+        mask = scores > min_score
+        if group is not None:
+            mask &= groups == group
+        if exclude is not None:
+            mask &= ids != exclude
+        candidates = np.flatnonzero(mask)
+        if len(candidates) > limit:
+            top = np.argpartition(scores[candidates], -limit)[-limit:]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in candidates]
+
+
+exam_text_index = TextIndex(EXAM_TEXT_INDEX_DIR)
@@ -1,10 +1,13 @@
 import base64, json, hmac, hashlib, time, urllib.parse
 from botocore.exceptions import ClientError
-from django.http import HttpResponse, HttpResponseRedirect, Http404
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, HttpResponseRedirect, Http404, JsonResponse
 from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from storages.backends.s3boto3 import S3Boto3Storage
 
+from common.throttling import get_throttle_stats
+
 
 def _b64url_decode(s: str) -> bytes:
     return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
@@ -49,3 +52,10 @@ def media_proxy(request, token, path):
 
     # GET → redireciona pro link assinado
     return HttpResponseRedirect(data["g"])
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def ws_throttle_stats(request):
+    """Ações de websocket adiadas/rejeitadas pelo rate limit (todos os workers)."""
+    return JsonResponse(get_throttle_stats())
@@ -1,7 +1,12 @@
+import asyncio
 import logging
 import traceback
+from cachetools import LRUCache
 from channelsmultiplexer import AsyncJsonWebsocketDemultiplexer
+from django.conf import settings
 from authentication.consumers import JWTTokenConsumer
+from common.consumers import TaskProgressConsumer, get_action_slots
+from common.throttling import ConnectionThrottle
 from users.consumers import LoggedUserConsumer
 
 logger = logging.getLogger(__name__)
@@ -11,8 +16,39 @@ class AppApplicationDemultiplexer(AsyncJsonWebsocketDemultiplexer):
     applications = {
         "token": JWTTokenConsumer.as_asgi(),
         "user": LoggedUserConsumer.as_asgi(),
+        "tasks": TaskProgressConsumer.as_asgi(),
     }
 
+    # Stream virtual para frames em lote:
+    # {"stream": "batch", "payload": {"request_id": ..., "requests": [
+    #     {"stream": "user", "action": "retrieve", "request_id": 1, "data": {...}},
+    #     ...
+    # ]}}
+    # A resposta é um único frame no mesmo stream com "responses" na ordem
+    # dos pedidos, cada item no formato {"stream": ..., "payload": {...}}.
+    # Os pedidos seguem para os streams com um request_id próprio do lote
+    # ("batch:<seq>:<índice>"), que volta a ser o do cliente nas respostas:
+    # assim não se confundem com pedidos avulsos de mesmo request_id.
+    batch_stream = "batch"
+    batch_max_size = getattr(settings, "WS_BATCH_MAX_SIZE", 20)
+    batch_timeout = getattr(settings, "WS_BATCH_TIMEOUT", 30)
+    # request_ids do lote lembrados para os eventos de observers, que reusam o
+    # request_id do subscribe
+    batch_request_ids_size = 1000
+
+    async def _create_upstream_applications(self):
+        # o scope é compartilhado com os streams: o limite de ações em
+        # andamento passa a valer para a conexão inteira
+        get_action_slots(self.scope)
+        self.batch_waiters = {}
+        self.batch_tasks = set()
+        self.batch_seq = 0
+        self.batch_request_ids = LRUCache(maxsize=self.batch_request_ids_size)
+        self.throttle = ConnectionThrottle(
+            user_id=getattr(self.scope.get("user"), "id", None)
+        )
+        await super()._create_upstream_applications()
+
     async def connect(self):
         """Handle WebSocket connection"""
         try:
@@ -32,6 +68,8 @@ class AppApplicationDemultiplexer(AsyncJsonWebsocketDemultiplexer):
             logger.info(
                 f"WebSocket disconnecting for user: {getattr(user, 'id', 'anonymous')} with code: {close_code}"
             )
+            for task in self.batch_tasks:
+                task.cancel()
             await super().disconnect(close_code)
         except Exception as e:
             logger.error(
@@ -40,14 +78,30 @@ class AppApplicationDemultiplexer(AsyncJsonWebsocketDemultiplexer):
 
     async def receive_json(self, content, **kwargs):
         """Log para identificar streams não mapeados"""
-        stream = content.get("stream")
-        if stream and stream not in self.applications:
-            logger.error(
-                f"🚨 STREAM NÃO MAPEADO: '{stream}' - Streams disponíveis: {list(self.applications.keys())}"
-            )
-            logger.error(f"📄 Conteúdo da mensagem: {content}")
-
         try:
+            stream = content.get("stream")
+            if stream == self.batch_stream:
+                return await self.receive_batch(content.get("payload"))
+
+            if stream and stream not in self.applications:
+                logger.error(
+                    f"🚨 STREAM NÃO MAPEADO: '{stream}' - Streams disponíveis: {list(self.applications.keys())}"
+                )
+                logger.error(f"📄 Conteúdo da mensagem: {content}")
+
+            payload = content.get("payload")
+            if isinstance(payload, dict):
+                allowed, retry_after = await self.throttle.acquire(
+                    payload.get("action")
+                )
+                if not allowed:
+                    return await self.send_json(
+                        {
+                            "stream": stream,
+                            "payload": self._throttled_error(payload, retry_after),
+                        }
+                    )
+
             return await super().receive_json(content, **kwargs)
         except Exception as e:
             logger.error(
@@ -58,3 +112,155 @@ class AppApplicationDemultiplexer(AsyncJsonWebsocketDemultiplexer):
             logger.error(f"Kwargs: {kwargs}")
 
             return await self.close(code=4000)
+
+    async def receive_batch(self, payload):
+        """
+        Despacha todos os pedidos do lote de uma vez (streams diferentes e
+        ações detached rodam em paralelo) e junta as respostas em background,
+        sem segurar o recebimento de outros frames.
+        """
+        if not isinstance(payload, dict) or not isinstance(
+            payload.get("requests", []), list
+        ):
+            return await self._reject_batch(
+                None, "Invalid batch: payload must be an object with a requests list"
+            )
+
+        batch_id = payload.get("request_id")
+        requests = payload.get("requests") or []
+
+        if len(requests) > self.batch_max_size:
+            return await self._reject_batch(
+                batch_id, f"Batch too large (max {self.batch_max_size} requests)"
+            )
+
+        self.batch_seq += 1
+        loop = asyncio.get_running_loop()
+        pending = []
+        for index, entry in enumerate(requests):
+            future = loop.create_future()
+            if not self._is_valid_batch_entry(entry):
+                request = {"request_id": f"{batch_id}:{index}"}
+                pending.append((None, request, None, future))
+                future.set_result(
+                    self._batch_error(request, "Invalid request", status=400)
+                )
+                continue
+
+            stream = entry["stream"]
+            request = {key: value for key, value in entry.items() if key != "stream"}
+            request.setdefault("request_id", f"{batch_id}:{index}")
+            key = (stream, f"batch:{self.batch_seq}:{index}")
+            pending.append((stream, request, key, future))
+
+            if stream not in self.applications_accepting_frames:
+                future.set_result(
+                    self._batch_error(request, "Stream not mapped", status=404)
+                )
+                continue
+
+            allowed, retry_after = await self.throttle.acquire(request.get("action"))
+            if not allowed:
+                future.set_result(self._throttled_error(request, retry_after))
+                continue
+
+            self.batch_waiters[key] = (request.get("action"), future)
+            self.batch_request_ids[key] = request["request_id"]
+            await self.send_upstream(
+                message={
+                    "type": "websocket.receive",
+                    "text": await self.encode_json(dict(request, request_id=key[1])),
+                },
+                stream_name=stream,
+            )
+
+        task = loop.create_task(self._reply_batch(batch_id, pending))
+        self.batch_tasks.add(task)
+        task.add_done_callback(self.batch_tasks.discard)
+
+    @staticmethod
+    def _is_valid_batch_entry(entry) -> bool:
+        return (
+            isinstance(entry, dict)
+            and isinstance(entry.get("stream"), str)
+            and isinstance(entry.get("action"), str)
+        )
+
+    async def _reject_batch(self, batch_id, message: str):
+        await self.send_json(
+            {
+                "stream": self.batch_stream,
+                "payload": {
+                    "request_id": batch_id,
+                    "errors": [message],
+                    "response_status": 400,
+                    "responses": [],
+                },
+            }
+        )
+
+    async def _reply_batch(self, batch_id, pending):
+        futures = [future for _, _, _, future in pending]
+        if futures:
+            await asyncio.wait(futures, timeout=self.batch_timeout)
+
+        responses = []
+        for stream, request, key, future in pending:
+            self.batch_waiters.pop(key, None)
+            if future.done():
+                result = future.result()
+            else:
+                future.cancel()
+                result = self._batch_error(request, "Timeout", status=504)
+            responses.append({"stream": stream, "payload": result})
+
+        await self.send_json(
+            {
+                "stream": self.batch_stream,
+                "payload": {"request_id": batch_id, "responses": responses},
+            }
+        )
+
+    def _batch_error(self, request: dict, message: str, status: int) -> dict:
+        return {
+            "errors": [message],
+            "data": None,
+            "action": request.get("action"),
+            "response_status": status,
+            "request_id": request.get("request_id"),
+        }
+
+    def _throttled_error(self, request: dict, retry_after) -> dict:
+        return {
+            "errors": [
+                {
+                    "message": "Too many requests.",
+                    "code": "throttled",
+                    "retry_after": retry_after,
+                }
+            ],
+            "data": None,
+            "action": request.get("action"),
+            "response_status": 429,
+            "request_id": request.get("request_id"),
+        }
+
+    async def websocket_send(self, message, stream_name):
+        """Desvia para o lote as respostas de pedidos que vieram em batch."""
+        if not self.batch_request_ids:
+            return await super().websocket_send(message, stream_name)
+
+        content = await self.decode_json(message.get("text"))
+        key = (stream_name, str(content.get("request_id")))
+        if key in self.batch_request_ids:
+            content["request_id"] = self.batch_request_ids[key]
+        waiter = self.batch_waiters.get(key)
+        # observers reaproveitam o request_id do subscribe, por isso a action
+        # também precisa bater
+        if waiter and waiter[0] == content.get("action"):
+            del self.batch_waiters[key]
+            if not waiter[1].done():
+                waiter[1].set_result(content)
+            return
+
+        await self.send_json({"stream": stream_name, "payload": content})
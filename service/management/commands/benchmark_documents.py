@@ -0,0 +1,81 @@
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.benchmark import DOCUMENT_CASES, benchmark_documents, compare_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera um corpus sintético (PDFs nativos/escaneados/girados, tiras "
+        "longas, DOCX, XLSX) e mede a extração de texto: páginas/s, p50/p95, "
+        "pico de RSS e acurácia. Resultado em JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--docs",
+            type=int,
+            default=3,
+            help="Documentos por caso (padrão: 3)",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=5,
+            help="Páginas por PDF (padrão: 5)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Semente do corpus (padrão: 0)",
+        )
+        parser.add_argument(
+            "--cases",
+            nargs="+",
+            choices=DOCUMENT_CASES,
+            help="Casos a rodar (padrão: todos)",
+        )
+        parser.add_argument(
+            "--corpus-dir",
+            help="Onde gravar o corpus (padrão: diretório temporário)",
+        )
+        parser.add_argument(
+            "--output",
+            help="Arquivo JSON de saída (padrão: stdout)",
+        )
+        parser.add_argument(
+            "--compare",
+            help="JSON de uma execução anterior para comparar",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read baseline: {e}")
+
+        with tempfile.TemporaryDirectory(prefix="benchmark-corpus-") as tmp:
+            result = benchmark_documents(
+                corpus_dir=options["corpus_dir"] or tmp,
+                docs=options["docs"],
+                pages=options["pages"],
+                seed=options["seed"],
+                cases=options["cases"],
+            )
+
+        if baseline is not None:
+            result["comparison"] = compare_benchmarks(baseline, result)
+
+        output = json.dumps(result, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from common.benchmark import benchmark_orientation
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a estimativa barata de orientação (OSD evitado, acurácia e tempo) "
+        "num corpus sintético de páginas giradas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=100,
+            help="Número de páginas do corpus (padrão: 100)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Semente do corpus (padrão: 0)",
+        )
+        parser.add_argument(
+            "--with-osd",
+            action="store_true",
+            help="Roda também o OSD do Tesseract em todas as páginas para comparar",
+        )
+
+    def handle(self, *args, **options):
+        result = benchmark_orientation(
+            count=options["images"],
+            seed=options["seed"],
+            with_osd=options["with_osd"],
+        )
+        self.stdout.write(json.dumps(result, indent=2))
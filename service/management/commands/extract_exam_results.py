@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from appointments.models import ExamAttachment
+from appointments.tasks import schedule_exam_results
+
+
+class Command(BaseCommand):
+    help = (
+        "Agenda a extração de resultados de exames dos anexos (texto + valores "
+        "laboratoriais), por padrão só dos que ainda não foram processados"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--resident",
+            type=int,
+            help="Só os anexos deste residente (id)",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Reprocessa também os anexos já extraídos",
+        )
+
+    def handle(self, *args, **options):
+        attachments = ExamAttachment.objects.exclude(file="").only("id", "file")
+        if options["resident"]:
+            attachments = attachments.filter(resident_id=options["resident"])
+        if not options["all"]:
+            attachments = attachments.filter(results_extracted_at__isnull=True)
+
+        count = 0
+        for attachment in attachments.iterator():
+            schedule_exam_results(attachment)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} attachments scheduled"))
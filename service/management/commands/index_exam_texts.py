@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from appointments.models import ExamAttachment
+from common.utils.text_index import exam_text_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Recria o índice local de similaridade com o texto extraído dos anexos "
+        "de exames (necessário após mudar TEXT_INDEX_DIM ou perder o diretório)"
+    )
+
+    def handle(self, *args, **options):
+        documents = (
+            ExamAttachment.objects.exclude(extracted_text="")
+            .values_list("id", "extracted_text", "resident_id")
+            .iterator()
+        )
+        count = exam_text_index.rebuild(documents)
+        self.stdout.write(self.style.SUCCESS(f"{count} attachments indexed"))
@@ -383,6 +383,44 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Compressão das mensagens do channel layer (common.serializers.JSONSerializer).
+# "none" desliga a escrita comprimida, mas a leitura segue aceitando ambos.
+CHANNEL_LAYERS_COMPRESSION = os.getenv("CHANNEL_LAYERS_COMPRESSION", "brotli")
+CHANNEL_LAYERS_COMPRESSION_MIN_SIZE = int(
+    os.getenv("CHANNEL_LAYERS_COMPRESSION_MIN_SIZE", 4096)
+)
+CHANNEL_LAYERS_COMPRESSION_LEVEL = (
+    int(os.getenv("CHANNEL_LAYERS_COMPRESSION_LEVEL"))
+    if os.getenv("CHANNEL_LAYERS_COMPRESSION_LEVEL")
+    else None
+)
+
+# Execução das ações de websocket marcadas com @pooled_action (common.consumers).
+# "pooled": pool de threads com conexões próprias; "serial": @action() padrão.
+WS_ACTION_EXECUTION_MODE = os.getenv("WS_ACTION_EXECUTION_MODE", "pooled")
+WS_ACTION_POOL_SIZE = int(os.getenv("WS_ACTION_POOL_SIZE", 4))
+# ações aceitas e ainda não respondidas por conexão (além disso, 429); o
+# padrão comporta um lote cheio (WS_BATCH_MAX_SIZE) de ações pooled
+WS_ACTION_MAX_IN_FLIGHT = int(os.getenv("WS_ACTION_MAX_IN_FLIGHT", 20))
+
+# Frames em lote no stream "batch" do AppApplicationDemultiplexer
+WS_BATCH_MAX_SIZE = int(os.getenv("WS_BATCH_MAX_SIZE", 20))
+WS_BATCH_TIMEOUT = int(os.getenv("WS_BATCH_TIMEOUT", 30))  # segundos
+
+# Rate limit das ações de websocket (common.throttling): token bucket por
+# conexão e por usuário. Pedidos que excedem são adiados até
+# WS_THROTTLE_MAX_DEFER segundos ou rejeitados com erro "throttled" (429).
+WS_THROTTLE_RATE = float(os.getenv("WS_THROTTLE_RATE", 10))  # tokens/s
+WS_THROTTLE_BURST = float(os.getenv("WS_THROTTLE_BURST", 30))
+WS_THROTTLE_USER_RATE = float(os.getenv("WS_THROTTLE_USER_RATE", 20))
+WS_THROTTLE_USER_BURST = float(os.getenv("WS_THROTTLE_USER_BURST", 60))
+WS_THROTTLE_MAX_DEFER = float(os.getenv("WS_THROTTLE_MAX_DEFER", 1.0))
+WS_THROTTLE_ACTION_COSTS = {
+    "paginate": 3,
+    "obtain": 5,
+    "refresh": 2,
+}
+
 ASGI_APPLICATION = "service.asgi.application"
 
 LOGGING = {
@@ -450,6 +488,13 @@ SIMPLE_JWT = {
 CELERY_RESULT_BACKEND = "django-db"
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 CELERY_BROKER_URL = REDIS_URL
+# OCR pesado numa fila própria, consumida por workers dedicados
+# (start-scheduler.sh com CELERY_QUEUES=ocr)
+CELERY_TASK_ROUTES = {
+    "common.tasks.extract_document_text": {"queue": "ocr"},
+    "common.tasks.extract_pdf_chunk": {"queue": "ocr"},
+}
+OCR_TASK_CHUNK_PAGES = int(os.environ.get("OCR_TASK_CHUNK_PAGES", 4))
 
 X_FRAME_OPTIONS = "SAMEORIGIN"
 SILENCED_SYSTEM_CHECKS = ["security.W019"]
@@ -9,7 +9,7 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
     SpectacularRedocView,
 )
-from common.views import media_proxy
+from common.views import media_proxy, ws_throttle_stats
 
 
 def admin_redirect(request):
@@ -43,6 +43,7 @@ urlpatterns = [
         name="swagger-ui",
     ),
     path("api/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
+    path("api/ws/throttle-stats/", ws_throttle_stats, name="ws_throttle_stats"),
     re_path(
         r"^media-proxy/(?P<token>[^/]+)/(?P<path>.+)$", media_proxy, name="media_proxy"
     ),
@@ -39,6 +39,12 @@ SOFT_TIME_LIMIT=${CELERY_SOFT_TIME_LIMIT:-90}
 MAX_MEM_PER_CHILD=${CELERY_MAX_MEM_PER_CHILD:-600000}  # ~600MB
 LOGLEVEL=${CELERY_LOGLEVEL:-INFO}
 
+# Filas: por padrão consome tudo; um worker só de OCR usa CELERY_QUEUES=ocr
+# e CELERY_WITH_BEAT=0 (o beat deve rodar em um único worker)
+QUEUES=${CELERY_QUEUES:-celery,ocr}
+WITH_BEAT=${CELERY_WITH_BEAT:-1}
+WORKER_NAME=${CELERY_WORKER_NAME:-celery}
+
 # Beat junto: persistir agenda e ajustar loop
 SCHEDULE_FILE=${CELERY_BEAT_SCHEDULE:-/data/celerybeat-schedule.db}  # monte /data no container
 MAX_INTERVAL=${CELERY_BEAT_MAX_INTERVAL:-30}  # s (evita loop muito apertado)
@@ -49,9 +55,10 @@ WITHOUT_GOSSIP=${CELERY_WITHOUT_GOSSIP:-1}
 WITHOUT_MINGLE=${CELERY_WITHOUT_MINGLE:-1}
 WITHOUT_HEARTBEAT=${CELERY_WITHOUT_HEARTBEAT:-0}
 
-echo "[celery] cpus=$CPUS conc=$CONCURRENCY pool=$POOL prefetch=$PREFETCH max_tasks_per_child=$MAX_TASKS_PER_CHILD beat_schedule=$SCHEDULE_FILE"
+echo "[celery] cpus=$CPUS conc=$CONCURRENCY pool=$POOL prefetch=$PREFETCH max_tasks_per_child=$MAX_TASKS_PER_CHILD queues=$QUEUES beat=$WITH_BEAT beat_schedule=$SCHEDULE_FILE"
 
-CMD=( celery -A service worker -B
+CMD=( celery -A service worker
+      -Q "$QUEUES"
       -l "$LOGLEVEL"
       --pool "$POOL"
       --concurrency "$CONCURRENCY"
@@ -60,11 +67,12 @@ CMD=( celery -A service worker -B
       --time-limit "$TIME_LIMIT"
       --soft-time-limit "$SOFT_TIME_LIMIT"
       --max-memory-per-child "$MAX_MEM_PER_CHILD"
-      --schedule "$SCHEDULE_FILE"
-      --hostname "celery@$(hostname -s)"    # evita confusão de lock se reiniciar
-      --pidfile /tmp/celery-worker.pid
+      --hostname "$WORKER_NAME@$(hostname -s)"    # evita confusão de lock se reiniciar
+      --pidfile "/tmp/$WORKER_NAME-worker.pid"
     )
 
+[[ "$WITH_BEAT" == "1" ]] && CMD+=( -B --schedule "$SCHEDULE_FILE" )
+
 [[ "$WITHOUT_GOSSIP" == "1" ]] && CMD+=( --without-gossip )
 [[ "$WITHOUT_MINGLE" == "1" ]] && CMD+=( --without-mingle )
 [[ "$WITHOUT_HEARTBEAT" == "1" ]] && CMD+=( --without-heartbeat )